@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Per-match dispatch cost of :class:`Translator`
+
+Compare the handler lookup by name (``'b_%s' % match.lastgroup`` then
+``hasattr``/``getattr``, as done before the dispatch tables) with the
+table indexed by ``match.lastindex``.
+
+Usage::
+	python benchmarks/bench_dispatch.py [repeat]
+'''
+import io
+import os
+import sys
+import timeit
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html
+from dotclear.re_parser import p_block, p_inline
+
+
+
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+
+
+class LegacyWiki2XHTML(re_html.Wiki2XHTML):
+	'''Dispatch by handler name, the way it was done before'''
+	def blocks(self, match):
+		target = 'b_%s' % match.lastgroup
+		if hasattr(self, target):
+			return getattr(self, target)(match)
+		return match.group()
+
+	def inlines(self, match):
+		target = 'i_%s' % match.lastgroup
+		if hasattr(self, target):
+			return getattr(self, target)(match)
+		return match.group()
+
+
+
+def dispatch_by_name(translator, matches, prefix):
+	for match in matches:
+		target = prefix + match.lastgroup
+		if hasattr(translator, target):
+			getattr(translator, target)
+
+
+def dispatch_by_index(table, matches):
+	for match in matches:
+		table[match.lastindex]
+
+
+def main(repeat=5):
+	with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+		data = fobj.read() * 50
+	translator = re_html.Wiki2XHTML()
+	translator.warn = lambda match, message: None
+	blocks = list(p_block.finditer(data))
+	inlines = list(p_inline.finditer(data))
+	count = len(blocks) + len(inlines)
+
+	by_name = min(timeit.repeat(
+		lambda: (
+			dispatch_by_name(translator, blocks, 'b_'),
+			dispatch_by_name(translator, inlines, 'i_'),
+		),
+		number=10, repeat=repeat,
+	)) / 10
+	by_index = min(timeit.repeat(
+		lambda: (
+			dispatch_by_index(translator._block_handlers, blocks),
+			dispatch_by_index(translator._inline_handlers, inlines),
+		),
+		number=10, repeat=repeat,
+	)) / 10
+	print('dispatch only, %u matches' % count)
+	print('  by name:  %8.1f ns/match' % (by_name / count * 1e9))
+	print('  by index: %8.1f ns/match' % (by_index / count * 1e9))
+
+	legacy = LegacyWiki2XHTML()
+	legacy.warn = translator.warn
+	for name, obj in (('by name', legacy), ('by index', translator)):
+		elapsed = min(timeit.repeat(lambda: obj.run(data), number=3, repeat=repeat)) / 3
+		print('Wiki2XHTML.run, %s: %8.2f ms/document' % (name, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
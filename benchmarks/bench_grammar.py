@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Restricted grammars: a renderer of comments allowing only paragraphs,
+emphasis, strong emphasis and links, scanning every rule (as it was done
+before :attr:`Translator.rules`) versus scanning only its own rules
+
+Usage::
+	python benchmarks/bench_grammar.py [-s SIZE] [-r REPEAT] [corpus ...]
+'''
+import optparse
+import os
+import random
+import sys
+import timeit
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html
+
+import corpus
+
+
+
+
+
+class Comments(re_html.Wiki2XHTML):
+	'''Translate only the paragraphs, ``em``, ``strong`` and links'''
+	rules = ('p', 'nl', 'em', 'strong', 'a')
+
+
+
+class FullGrammar(re_html.Wiki2XHTML):
+	'''Same handlers as :class:`Comments`, scanning every rule'''
+	inline_tags = dict(
+		(name, tags)
+		for name, tags in re_html.Wiki2XHTML.inline_tags.items()
+		if name in Comments.rules
+	)
+
+for name in (
+	'b_xmp', 'b_special', 'b_pre', 'b_list', 'b_head', 'b_hr', 'b_blockquote',
+	'i_uri', 'i_img', 'i_br', 'i_anchor', 'i_acronym', 'i_cite', 'i_footnote',
+):
+	setattr(FullGrammar, name, None)
+
+
+def main(argv=None):
+	parser = optparse.OptionParser(usage='%prog [options] [corpus ...]')
+	parser.add_option('-s', '--size', type='int', default=200000, help='characters per corpus [%default]')
+	parser.add_option('-r', '--repeat', type='int', default=3, help='runs per measure [%default]')
+	options, names = parser.parse_args(argv)
+	corpora = dict(corpus.CORPORA)
+	names = names or ['realistic', 'b_p', 'i_em', 'i_a', 'i_img', 'i_nested']
+
+	print('%-12s %-12s %10s %8s' % ('corpus', 'grammar', 'ms', 'ratio'))
+	for name in names:
+		documents = corpora[name](random.Random(1), options.size)
+		reference = None
+		for label, translator in (('full', FullGrammar()), ('restricted', Comments())):
+			elapsed = min(timeit.repeat(
+				lambda: [translator.run(document) for document in documents],
+				number=1,
+				repeat=options.repeat,
+			))
+			if reference is None:
+				reference = elapsed
+			print('%-12s %-12s %10.1f %8.2f' % (name, label, elapsed * 1e3, elapsed / reference))
+
+
+if __name__ == '__main__':
+	main()
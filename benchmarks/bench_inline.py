@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Recursive inline translation versus :meth:`Translator.inline`
+
+The recursive translation re-scans the content of each emphasis, code,
+insert and delete with :data:`p_inline`, as it was done before the
+single-pass engine, which matches the rules only where
+:data:`p_inline_scan` finds the start of an element and looks up the
+closing delimiters of the containers with :meth:`unicode.find`.
+
+Usage::
+	python benchmarks/bench_inline.py [repeat]
+'''
+import os
+import sys
+import timeit
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html
+from dotclear.re_parser import p_inline
+
+
+
+
+
+class RecursiveWiki2XHTML(re_html.Wiki2XHTML):
+	def i_code(self, match):
+		return u'<tt class="code">%s</tt>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
+
+	def i_em(self, match):
+		return u'<em>%s</em>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
+
+	def i_strong(self, match):
+		return u'<strong>%s</strong>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
+
+	def i_del(self, match):
+		return u'<del>%s</del>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
+
+	def i_ins(self, match):
+		return u'<ins>%s</ins>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
+
+
+
+def nested(depth, size):
+	'''Return a `size` words long text nested in `depth` containers'''
+	text = u' '.join([u'lorem ipsum dolor sit amet'] * (size // 5))
+	for delimiter in (u"''", u'__', u'@@', u'++', u'--')[:depth]:
+		text = u'%s%s%s' % (delimiter, text, delimiter)
+	return text
+
+
+def dense(count):
+	'''Return a paragraph of `count` short markup elements, six by line
+
+	The acronyms have no title and the links are the last element of
+	their line: the title of an acronym (resp. the URL of a link) extends
+	to the last ``??`` (resp. ``]``) of the line.
+	'''
+	return u''.join(
+		(u"''em'' ", u'__strong__ ', u'@@code@@ ', u'??abbr?? ', u'++ins++ ', u'[label|url]\n')[i % 6]
+		for i in range(count)
+	)
+
+
+def prose(size):
+	'''Return a `size` words long text with a few elements'''
+	return u' '.join(
+		u"lorem ipsum ''dolor'' sit amet, see http://example.com/" if i % 50 == 0 else u'lorem ipsum dolor sit amet'
+		for i in range(size // 5)
+	)
+
+
+CASES = (
+	('nested 1 x 100', nested(1, 100)),
+	('nested 5 x 100', nested(5, 100)),
+	('nested 5 x 10000', nested(5, 10000)),
+	('dense 1000', dense(1000)),
+	('dense 10000', dense(10000)),
+	('prose 10000', prose(10000)),
+)
+
+
+def main(repeat=5):
+	single = re_html.Wiki2XHTML()
+	recursive = RecursiveWiki2XHTML()
+	for name, data in CASES:
+		assert single.inline(data) == p_inline.sub(recursive.inlines, data), name
+		print('%s (%u characters)' % (name, len(data)))
+		for label, function in (
+			('recursive', lambda: p_inline.sub(recursive.inlines, data)),
+			('single pass', lambda: single.inline(data)),
+		):
+			elapsed = min(timeit.repeat(function, number=10, repeat=repeat)) / 10
+			print('  %-12s %10.3f ms' % (label, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Memoized link classification versus a classification per link
+
+The documents are link-dense paragraphs (links, URIs and images) whose
+targets are drawn from a set of `DISTINCT` addresses.
+
+Usage::
+	python benchmarks/bench_links.py [-n LINKS] [-d DISTINCT] [-r REPEAT]
+'''
+import optparse
+import os
+import random
+import sys
+import timeit
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import links, re_html
+
+
+
+
+
+class Unmemoized(links.LinkPolicy):
+	'''Classify the target of every link, as it was done before'''
+	def classify(self, href, scheme=None):
+		return self.decide(href, scheme)
+
+
+def documents(rnd, count, distinct):
+	'''Return documents of `count` links to `distinct` targets overall'''
+	targets = [
+		u'http://host%u.example.org/path/%u?page=%u' % (i % 50, i, i % 7)
+		for i in range(distinct)
+	]
+	templates = (u'[label|%s]', u'%s', u'((%s|alt))', u'[/local/%u|%%s]')
+	result = []
+	paragraph = []
+	for i in range(count):
+		template = rnd.choice(templates)
+		if u'%u' in template:
+			template = template % i
+		paragraph.append(template % rnd.choice(targets))
+		if len(paragraph) == 10:
+			result.append(u'\n'.join(paragraph))
+			paragraph = []
+	return [u'\n\n'.join(result[i:i + 20]) for i in range(0, len(result), 20)]
+
+
+def main(argv=None):
+	parser = optparse.OptionParser(usage='%prog [options]')
+	parser.add_option('-n', '--links', type='int', default=20000, help='number of links [%default]')
+	parser.add_option('-d', '--distinct', type='int', default=500, help='number of distinct targets [%default]')
+	parser.add_option('-r', '--repeat', type='int', default=3, help='runs per measure [%default]')
+	options, _ = parser.parse_args(argv)
+	data = documents(random.Random(1), options.links, options.distinct)
+
+	memoized = re_html.Wiki2XHTML()
+	memoized.link_policy = links.LinkPolicy()
+	unmemoized = re_html.Wiki2XHTML()
+	unmemoized.link_policy = Unmemoized()
+	assert [memoized.run(document) for document in data] == [unmemoized.run(document) for document in data]
+	print('%u links to %u targets' % (options.links, options.distinct))
+	for label, translator in (('per link', unmemoized), ('memoized', memoized)):
+		elapsed = min(timeit.repeat(
+			lambda: [translator.run(document) for document in data],
+			number=1,
+			repeat=options.repeat,
+		))
+		print('  %-10s %10.1f ms' % (label, elapsed * 1e3))
+	print('  %s' % ', '.join('%s: %s' % item for item in sorted(memoized.link_policy.stats().items())))
+
+
+if __name__ == '__main__':
+	main()
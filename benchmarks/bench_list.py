@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''List translation with a node tree versus :meth:`Wiki2XHTML.b_list`
+
+The tree translation builds a :class:`MazNode` tree of each list and
+serializes it with :func:`re_html.node2html`, as it was done before the
+single-pass renderer.
+
+Usage::
+	python benchmarks/bench_list.py [repeat]
+'''
+import itertools
+import os
+import sys
+import timeit
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html
+from dotclear.nodes import MazNode
+from dotclear.re_parser import p_block
+
+
+
+
+
+class TreeWiki2XHTML(re_html.Wiki2XHTML):
+	_li_trim = re_html.sre_compile.compile(r'(?<=<li>)\s+|(?<![>])(?=\n)\s+?(?=</li>)')
+
+	def b_list(self, match):
+		ltprev = ''
+		root = node = MazNode('div')
+		for m in self._fragment_list.finditer(match.group()):
+			ltcurr, value = m.groups()
+			for prev, curr in itertools.dropwhile(lambda x: not cmp(x[0], x[1]), itertools.izip_longest(ltprev, ltcurr)):
+				if prev:
+					node = node.parent
+					if node.name == 'li':
+						node = node.parent
+				if curr:
+					if node.child and node.child.name == 'li':
+						node = node.child.prev
+					node+= MazNode('%sl' %(curr == '#' and 'o' or 'u',))
+					node = node.child.prev
+			node+= (MazNode('li') + MazNode(value=self.inline(value)))
+			ltprev = ltcurr
+		return self._li_trim.sub('', re_html.node2html(root.child, escape=False))
+
+
+
+def flat(count):
+	'''Return a list of `count` items'''
+	return u'\n'.join(u'* item %u with __some__ text' % i for i in range(count))
+
+
+def nested(count, depth):
+	'''Return a list of `count` items going up and down `depth` levels'''
+	levels = range(1, depth + 1) + range(depth - 1, 1, -1)
+	return u'\n'.join(
+		u'%s item %u' % (u'*' * levels[i % len(levels)], i)
+		for i in range(count)
+	)
+
+
+CASES = (
+	('flat 100', flat(100)),
+	('flat 1000', flat(1000)),
+	('flat 5000', flat(5000)),
+	('nested 1000 x 8', nested(1000, 8)),
+	('nested 1000 x 30', nested(1000, 30)),
+)
+
+
+def main(repeat=3):
+	single = re_html.Wiki2XHTML()
+	tree = TreeWiki2XHTML()
+	for name, data in CASES:
+		match = p_block.match(data)
+		assert match.lastgroup == 'list' and match.end() == len(data), name
+		assert single.b_list(match) == tree.b_list(match), name
+		print('%s (%u characters)' % (name, len(data)))
+		for label, function in (
+			('node tree', lambda: tree.b_list(match)),
+			('single pass', lambda: single.b_list(match)),
+		):
+			elapsed = min(timeit.repeat(function, number=1, repeat=repeat))
+			print('  %-12s %10.3f ms' % (label, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+	main(*map(int, sys.argv[1:]))
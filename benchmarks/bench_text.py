@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Text extraction: :class:`Wiki2Text` versus the XHTML translation
+
+The XHTML translation is measured alone and followed by a minimal HTML
+stripper (tags removed, entities decoded, spaces normalized), as text
+was extracted before :class:`Wiki2Text`; the tree rendered by
+:class:`renderers.TextRenderer` gives the same text as
+:class:`Wiki2Text`.
+
+Usage::
+	python benchmarks/bench_text.py [-s SIZE] [-r REPEAT] [corpus ...]
+'''
+import HTMLParser
+import optparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html, re_text, renderers, tree
+
+import corpus
+
+
+
+
+
+_tag = re.compile(r'<[^>]*>')
+_unescape = HTMLParser.HTMLParser().unescape
+
+def strip_html(html):
+	return u' '.join(_unescape(_tag.sub(u' ', html)).split())
+
+
+def main(argv=None):
+	parser = optparse.OptionParser(usage='%prog [options] [corpus ...]')
+	parser.add_option('-s', '--size', type='int', default=200000, help='characters per corpus [%default]')
+	parser.add_option('-r', '--repeat', type='int', default=3, help='runs per measure [%default]')
+	options, names = parser.parse_args(argv)
+	corpora = dict(corpus.CORPORA)
+	names = names or ['realistic', 'b_p', 'b_list', 'i_a', 'i_em']
+
+	xhtml = re_html.Wiki2XHTML()
+	text = re_text.Wiki2Text()
+	builder = tree.TreeBuilder()
+	renderer = renderers.TextRenderer()
+	for translator in (xhtml, text, builder):
+		translator.warn = lambda match, message: None
+	cases = (
+		('xhtml', xhtml.run),
+		('xhtml + strip', lambda document: strip_html(xhtml.run(document))),
+		('tree + text', lambda document: renderer.render(builder.parse(document))),
+		('Wiki2Text', text.run),
+	)
+	print('%-12s %-14s %10s %8s' % ('corpus', 'translation', 'ms', 'ratio'))
+	for name in names:
+		documents = corpora[name](random.Random(1), options.size)
+		reference = None
+		for label, function in cases:
+			elapsed = min(timeit.repeat(
+				lambda: [function(document) for document in documents],
+				number=1,
+				repeat=options.repeat,
+			))
+			if reference is None:
+				reference = elapsed
+			print('%-12s %-14s %10.1f %8.2f' % (name, label, elapsed * 1e3, elapsed / reference))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Generated Dotclear 1.2 corpora for the benchmarks
+
+Each generator takes a :class:`random.Random` instance and a size (in
+characters, approximately) and returns a list of documents.
+:data:`CORPORA` maps the corpus names to their generator: one per rule
+of :data:`re_parser.RULES_BLOCK` and :data:`re_parser.RULES_INLINE`,
+plus a realistic corpus built from ``docs/sample-1.2.txt``.
+'''
+import io
+import os
+
+
+
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+WORDS = (
+	u'lorem ipsum dolor sit amet consectetuer adipiscing elit sed diam '
+	u'nonummy nibh euismod tincidunt ut laoreet dolore magna aliquam erat '
+	u'volutpat \xe9t\xe9 \xe0 d\xe9j\xe0 na\xefve'
+).split()
+
+
+
+def words(rnd, count):
+	return u' '.join(rnd.choice(WORDS) for _ in range(count))
+
+
+def fill(function, size):
+	'''Call `function` until the total length reaches `size`'''
+	result = []
+	length = 0
+	while length < size:
+		result.append(function())
+		length+= len(result[-1])
+	return result
+
+
+def documents(rnd, size, block, per_document=20):
+	'''Return documents of `per_document` blocks made by `block(rnd)`'''
+	blocks = fill(lambda: block(rnd), size)
+	return [
+		u'\n\n'.join(blocks[i:i + per_document])
+		for i in range(0, len(blocks), per_document)
+	]
+
+
+
+##### realistic
+def realistic(rnd, size):
+	with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+		sections = fobj.read().split(u'\n\n')
+	return documents(rnd, size, lambda rnd: rnd.choice(sections), 40)
+
+
+##### blocks
+def b_p(rnd, size):
+	return documents(rnd, size, lambda rnd: u'\n'.join(words(rnd, 12) for _ in range(rnd.randint(1, 6))))
+
+def b_pre(rnd, size):
+	return documents(rnd, size, lambda rnd: u'\n'.join(u' ' + words(rnd, 8) for _ in range(rnd.randint(1, 10))))
+
+def b_xmp(rnd, size):
+	#? huge ``///`` blocks
+	return documents(rnd, size, lambda rnd: u'///\n%s\n///' % u'\n'.join(words(rnd, 10) for _ in range(500)), 2)
+
+def b_special(rnd, size):
+	return documents(rnd, size, lambda rnd: u'///html\n<p>%s</p>\n///' % words(rnd, 30))
+
+def b_list(rnd, size):
+	#? long and nested lists
+	def block(rnd):
+		prefix = u'*'
+		lines = []
+		for _ in range(rnd.randint(100, 1000)):
+			lines.append(u'%s %s' % (prefix, words(rnd, 6)))
+			prefix = rnd.choice((
+				prefix,
+				prefix + rnd.choice(u'*#'),
+				prefix[:-1] or u'*',
+			))[:8]
+		return u'\n'.join(lines)
+	return documents(rnd, size, block, 2)
+
+def b_head(rnd, size):
+	return documents(rnd, size, lambda rnd: u'%s%s' % (u'!' * rnd.randint(1, 4), words(rnd, 5)))
+
+def b_hr(rnd, size):
+	return documents(rnd, size, lambda rnd: u'----', 200)
+
+def b_blockquote(rnd, size):
+	#? long citations
+	return documents(rnd, size, lambda rnd: u'\n'.join(
+		u'> ' + (words(rnd, 10) if rnd.random() > .2 else u'')
+		for _ in range(rnd.randint(10, 200))
+	), 5)
+
+def b_nl(rnd, size):
+	return [u'\n' * 1000 + words(rnd, 5) for _ in range(max(1, size // 1000))]
+
+
+##### inlines
+def inline(markup):
+	'''Return a generator of link-heavy / markup-dense paragraphs'''
+	def generator(rnd, size):
+		return documents(rnd, size, lambda rnd: u' '.join(
+			markup(rnd) if rnd.random() > .5 else words(rnd, 2)
+			for _ in range(40)
+		))
+	return generator
+
+i_uri = inline(lambda rnd: u'http://www.example.net/%s?q=%s#top' % (rnd.choice(WORDS), rnd.choice(WORDS)))
+i_img = inline(lambda rnd: u'((/img/%s.png|%s|L|%s))' % (rnd.choice(WORDS), words(rnd, 2), words(rnd, 4)))
+i_escape = inline(lambda rnd: u'\\%s' % rnd.choice(u"'_@+-[]|{}()~%$?"))
+i_em = inline(lambda rnd: u"''%s''" % words(rnd, 3))
+i_strong = inline(lambda rnd: u'__%s__' % words(rnd, 3))
+i_br = inline(lambda rnd: u'%%%\n')
+i_anchor = inline(lambda rnd: u'~%s~' % rnd.choice(WORDS))
+i_a = inline(lambda rnd: u'[%s|http://example.net/%s|fr|%s]' % (words(rnd, 2), rnd.choice(WORDS), words(rnd, 3)))
+i_acronym = inline(lambda rnd: u'??%s|%s??' % (rnd.choice(WORDS).upper(), words(rnd, 3)))
+i_cite = inline(lambda rnd: u'{{%s|fr|http://example.net/}}' % words(rnd, 4))
+i_code = inline(lambda rnd: u'@@%s@@' % words(rnd, 3))
+i_ins = inline(lambda rnd: u'++%s++' % words(rnd, 3))
+i_del = inline(lambda rnd: u'--%s--' % words(rnd, 3))
+i_footnote = inline(lambda rnd: u'note$$%s$$' % words(rnd, 6))
+i_nested = inline(lambda rnd: u"__%s ''%s @@%s ++%s --%s [%s|url]--++@@''__" % tuple(words(rnd, 2) for _ in range(6)))
+
+
+
+CORPORA = (
+	('realistic', realistic),
+	('b_p', b_p),
+	('b_pre', b_pre),
+	('b_xmp', b_xmp),
+	('b_special', b_special),
+	('b_list', b_list),
+	('b_head', b_head),
+	('b_hr', b_hr),
+	('b_blockquote', b_blockquote),
+	('b_nl', b_nl),
+	('i_uri', i_uri),
+	('i_img', i_img),
+	('i_escape', i_escape),
+	('i_em', i_em),
+	('i_strong', i_strong),
+	('i_br', i_br),
+	('i_anchor', i_anchor),
+	('i_a', i_a),
+	('i_acronym', i_acronym),
+	('i_cite', i_cite),
+	('i_code', i_code),
+	('i_ins', i_ins),
+	('i_del', i_del),
+	('i_footnote', i_footnote),
+	('i_nested', i_nested),
+)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Import time of :mod:`dotclear`, measured in fresh interpreters
+
+Usage::
+	python benchmarks/import_time.py [-r REPEAT] [-o results.json]
+
+Each step is timed in a new process (``python -S -c ...``) so that no
+module is already imported: ``import dotclear`` alone, followed by the
+first translation of a short document, and followed by
+:func:`dotclear.warmup`. The best and the median of `REPEAT` processes
+are reported in milliseconds; with ``-o`` they are saved as JSON to
+compare versions.
+
+A first process, which is not timed, writes the bytecode of the
+modules, as for an installed package.
+'''
+import json
+import optparse
+import os
+import platform
+import subprocess
+import sys
+import time
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+import dotclear
+
+
+
+
+
+#? statement run after the import, in the timed code
+STEPS = (
+	('import', ''),
+	('first run', "dotclear.wiki2xhtml(u\"!Title\\n\\n''Dot''__Clear__ [link|http://example.org]\")"),
+	('warmup', 'dotclear.warmup()'),
+)
+
+SCRIPT = '''
+import sys, time
+sys.path.insert(0, %(path)r)
+start = time.time()
+import dotclear
+%(statement)s
+sys.stdout.write(repr(time.time() - start))
+'''
+
+
+
+
+
+def measure(statement, repeat):
+	'''Return the times of `repeat` processes importing :mod:`dotclear`
+	then running `statement`
+	'''
+	script = SCRIPT % {
+		'path': os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'),
+		'statement': statement,
+	}
+	command = [sys.executable, '-S', '-c', script]
+	environment = dict(os.environ)
+	environment.pop('PYTHONDONTWRITEBYTECODE', None)
+	subprocess.check_output(command, env=environment)
+	return [float(subprocess.check_output(command, env=environment)) for _ in range(repeat)]
+
+
+def main(argv=None):
+	parser = optparse.OptionParser(usage='%prog [options]')
+	parser.add_option('-r', '--repeat', type='int', default=20, help='processes per measure [%default]')
+	parser.add_option('-o', '--output', help='save the results as JSON')
+	options, arguments = parser.parse_args(argv)
+	if arguments:
+		parser.error('unexpected arguments')
+
+	results = []
+	print('%-10s %10s %10s' % ('step', 'best ms', 'median ms'))
+	for name, statement in STEPS:
+		times = sorted(measure(statement, options.repeat))
+		result = {
+			'step': name,
+			'best_ms': times[0] * 1e3,
+			'median_ms': times[len(times) // 2] * 1e3,
+		}
+		results.append(result)
+		print('%(step)-10s %(best_ms)10.2f %(median_ms)10.2f' % result)
+
+	if options.output:
+		with open(options.output, 'w') as fobj:
+			json.dump({
+				'version': dotclear.__version__,
+				'python': platform.python_version(),
+				'implementation': platform.python_implementation(),
+				'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+				'repeat': options.repeat,
+				'results': results,
+			}, fobj, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+'''Throughput of :meth:`Wiki2XHTML.run` on the generated corpora
+
+Usage::
+	python benchmarks/run.py [-s SIZE] [-r REPEAT] [-o results.json] [corpus ...]
+
+For each corpus of :data:`corpus.CORPORA` (all by default), translate
+every document with and without ``skip_blocks`` and report the best
+of `REPEAT` runs in MB/s (of UTF-8 input) and documents/s. The results
+are printed and, with ``-o``, saved as JSON to compare versions.
+'''
+import json
+import optparse
+import os
+import platform
+import random
+import sys
+import time
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+import dotclear
+from dotclear import re_html
+
+import corpus
+
+
+
+
+
+def measure(function, documents, repeat):
+	'''Return the best time of `repeat` calls of `function` on `documents`'''
+	best = None
+	for _ in range(repeat):
+		start = time.time()
+		for document in documents:
+			function(document)
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+
+def main(argv=None):
+	parser = optparse.OptionParser(usage='%prog [options] [corpus ...]')
+	parser.add_option('-s', '--size', type='int', default=200000, help='characters per corpus [%default]')
+	parser.add_option('-r', '--repeat', type='int', default=3, help='runs per measure [%default]')
+	parser.add_option('-o', '--output', help='save the results as JSON')
+	parser.add_option('--seed', type='int', default=1, help='random seed [%default]')
+	options, names = parser.parse_args(argv)
+	corpora = dict(corpus.CORPORA)
+	for name in names:
+		if name not in corpora:
+			parser.error('unknown corpus: %s' % name)
+	names = names or [name for name, _ in corpus.CORPORA]
+
+	translator = re_html.Wiki2XHTML()
+	translator.warn = lambda match, message: None
+	results = []
+	print('%-14s %-12s %10s %12s' % ('corpus', 'mode', 'MB/s', 'documents/s'))
+	for name in names:
+		documents = corpora[name](random.Random(options.seed), options.size)
+		size = sum(len(document.encode('utf8')) for document in documents)
+		for mode, skip_blocks in (('blocks', False), ('skip_blocks', True)):
+			elapsed = measure(
+				lambda document: translator.run(document, skip_blocks),
+				documents,
+				options.repeat,
+			)
+			result = {
+				'corpus': name,
+				'mode': mode,
+				'documents': len(documents),
+				'bytes': size,
+				'seconds': elapsed,
+				'mb_per_s': size / elapsed / 1e6,
+				'documents_per_s': len(documents) / elapsed,
+			}
+			results.append(result)
+			print('%(corpus)-14s %(mode)-12s %(mb_per_s)10.3f %(documents_per_s)12.1f' % result)
+
+	if options.output:
+		with open(options.output, 'w') as fobj:
+			json.dump({
+				'version': dotclear.__version__,
+				'python': platform.python_version(),
+				'implementation': platform.python_implementation(),
+				'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+				'size': options.size,
+				'seed': options.seed,
+				'repeat': options.repeat,
+				'results': results,
+			}, fobj, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+	main()
@@ -12,16 +12,28 @@ into another format (i.e.: html, restructured text, ...).
 .. _syntaxe-2.0: http://fr.dotclear.org/documentation/2.0/usage/syntaxes
 '''
 __version__ = '0.1'
-__all__ = ['wiki2xhtml']
+__all__ = ['warmup', 'wiki2xhtml', 'wiki2xhtml_many']
 
 
 
 
 
-from dotclear import re_html
+from dotclear import re_html, re_parser
 
 
 
 
 
 wiki2xhtml = re_html.Wiki2XHTML().run
+
+def wiki2xhtml_many(documents, **kwargs):
+	'''Translate many documents in parallel, see :func:`batch.translate_many`'''
+	#? imported on first use: :mod:`multiprocessing` is slow to import
+	from dotclear import batch
+	return batch.translate_many(documents, re_html.Wiki2XHTML, **kwargs)
+
+def warmup(*translators):
+	'''Compile the patterns and build the dispatch tables of
+	:func:`wiki2xhtml` and of `translators`, see :func:`re_parser.warmup`
+	'''
+	re_parser.warmup(wiki2xhtml.__self__, *translators)
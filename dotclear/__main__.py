@@ -0,0 +1,11 @@
+'''Entry point of ``python -m dotclear``, see :mod:`dotclear.cli`'''
+import sys
+
+
+from dotclear.cli import main
+
+
+
+
+
+sys.exit(main())
@@ -0,0 +1,103 @@
+'''Batch translation of many documents over a pool of processes
+
+Usage::
+	>>> for key, html, error in translate_many(posts, re_html.Wiki2XHTML):
+	...     if error:
+	...         log(key, error)
+
+The documents are sent to the workers by chunks of `chunksize`; a
+document whose translation raises an exception is reported in the
+``error`` field of its :class:`Result` and the batch goes on.
+'''
+__all__ = (
+	'Result',
+	'translate_many',
+)
+
+
+
+
+
+import collections
+import functools
+import itertools
+import multiprocessing
+import traceback
+
+
+
+
+
+#? `result` is the translation, `error` the formatted traceback on failure
+Result = collections.namedtuple('Result', ('key', 'result', 'error'))
+
+#? translator of the current worker process, see :func:`_initialize`
+_translator = None
+
+
+def _initialize(factory):
+	'''Build the translator of a worker process'''
+	global _translator
+	_translator = factory()
+
+
+def _work(function, item):
+	'''Call `function` with the translator of the worker process and `item`'''
+	return function(_translator, item)
+
+
+def _translate(translator, item):
+	'''Translate a ``(key, data)`` pair with `translator`'''
+	key, data = item
+	try:
+		return Result(key, translator.run(data), None)
+	except Exception:
+		return Result(key, None, traceback.format_exc())
+
+
+def _items(documents):
+	'''Yield ``(key, data)`` pairs; bare strings are keyed by their index'''
+	for index, item in enumerate(documents):
+		if isinstance(item, basestring):
+			yield index, item
+		else:
+			yield item
+
+
+def translate_many(documents, factory, processes=None, chunksize=32, ordered=True):
+	'''Translate `documents` and yield a :class:`Result` for each of them
+
+	Parameters:
+	- `documents`: iterable of strings or of ``(key, string)`` pairs
+	- `factory`: picklable callable returning a :class:`Translator`
+	  (i.e.: the translator class), called once in each worker
+	- `processes`: number of worker processes, default to the number of
+	  CPU; with ``1`` the documents are translated in the current
+	  process
+	- `chunksize`: number of documents sent at once to a worker
+	- `ordered`: yield the results in the order of `documents` if set,
+	  as they are completed otherwise
+	'''
+	for result in _run(_translate, _items(documents), factory, processes, chunksize, ordered):
+		yield result
+
+
+def _run(function, items, factory, processes=None, chunksize=32, ordered=True):
+	'''Yield the results of `function` called with a translator and each
+	of `items` by the workers, see :func:`translate_many`
+	'''
+	if processes == 1:
+		#? not the translator of the module: several batches may run at
+		#? once in the current process
+		translator = factory()
+		for result in itertools.imap(functools.partial(function, translator), items):
+			yield result
+		return
+	pool = multiprocessing.Pool(processes, _initialize, (factory,))
+	try:
+		mapper = pool.imap if ordered else pool.imap_unordered
+		for result in mapper(functools.partial(_work, function), items, chunksize):
+			yield result
+	finally:
+		pool.terminate()
+		pool.join()
@@ -0,0 +1,392 @@
+'''Compact binary serialization of the document trees
+
+Usage::
+	>>> data = dumps(tree.parse(u"__Dot__''Clear''"))
+	>>> renderers.XHTMLRenderer().render(loads(data))
+	u'<p><strong>Dot</strong><em>Clear</em></p>\n'
+	>>> with open('post.dct', 'rb') as fobj:
+	...     document = loads(mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ))
+
+The format (version :data:`FORMAT_VERSION`) is made of a header and of
+arrays of little-endian unsigned integers, each of them stored with the
+smallest width (1, 2 or 4 bytes) holding its values:
+
+- header: ``DCTB``, version, width of each array, number of nodes,
+  kinds, attributes and strings (``<4sB8sxxxIIII``)
+- kinds: the string of each node name
+- nodes, in document order: their kind, number of children and number
+  of attributes
+- attributes, in the order of the nodes: their key string, type and
+  value; the value of a string is its index in the table, an integer
+  is stored in place
+- strings: the offsets of each string in the data (plus the end
+  offset), then the UTF-8 data; the strings of :data:`_BUILTIN` (the
+  names and keys of the trees of :mod:`tree`) are not stored, their
+  index in this tuple is used (changing it requires a new version)
+
+:func:`loads` reads the structure of the tree and leaves the strings in
+`data` (``str``, ``bytearray``, ``memoryview`` or ``mmap``): the
+attributes of a node are decoded the first time they are read.
+'''
+__all__ = (
+	'FORMAT_VERSION',
+	'dump',
+	'dumps',
+	'load',
+	'loads',
+)
+
+
+
+
+
+import array
+import struct
+import sys
+
+
+from nodes import NodeTree
+
+
+
+
+
+FORMAT_VERSION = 1
+
+_MAGIC = 'DCTB'
+_HEADER = struct.Struct('<4sB8sxxxIIII')
+
+#? array types by width
+_WIDTHS = {
+	1: 'B',
+	2: 'H',
+	4: [code for code in 'IL' if array.array(code).itemsize == 4][0],
+}
+
+#? implicit strings, from index 0
+_BUILTIN = (
+	'',
+	'document', 'p', 'pre', 'xmp', 'special', 'head', 'hr', 'blockquote',
+	'list', 'ul', 'ol', 'li',
+	'em', 'strong', 'code', 'ins', 'del', 'br', 'anchor', 'acronym', 'a',
+	'uri', 'img', 'cite', 'escape', 'footnote',
+	'value', 'macro', 'html', 'level', 'name', 'title', 'href', 'lang',
+	'src', 'alt', 'align', 'desc', 'char',
+)
+
+#? types of the attribute values
+_UNICODE = 0
+_BYTES = 1
+_INT = 2
+_LONG = 3
+
+#? not decoded yet
+_PENDING = object()
+
+
+
+
+
+def _array(code, items=()):
+	return array.array(code, items)
+
+
+def _to_bytes(values):
+	'''Return the smallest width holding `values` and their bytes'''
+	width = 1
+	top = max(values) if values else 0
+	if top > 0xffff:
+		width = 4
+	elif top > 0xff:
+		width = 2
+	values = _array(_WIDTHS[width], values)
+	if sys.byteorder != 'little':
+		values.byteswap()
+	return width, values.tostring()
+
+
+def _from_bytes(width, data):
+	values = _array(_WIDTHS[width])
+	values.fromstring(data)
+	if sys.byteorder != 'little':
+		values.byteswap()
+	return values
+
+
+def _reader(data):
+	'''Return a function returning the bytes `start` to `end` of `data`'''
+	if isinstance(data, memoryview):
+		return lambda start, end: data[start:end].tobytes()
+	if isinstance(data, bytearray):
+		return lambda start, end: str(data[start:end])
+	return lambda start, end: data[start:end]
+
+
+
+class _Strings(object):
+	'''Table of the serialized strings'''
+	def __init__(self):
+		self.index = dict((value, index) for index, value in enumerate(_BUILTIN))
+		self.data = []
+
+	def add(self, value):
+		if isinstance(value, unicode):
+			value = value.encode('utf8')
+		index = self.index.get(value)
+		if index is None:
+			index = self.index[value] = len(_BUILTIN) + len(self.data)
+			self.data.append(value)
+		return index
+
+
+
+def _name(value):
+	'''Return the node name or key `value` as a byte string if it is
+	ASCII, as ``unicode`` otherwise
+	'''
+	try:
+		value.decode('ascii')
+	except UnicodeDecodeError:
+		return value.decode('utf8')
+	return value
+
+
+def _strings(read, positions, base):
+	'''Return a function returning the bytes of a string from its index'''
+	builtin = len(_BUILTIN)
+	def string(index):
+		if index < builtin:
+			return _BUILTIN[index]
+		index-= builtin
+		return read(base + positions[index], base + positions[index + 1])
+	return string
+
+
+
+def dumps(tree):
+	'''Return the serialization of `tree`, a :class:`nodes.NodeTree` (with
+	all its roots) or the root of a :class:`nodes.MazNode` tree
+
+	The node names and attribute keys are loaded as byte strings, unless
+	they are not ASCII; the attribute values may be ``unicode`` or byte
+	strings and integers.
+	'''
+	if not isinstance(tree, NodeTree):
+		node, tree = tree, NodeTree()
+		tree.load(node)
+	strings = _Strings()
+	kinds = {}
+	node_kinds = []
+	counts = []
+	attribute_counts = []
+	keys = []
+	types = []
+	values = []
+	names = tree.names
+	attrs = tree.attrs
+	children = tree.children
+	#? document order
+	stack = [iter(tree.roots)]
+	while stack:
+		for node in stack[-1]:
+			break
+		else:
+			stack.pop()
+			continue
+		name = names[node]
+		if isinstance(name, unicode):
+			name = name.encode('utf8')
+		kind = kinds.get(name)
+		if kind is None:
+			kind = kinds[name] = len(kinds)
+		node_kinds.append(kind)
+		nodes = children[node]
+		counts.append(len(nodes) if nodes else 0)
+		attributes = attrs[node] or {}
+		attribute_counts.append(len(attributes))
+		for key, value in sorted(attributes.iteritems()):
+			if isinstance(value, unicode):
+				kind, value = _UNICODE, strings.add(value)
+			elif isinstance(value, str):
+				kind, value = _BYTES, strings.add(value)
+			elif isinstance(value, (int, long)):
+				if -1<<31 <= value < 1<<31:
+					kind, value = _INT, value & 0xffffffff
+				else:
+					kind, value = _LONG, strings.add(str(value))
+			else:
+				raise TypeError('can not serialize the attribute %r: %r' % (key, value))
+			keys.append(strings.add(key))
+			types.append(kind)
+			values.append(value)
+		if nodes:
+			stack.append(iter(nodes))
+
+	table = [0] * len(kinds)
+	for name, kind in kinds.iteritems():
+		table[kind] = strings.add(name)
+	positions = [0]
+	for value in strings.data:
+		positions.append(positions[-1] + len(value))
+	widths, sections = zip(*map(_to_bytes, (
+		table,
+		node_kinds,
+		counts,
+		attribute_counts,
+		keys,
+		types,
+		values,
+		positions,
+	)))
+	return ''.join((
+		_HEADER.pack(
+			_MAGIC,
+			FORMAT_VERSION,
+			''.join(map(chr, widths)),
+			len(node_kinds),
+			len(kinds),
+			len(keys),
+			len(strings.data),
+		),
+	) + sections + (''.join(strings.data),))
+
+
+def dump(tree, fobj):
+	'''Write the serialization of `tree` to the binary file `fobj`'''
+	fobj.write(dumps(tree))
+
+
+
+class _Attributes(object):
+	'''Attributes of the nodes of a loaded tree (in place of the list of
+	:attr:`NodeTree.attrs`), decoded on first access
+	'''
+	__slots__ = ('_items', '_string', '_offsets', '_attributes', '_keys')
+
+	def __init__(self, string, offsets, attributes):
+		self._items = [_PENDING] * (len(offsets) - 1)
+		#? see :func:`_strings`
+		self._string = string
+		#? index of the first attribute of each node, plus the end
+		self._offsets = offsets
+		#? keys, types and values
+		self._attributes = attributes
+		#? decoded keys, by string index
+		self._keys = {}
+
+	def _decode(self, node):
+		keys, types, values = self._attributes
+		start = self._offsets[node]
+		end = self._offsets[node + 1]
+		if start == end:
+			return None
+		result = {}
+		for i in xrange(start, end):
+			key = self._keys.get(keys[i])
+			if key is None:
+				key = self._keys[keys[i]] = _name(self._string(keys[i]))
+			kind, value = types[i], values[i]
+			if kind == _UNICODE:
+				value = self._string(value).decode('utf8')
+			elif kind == _BYTES:
+				value = self._string(value)
+			elif kind == _INT:
+				value = int(value - (1<<32) if value >= 1<<31 else value)
+			elif kind == _LONG:
+				value = long(self._string(value))
+			else:
+				raise ValueError('invalid attribute type: %r' % kind)
+			result[key] = value
+		return result
+
+	def __len__(self):
+		return len(self._items)
+
+	def __getitem__(self, node):
+		value = self._items[node]
+		if value is _PENDING:
+			value = self._items[node] = self._decode(node)
+		return value
+
+	def __setitem__(self, node, value):
+		self._items[node] = value
+
+	def __iter__(self):
+		for node in xrange(len(self._items)):
+			yield self[node]
+
+	def append(self, value):
+		self._items.append(value)
+
+
+
+def loads(data):
+	'''Return the :class:`nodes.NodeTree` serialized in `data`
+
+	`data` is kept by the tree until all the attributes have been read.
+	'''
+	read = _reader(data)
+	header = read(0, _HEADER.size)
+	if len(header) < _HEADER.size or header[:4] != _MAGIC:
+		raise ValueError('not a serialized tree')
+	_, version, widths, count, kind_count, attribute_count, string_count = _HEADER.unpack(header)
+	if version != FORMAT_VERSION:
+		raise ValueError('unsupported format version: %u' % version)
+	widths = iter(map(ord, widths))
+	position = [_HEADER.size]
+	def section(length):
+		width = next(widths)
+		if width not in _WIDTHS:
+			raise ValueError('invalid width: %r' % width)
+		start = position[0]
+		position[0]+= width * length
+		values = read(start, position[0])
+		if len(values) != width * length:
+			raise ValueError('truncated data')
+		return _from_bytes(width, values)
+	table = section(kind_count)
+	node_kinds = section(count)
+	counts = section(count)
+	attribute_counts = section(count)
+	attributes = section(attribute_count), section(attribute_count), section(attribute_count)
+	positions = section(string_count + 1)
+	base = position[0]
+	if positions[-1] and len(read(base + positions[-1] - 1, base + positions[-1])) != 1:
+		raise ValueError('truncated data')
+
+	tree = NodeTree()
+	string = _strings(read, positions, base)
+	kinds = [_name(string(index)) for index in table]
+	tree.names = [kinds[kind] for kind in node_kinds]
+	parents = tree.parents = _array('l', (-1,)) * count
+	places = tree.positions = _array('l', (0,)) * count
+	offsets = _array('l', (0,)) * (count + 1)
+	children = tree.children = [None] * count
+	#? ancestors of the node being read: (parent, its children, number of
+	#? children left), -1 children left for the roots
+	stack = []
+	parent, siblings, left = -1, tree.roots, -1
+	offset = 0
+	for node in xrange(count):
+		parents[node] = parent
+		places[node] = len(siblings)
+		siblings.append(node)
+		offset+= attribute_counts[node]
+		offsets[node + 1] = offset
+		left-= 1
+		if counts[node]:
+			stack.append((parent, siblings, left))
+			parent, siblings, left = node, [], counts[node]
+			children[node] = siblings
+		else:
+			while left == 0:
+				parent, siblings, left = stack.pop()
+	if stack or offset != attribute_count:
+		raise ValueError('invalid tree')
+	tree.attrs = _Attributes(string, offsets, attributes)
+	return tree
+
+
+def load(fobj):
+	'''Return the :class:`nodes.NodeTree` read from the binary file `fobj`'''
+	return loads(fobj.read())
@@ -0,0 +1,208 @@
+'''Content-addressed cache of translations
+
+Usage::
+	>>> cache = RenderCache(re_html.Wiki2XHTML(), store=SQLiteStore('w2x.db'))
+	>>> cache.run(u'__Dot__Clear')
+	u'<p><strong>Dot</strong>Clear</p>\n'
+
+Translations are keyed by a hash of the source text, the translator
+class, the rules it scans and the options of :meth:`Translator.run`;
+the most recently used
+are kept in memory and, optionally, every translation is saved in a
+persistent store.
+'''
+__all__ = (
+	'DirectoryStore',
+	'RenderCache',
+	'SQLiteStore',
+)
+
+
+
+
+
+import collections
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+
+
+
+
+
+class RenderCache(object):
+	'''Wrap a translator :meth:`Translator.run` with a LRU cache
+
+	Parameters:
+	- `translator`: :class:`Translator` instance
+	- `maxsize`: number of translations kept in memory
+	- `store`: optional persistent store (:class:`DirectoryStore`,
+	  :class:`SQLiteStore` or any object with the same ``get`` and
+	  ``set`` methods), queried on memory misses
+	- `salt`: added to the keys, change it to invalidate a store
+
+	The keys cover the class of the translator and the rules it scans
+	(see :attr:`Translator.rules`), not the other attributes set on the
+	instance (handlers given to :meth:`Translator.register`, a
+	:attr:`re_html.Wiki2XHTML.link_policy`, ...): a translator with such
+	attributes is refused (:class:`ValueError` on :meth:`RenderCache.run`)
+	unless a `salt` is given, which must then identify them.
+
+	The counters :attr:`hits`, :attr:`store_hits`, :attr:`misses` and
+	:attr:`evictions` are returned by :meth:`stats`.
+	'''
+	#? attributes of the translator instances which do not change the
+	#? translations (besides the private ones), or which are keyed
+	neutral = frozenset(('diagnostics', 'stats', 'max_size', 'max_time', 'warn', 'rules', 'restricted'))
+
+	def __init__(self, translator, maxsize=1024, store=None, salt=None):
+		self.translator = translator
+		self.maxsize = maxsize
+		self.store = store
+		self.salt = salt
+		self.hits = self.store_hits = self.misses = self.evictions = 0
+		self._lru = collections.OrderedDict()
+		self._lock = threading.Lock()
+		self._prefix = '%s.%s\0%s\0' % (
+			translator.__class__.__module__,
+			translator.__class__.__name__,
+			salt or '',
+		)
+		#? grammar of the translator and its names, see :meth:`RenderCache.key`
+		self._names = (None, None)
+
+	def key(self, data, skip_blocks=False):
+		'''Return the key of the translation of `data`
+
+		Raise :class:`ValueError` if the translator can not be keyed, see
+		:class:`RenderCache`.
+		'''
+		translator = self.translator
+		if self.salt is None:
+			for name in translator.__dict__:
+				if name[0] != '_' and name not in self.neutral:
+					raise ValueError('%r set on the translator instance: give a salt identifying it' % name)
+		grammar, names = self._names
+		if grammar is not translator._grammar:
+			grammar = translator._grammar
+			names = '*' if grammar.names is None else ','.join(sorted(grammar.names))
+			self._names = grammar, names
+		digest = hashlib.sha1(self._prefix)
+		digest.update('%s\0%d\0' % (names, bool(skip_blocks)))
+		digest.update(data.encode('utf8'))
+		return digest.hexdigest()
+
+	def run(self, data, skip_blocks=False):
+		'''Same as :meth:`Translator.run`, cached'''
+		if not isinstance(data, unicode):
+			data = unicode(data)
+		key = self.key(data, skip_blocks)
+		with self._lock:
+			result = self._lru.pop(key, None)
+			if result is not None:
+				self.hits+= 1
+				self._lru[key] = result
+				return result
+		if self.store is not None:
+			result = self.store.get(key)
+		missed = result is None
+		if missed:
+			result = self.translator.run(data, skip_blocks)
+			if self.store is not None:
+				self.store.set(key, result)
+		with self._lock:
+			if missed:
+				self.misses+= 1
+			else:
+				self.store_hits+= 1
+			if self.maxsize <= 0:
+				return result
+			if key in self._lru:
+				# translated meanwhile by another thread
+				del self._lru[key]
+			elif len(self._lru) >= self.maxsize:
+				self._lru.popitem(last=False)
+				self.evictions+= 1
+			self._lru[key] = result
+		return result
+
+	def stats(self):
+		'''Return the counters and the number of translations in memory'''
+		return {
+			'hits': self.hits,
+			'store_hits': self.store_hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'size': len(self._lru),
+			'maxsize': self.maxsize,
+		}
+
+	def clear(self):
+		'''Empty the memory cache and reset the counters'''
+		with self._lock:
+			self._lru.clear()
+			self.hits = self.store_hits = self.misses = self.evictions = 0
+
+
+
+class DirectoryStore(object):
+	'''Store each translation in a file of `path`, named after its key'''
+	def __init__(self, path):
+		self.path = path
+
+	def _filename(self, key):
+		return os.path.join(self.path, key[:2], key[2:])
+
+	def get(self, key):
+		'''Return the translation saved as `key` or ``None``'''
+		try:
+			with io.open(self._filename(key), 'rt', encoding='utf8', newline='') as fobj:
+				return fobj.read()
+		except IOError:
+			return None
+
+	def set(self, key, value):
+		'''Save the translation `value` as `key`, atomically'''
+		filename = self._filename(key)
+		directory = os.path.dirname(filename)
+		if not os.path.isdir(directory):
+			try:
+				os.makedirs(directory)
+			except OSError:
+				if not os.path.isdir(directory):
+					raise
+		fd, temp = tempfile.mkstemp(dir=directory)
+		try:
+			with io.open(fd, 'wt', encoding='utf8', newline='') as fobj:
+				fobj.write(value)
+			os.rename(temp, filename)
+		except:
+			os.unlink(temp)
+			raise
+
+
+
+class SQLiteStore(object):
+	'''Store the translations in a SQLite database at `path`'''
+	def __init__(self, path):
+		self._lock = threading.Lock()
+		self._db = sqlite3.connect(path, check_same_thread=False)
+		self._db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT)')
+
+	def get(self, key):
+		'''Return the translation saved as `key` or ``None``'''
+		with self._lock:
+			row = self._db.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+		return row[0] if row else None
+
+	def set(self, key, value):
+		'''Save the translation `value` as `key`'''
+		with self._lock:
+			with self._db:
+				self._db.execute('INSERT OR REPLACE INTO cache VALUES (?, ?)', (key, value))
+
+	def close(self):
+		self._db.close()
@@ -0,0 +1,264 @@
+'''Command line conversion of files, directory trees or standard input
+
+Usage::
+	python -m dotclear [options] [path ...]
+
+	$ python -m dotclear < post.txt > post.html
+	$ python -m dotclear -j 4 -o html/ posts/
+	12000 converted, 0 skipped, 0 failed: 48.211 MB in 9.84 s (4.899 MB/s, 1219.5 files/s)
+
+Each `path` is a file, converted whatever its name, or a directory whose
+files ending with the input extension (``.txt``) are converted,
+recursively; without `path` (or with ``-``) the standard input is
+converted to the standard output.
+
+The output of a file is written next to it, its extension replaced by
+the output extension (``.html``), or in the output directory (``-o``),
+in the same tree as in the converted directory. It is written to a
+temporary file renamed once complete: a reader never sees a partial
+translation.
+
+The files are read through :mod:`mmap` and translated by a pool of
+worker processes (``-j``). A file is skipped when its output is not
+older than it (``--skip mtime``, the default) or when its content has
+not changed since its last conversion (``--skip hash``: the SHA-1 of
+the converted files are kept in a manifest). A summary is written to
+the standard error at the end; the exit status is 1 if a file could not
+be converted.
+'''
+__all__ = (
+	'convert',
+	'main',
+)
+
+
+
+
+
+import hashlib
+import json
+import mmap
+import optparse
+import os
+import sys
+import tempfile
+import time
+
+
+import batch
+
+
+
+
+
+#? name of the manifest of ``--skip hash``, in the output directory
+MANIFEST = '.dotclear-manifest.json'
+
+SKIP_MODES = ('mtime', 'hash', 'none')
+
+
+
+
+
+def _factory(name):
+	'''Return the translator class named `name` (``module:Class``)'''
+	module, _, attribute = name.rpartition(':')
+	if not module:
+		raise ValueError('invalid translator %r, expected module:Class' % name)
+	return getattr(__import__(module, fromlist=[attribute]), attribute)
+
+
+def _write(path, data):
+	'''Write `data` (bytes) to `path` atomically'''
+	directory = os.path.dirname(path) or os.curdir
+	if not os.path.isdir(directory):
+		try:
+			os.makedirs(directory)
+		except OSError:
+			if not os.path.isdir(directory):
+				raise
+	fd, temp = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+	try:
+		with os.fdopen(fd, 'wb') as fobj:
+			fobj.write(data)
+		#? :func:`tempfile.mkstemp` creates the file readable by its owner only
+		mask = os.umask(0)
+		os.umask(mask)
+		os.chmod(temp, 0666 & ~mask)
+		os.rename(temp, path)
+	except:
+		os.unlink(temp)
+		raise
+
+
+def _outdated(source, target):
+	'''Return whether `target` is missing or older than `source`'''
+	try:
+		return os.stat(target).st_mtime < os.stat(source).st_mtime
+	except OSError:
+		return True
+
+
+def _jobs(paths, output, extension, output_extension):
+	'''Yield the ``(source, target)`` pairs of the files of `paths`'''
+	for path in paths:
+		if os.path.isdir(path):
+			root = path
+			names = []
+			for directory, subdirectories, files in os.walk(path):
+				subdirectories.sort()
+				names.extend(
+					os.path.relpath(os.path.join(directory, name), path)
+					for name in sorted(files)
+					if name.endswith(extension)
+				)
+		else:
+			root, name = os.path.split(path)
+			names = [name]
+		for name in names:
+			target = os.path.splitext(name)[0] + output_extension
+			yield os.path.join(root, name), os.path.join(root if output is None else output, target)
+
+
+def _convert(translator, job):
+	'''Convert a file with `translator` (see :func:`batch.translate_many`)
+
+	`job` is ``(source, target, encoding, skip_blocks, skip, digest)``,
+	`digest` being the SHA-1 of the last conversion of `source` or
+	``None`` (with ``--skip hash``).
+
+	Return ``(source, status, size, digest, error)``: the status is
+	``converted``, ``skipped`` or ``failed`` (`error` is the message).
+	'''
+	source, target, encoding, skip_blocks, skip, digest = job
+	size = 0
+	try:
+		if os.path.realpath(source) == os.path.realpath(target):
+			raise ValueError('the output would replace the source')
+		if skip == 'mtime' and not _outdated(source, target):
+			return source, 'skipped', os.path.getsize(source), None, None
+		with open(source, 'rb') as fobj:
+			size = os.fstat(fobj.fileno()).st_size
+			#? an empty file can not be mapped
+			data = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ) if size else ''
+			try:
+				if skip == 'hash':
+					cls = translator.__class__
+					current = hashlib.sha1('%s.%s\0%d\0' % (
+						cls.__module__,
+						cls.__name__,
+						bool(skip_blocks),
+					))
+					current.update(data)
+					current = current.hexdigest()
+					if current == digest and os.path.exists(target):
+						return source, 'skipped', size, digest, None
+					digest = current
+				text = unicode(data, encoding)
+			finally:
+				if size:
+					data.close()
+		result = translator.run(text, skip_blocks)
+		_write(target, result.encode(encoding))
+	except Exception, e:
+		return source, 'failed', size, None, '%s: %s' % (e.__class__.__name__, e)
+	return source, 'converted', size, digest, None
+
+
+def convert(jobs, factory, processes=None, encoding='utf-8', skip_blocks=False, skip='mtime', manifest=MANIFEST):
+	'''Convert the files of `jobs` and yield the result of each of them
+
+	Parameters:
+	- `jobs`: iterable of ``(source, target)`` paths
+	- `factory`: see :func:`batch.translate_many`
+	- `processes`: number of worker processes, see
+	  :func:`batch.translate_many`
+	- `encoding`: of the sources and of the targets
+	- `skip_blocks`: see :meth:`Translator.run`
+	- `skip`: one of :data:`SKIP_MODES`
+	- `manifest`: path of the manifest of the ``hash`` mode, updated
+	  once the iteration is over
+
+	The results are ``(source, status, size, error)`` tuples, in the
+	order of completion: the status is ``converted``, ``skipped`` or
+	``failed`` (`error` is the message), `size` is the size of the
+	source in bytes.
+	'''
+	if skip not in SKIP_MODES:
+		raise ValueError('invalid skip mode: %r' % skip)
+	digests = {}
+	if skip == 'hash':
+		try:
+			with open(manifest, 'rb') as fobj:
+				digests = json.load(fobj)
+		except IOError:
+			pass
+	items = (
+		(source, target, encoding, skip_blocks, skip, digests.get(os.path.abspath(source)))
+		for source, target in jobs
+	)
+	try:
+		for source, status, size, digest, error in batch._run(_convert, items, factory, processes, 4, False):
+			if digest is not None:
+				digests[os.path.abspath(source)] = digest
+			yield source, status, size, error
+	finally:
+		if skip == 'hash':
+			_write(manifest, json.dumps(digests, indent=1, separators=(',', ': '), sort_keys=True))
+
+
+def main(argv=None):
+	parser = optparse.OptionParser(usage='%prog [options] [path ...]')
+	parser.add_option('-o', '--output', help='output directory [next to the sources]')
+	parser.add_option('-e', '--extension', default='.txt', help='extension of the files converted in the directories [%default]')
+	parser.add_option('-x', '--output-extension', default='.html', help='extension of the outputs [%default]')
+	parser.add_option('-j', '--jobs', type='int', help='number of worker processes [number of CPU]')
+	parser.add_option('-s', '--skip', choices=SKIP_MODES, default='mtime', help='skip the unchanged files: %s [%%default]' % ', '.join(SKIP_MODES))
+	parser.add_option('-m', '--manifest', help='manifest of --skip hash [OUTPUT/%s]' % MANIFEST)
+	parser.add_option('-t', '--translator', default='dotclear.re_html:Wiki2XHTML', help='translator class, as module:Class [%default]')
+	parser.add_option('-b', '--skip-blocks', action='store_true', help='translate the inline elements only')
+	parser.add_option('--encoding', default='utf-8', help='encoding of the inputs and outputs [%default]')
+	parser.add_option('-q', '--quiet', action='store_true', help='do not print the summary')
+	options, paths = parser.parse_args(argv)
+	try:
+		factory = _factory(options.translator)
+	except (ImportError, AttributeError, ValueError), e:
+		parser.error('can not load the translator: %s' % e)
+
+	if not paths or paths == ['-']:
+		data = sys.stdin.read().decode(options.encoding)
+		sys.stdout.write(factory().run(data, options.skip_blocks).encode(options.encoding))
+		return 0
+	if '-' in paths:
+		parser.error('the standard input can not be converted with files')
+
+	manifest = options.manifest or os.path.join(options.output or os.curdir, MANIFEST)
+	counts = dict.fromkeys(('converted', 'skipped', 'failed'), 0)
+	size = 0
+	start = time.time()
+	for source, status, length, error in convert(
+		_jobs(paths, options.output, options.extension, options.output_extension),
+		factory,
+		options.jobs,
+		options.encoding,
+		options.skip_blocks,
+		options.skip,
+		manifest,
+	):
+		counts[status]+= 1
+		if status == 'converted':
+			size+= length
+		elif error:
+			sys.stderr.write('%s: %s\n' % (source, error))
+	elapsed = max(time.time() - start, 1e-6)
+	if not options.quiet:
+		sys.stderr.write('%u converted, %u skipped, %u failed: %.3f MB in %.2f s (%.3f MB/s, %.1f files/s)\n' % (
+			counts['converted'],
+			counts['skipped'],
+			counts['failed'],
+			size / 1e6,
+			elapsed,
+			size / 1e6 / elapsed,
+			counts['converted'] / elapsed,
+		))
+	return 1 if counts['failed'] else 0
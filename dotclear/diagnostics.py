@@ -0,0 +1,116 @@
+'''Warnings of the translators
+
+Usage::
+	>>> result, diagnostics = re_html.Wiki2XHTML().diagnose(u'a$$note$$ b$$note$$')
+	>>> list(diagnostics)
+	[Diagnostic(rule='footnote', start=1, end=9, message='missing inline handler: Wiki2XHTML.i_footnote()'), ...]
+	>>> dump(diagnostics)
+	   count rule         message
+	       2 footnote     missing inline handler: Wiki2XHTML.i_footnote()
+
+A translator reports its warnings to its :attr:`Translator.diagnostics`
+collector, if any, through :meth:`Translator.warn`; when nobody listens
+(no collector and the default :meth:`Translator.warn`), the warnings are
+not even formatted.
+
+The renderers of :mod:`renderers` report theirs the same way, through
+:attr:`Renderer.diagnostics` and :meth:`Renderer.warn`.
+'''
+__all__ = (
+	'Diagnostic',
+	'Diagnostics',
+	'dump',
+)
+
+
+
+
+
+import collections
+import sys
+
+
+
+
+
+#? a warning, `start` and `end` being the span of the match in the text
+#? it was searched in (i.e.: the content of a block for an inline)
+Diagnostic = collections.namedtuple('Diagnostic', ('rule', 'start', 'end', 'message'))
+
+
+
+class Diagnostics(object):
+	'''Warnings collected by a :class:`Translator`
+
+	Parameters:
+	- `limit`: maximum number of :class:`Diagnostic` kept in
+	  :attr:`records` (and passed to `callback`) for each distinct rule
+	  and message, ``None`` for no limit
+	- `callback`: called with each kept :class:`Diagnostic`
+
+	Every warning is counted in :attr:`counts`, by ``(rule, message)``;
+	:attr:`dropped` is the number of warnings over the `limit`.
+
+	.. Note::
+	   The counters are not locked: use one collector per thread.
+	'''
+	def __init__(self, limit=10, callback=None):
+		self.limit = limit
+		self.callback = callback
+		self.records = []
+		self.counts = collections.defaultdict(int)
+		self.dropped = 0
+
+	def add(self, rule, start, end, message):
+		'''Record a warning'''
+		key = rule, message
+		count = self.counts[key] = self.counts[key] + 1
+		if self.limit is not None and count > self.limit:
+			self.dropped+= 1
+			return
+		diagnostic = Diagnostic(rule, start, end, message)
+		self.records.append(diagnostic)
+		if self.callback is not None:
+			self.callback(diagnostic)
+
+	def __len__(self):
+		'''Return the number of warnings, including the dropped ones'''
+		return len(self.records) + self.dropped
+
+	def __iter__(self):
+		return iter(self.records)
+
+	def __nonzero__(self):
+		return bool(self.counts)
+
+	def reset(self):
+		'''Forget the warnings'''
+		del self.records[:]
+		self.counts.clear()
+		self.dropped = 0
+
+	def as_dict(self):
+		'''Return the warnings as a dictionary (i.e.: to save it as JSON)'''
+		return {
+			'records': [diagnostic._asdict() for diagnostic in self.records],
+			'counts': [
+				{'rule': rule, 'message': message, 'count': count}
+				for (rule, message), count in sorted(self.counts.iteritems())
+			],
+			'dropped': self.dropped,
+		}
+
+
+
+def dump(diagnostics, out=None):
+	'''Write the number of each distinct warning of `diagnostics` to `out`
+	(default: :data:`sys.stderr`), the most frequent first
+	'''
+	if out is None:
+		out = sys.stderr
+	out.write('%8s %-12s %s\n' % ('count', 'rule', 'message'))
+	for (rule, message), count in sorted(
+		diagnostics.counts.iteritems(),
+		key=lambda item: (-item[1], item[0])
+	):
+		out.write('%8u %-12s %s\n' % (count, rule, message))
@@ -0,0 +1,474 @@
+'''Event stream of the documents, without translation nor tree
+
+Usage::
+	>>> for event, kind, attrs, span in iter_events(u"[Dot|http://dotclear.org/] ''Clear''"):
+	...     print event, kind, attrs, span
+	1 document {} (0, 0)
+	1 p {} (0, 0)
+	1 a {'href': u'http://dotclear.org/'} (0, 1)
+	4 None Dot (1, 4)
+	2 a {'href': u'http://dotclear.org/'} (4, 26)
+	4 None   (26, 27)
+	1 em {} (27, 29)
+	4 None Clear (29, 34)
+	2 em {} (34, 36)
+	2 p {} (36, 36)
+	2 document {} (36, 36)
+
+The events are ``(event, kind, attrs, span)`` tuples, in the order of
+the document:
+
+- `event` is :data:`ENTER` or :data:`LEAVE` an element, :data:`EMPTY`
+  for an element without content (``ENTER|LEAVE``, as by
+  :meth:`nodes.MazNode.descend`) or :data:`TEXT`;
+- `kind` is the name of the element, ``None`` for a text;
+- `attrs` the attributes of the element (not to be modified), the
+  ``unicode`` text of a text;
+- `span` the ``(start, end)`` offsets in the input: of the markup
+  opening (with :data:`ENTER`) or closing (with :data:`LEAVE`) the
+  element, which may be empty, of the whole element with :data:`EMPTY`
+  and of the text.
+
+The elements and their attributes are the nodes of the trees of
+:mod:`tree` (the content of a ``pre`` and of a ``blockquote`` being
+parsed without the first space and ``>`` of the lines, the offsets of
+its events are those of the input). The input is parsed block by block
+as by :meth:`Translator.iter_run`: the events are generated as the
+input is read and the memory used does not depend on its size.
+'''
+__all__ = (
+	'EMPTY',
+	'ENTER',
+	'EventParser',
+	'LEAVE',
+	'TEXT',
+	'iter_events',
+)
+
+
+
+
+
+import bisect
+import itertools
+
+
+from nodes import EMPTY, ENTER, LEAVE
+from re_html import Wiki2XHTML
+from re_parser import Translator, iter_blocks, iter_lines
+
+
+
+
+
+TEXT = 4
+
+_no_attributes = {}
+
+#? attributes of the ``document`` parsed with `skip_blocks`, see :mod:`tree`
+_inline_document = {'inline': 1}
+
+
+
+
+
+def _stripped(pattern, text, base):
+	'''Return `text` without the matches of `pattern` and the function
+	returning the offset in the input of an offset in the result (`text`
+	starting at `base` in the input)
+	'''
+	pieces = []
+	#? start of each piece in the result and in the input
+	starts = [0]
+	sources = [base]
+	last = length = 0
+	for match in pattern.finditer(text):
+		pieces.append(text[last:match.start()])
+		length+= match.start() - last
+		last = match.end()
+		starts.append(length)
+		sources.append(base + last)
+	pieces.append(text[last:])
+	def offset(position):
+		index = bisect.bisect_right(starts, position) - 1
+		return sources[index] + position - starts[index]
+	return u''.join(pieces), offset
+
+
+def _shifted(offset, shift):
+	'''Return the offset function of a part of a text starting at `shift`'''
+	return lambda position: offset(shift + position)
+
+
+def _attributes(**attr):
+	'''Return the non-empty attributes of `attr`'''
+	for key, value in attr.items():
+		if not value:
+			del attr[key]
+	return attr or _no_attributes
+
+
+
+class EventParser(Translator):
+	'''Translator generating the events of a document
+
+	The handlers add the events of their match to the events of the
+	block being parsed, instead of returning its translation.
+	'''
+	def __init__(self):
+		self._events = []
+		#? ENTER event not added yet, EMPTY if the LEAVE event follows
+		self._pending = None
+		#? function returning the offset in the input of an offset in the
+		#? text whose inline elements are parsed
+		self._offset = None
+		#? offset of the window of the input being parsed and end of the
+		#? last block, see :meth:`EventParser.blocks`
+		self._base = self._position = 0
+
+	def iter_events(self, source, encoding='utf-8', skip_blocks=False):
+		'''Yield the events of `source`
+
+		Parameters:
+		- `source`: a file-like object, an iterable of strings or a
+		  string, see :func:`re_parser.iter_lines`
+		- `encoding`: encoding of the non-``unicode`` input
+		- `skip_blocks`: see :meth:`Translator.run`; the whole input is
+		  read first
+		'''
+		self.__init__()
+		document = _inline_document if skip_blocks else _no_attributes
+		self._enter('document', document, 0, 0)
+		if skip_blocks:
+			data = u''.join(iter_lines(source, encoding))
+			self._check_size(len(data))
+			self._until(self._deadline(), self._inline, data, lambda position: position)
+			size = len(data)
+		else:
+			for event in self._iter_blocks(source, encoding):
+				yield event
+			size = self._position
+		self._leave('document', document, size, size)
+		events, self._events = self._events, []
+		for event in events:
+			yield event
+
+	def _iter_blocks(self, source, encoding):
+		'''Parse `source` block by block, yielding the events of each'''
+		scan = self._scanner()
+		data = u''
+		#? see :meth:`Translator.iter_run`
+		last = start = 0
+		replaced = False
+		size = 0
+		deadline = self._deadline()
+		for chunk in itertools.chain(iter_blocks(source, encoding), (None,)):
+			limit = len(data)
+			if chunk is not None:
+				data+= chunk
+				size+= len(chunk)
+				self._check_size(size)
+			_, last, start, replaced = scan(data, limit, last, start, replaced, chunk is None, deadline)
+			if chunk is not None:
+				drop = max(0, min(last, start) - 2)
+				data = data[drop:]
+				last-= drop
+				start-= drop
+				self._base+= drop
+			else:
+				self._gap(data, len(data))
+			events, self._events = self._events, []
+			for event in events:
+				yield event
+
+	def _gap(self, data, end):
+		'''Add the text of the window `data` from the end of the last
+		block to `end`
+		'''
+		start = self._position - self._base
+		if end > start:
+			self._text(data[start:end], self._position, self._base + end)
+			self._position = self._base + end
+
+	def blocks(self, match):
+		'''Add the events of the text before the block `match` and of the
+		block, see :meth:`Translator.blocks`
+		'''
+		self._gap(match.string, match.start())
+		handler = self._block_handlers[match.lastindex]
+		if handler is not None:
+			handler(match)
+		else:
+			self._warning(match, 'missing block handler: %s.b_%s()', self.__class__.__name__, match.lastgroup)
+			self._text(match.group(), self._base + match.start(), self._base + match.end())
+		self._position = self._base + match.end()
+		return u''
+
+	def _enter(self, kind, attrs, start, end):
+		if self._pending is not None:
+			self._events.append(self._pending)
+		self._pending = (ENTER, kind, attrs, (start, end))
+
+	def _leave(self, kind, attrs, start, end):
+		pending = self._pending
+		if pending is not None:
+			self._pending = None
+			if pending[1] == kind and pending[2] is attrs:
+				self._events.append((EMPTY, kind, attrs, (pending[3][0], end)))
+				return
+			self._events.append(pending)
+		self._events.append((LEAVE, kind, attrs, (start, end)))
+
+	def _empty(self, kind, attrs, start, end):
+		if self._pending is not None:
+			self._events.append(self._pending)
+			self._pending = None
+		self._events.append((EMPTY, kind, attrs, (start, end)))
+
+	def _text(self, value, start, end):
+		if value:
+			if self._pending is not None:
+				self._events.append(self._pending)
+				self._pending = None
+			self._events.append((TEXT, None, value, (start, end)))
+
+	def _element(self, match, kind, attrs, group, parse=True):
+		'''Add the element `kind` of `match` (an inline element if
+		:attr:`_offset` is set, a block otherwise) whose content is
+		`group`, parsed if `parse` is set
+		'''
+		if self._offset is None:
+			base = self._base
+			offset = lambda position: base + position
+		else:
+			offset = self._offset
+		content = match.start(group)
+		if content < 0:
+			self._empty(kind, attrs, offset(match.start()), offset(match.end()))
+			return
+		self._enter(kind, attrs, offset(match.start()), offset(content))
+		if parse:
+			self._inline(match.group(group), _shifted(offset, content))
+		else:
+			self._text(match.group(group), offset(content), offset(match.end(group)))
+		self._leave(kind, attrs, offset(match.end(group)), offset(match.end()))
+
+	def _empty_inline(self, match, kind, attrs):
+		'''Add the inline element `kind` of `match`, without content'''
+		self._empty(kind, attrs, self._offset(match.start()), self._offset(match.end()))
+
+	def _inline(self, data, offset):
+		'''Add the events of the inline elements of `data`, `offset`
+		returning the offset in the input of an offset in `data`
+		'''
+		previous = self._offset
+		self._offset = offset
+		try:
+			self.inline(data)
+		finally:
+			self._offset = previous
+
+	def inline(self, data, write=None):
+		'''Add the events of the inline elements of `data`, see
+		:meth:`EventParser._inline`
+
+		Same scan as :meth:`Translator.inline`.
+		'''
+		search = self._inline_search
+		match_inline = self._match_inline
+		content_end = self._inline_content_end
+		handlers = self._inline_handlers
+		containers = self._containers
+		offset = self._offset
+		#? kind, end of the content, restart and end positions of the
+		#? enclosing containers
+		stack = []
+		found = {}
+		pos = at = 0
+		end = len(data)
+		while 1:
+			candidate = search(data, at, end)
+			if candidate is None:
+				self._text(data[pos:end], offset(pos), offset(end))
+				if not stack:
+					break
+				kind, content, pos, end = stack.pop()
+				at = pos
+				self._leave(kind, _no_attributes, offset(content), offset(pos))
+				continue
+			start = candidate.start()
+			key = candidate.group()
+			container = containers.get(key)
+			if container is not None:
+				content = content_end(data, start, end, key, found)
+				if content < 0:
+					at = start + 1
+					continue
+				kind, size = container
+				self._text(data[pos:start], offset(pos), offset(start))
+				self._enter(kind, _no_attributes, offset(start), offset(start + size))
+				stack.append((kind, content, content + size, end))
+				pos = at = start + size
+				end = content
+				continue
+			match = match_inline(data, start, at, end, key)
+			if match is None:
+				at = start + 1
+				continue
+			start = match.start()
+			self._text(data[pos:start], offset(pos), offset(start))
+			pos = at = match.end()
+			handler = handlers[match.lastindex]
+			if handler is not None:
+				handler(match)
+			else:
+				self._warning(match, 'missing inline handler: %s.i_%s()', self.__class__.__name__, match.lastgroup)
+				self._text(data[start:pos], offset(start), offset(pos))
+
+	##### blocks
+	def b_hr(self, match):
+		self._empty('hr', _no_attributes, self._base + match.start(), self._base + match.end())
+
+	def b_p(self, match):
+		self._element(match, 'p', _no_attributes, 'p')
+
+	def b_xmp(self, match):
+		self._element(match, 'xmp', _no_attributes, 'xmp', False)
+
+	def b_pre(self, match):
+		self._stripped(match, 'pre', Wiki2XHTML._first_space)
+
+	def b_special(self, match):
+		self._element(match, 'special', _attributes(macro=match.group('macro')), 'special', False)
+
+	def b_head(self, match):
+		self._element(match, 'head', {'level': 6-len(match.group('head_level'))}, 'head_value')
+
+	def b_blockquote(self, match):
+		self._stripped(match, 'blockquote', Wiki2XHTML._first_gt_space)
+
+	def _stripped(self, match, kind, pattern):
+		'''Add the block `kind` whose content, without the matches of
+		`pattern`, is parsed
+		'''
+		group = match.lastgroup
+		start = self._base + match.start(group)
+		end = self._base + match.end(group)
+		data, offset = _stripped(pattern, match.group(group), start)
+		self._enter(kind, _no_attributes, self._base + match.start(), start)
+		self._inline(data, offset)
+		self._leave(kind, _no_attributes, end, self._base + match.end())
+
+	def b_list(self, match):
+		#? same structure as :meth:`tree.TreeBuilder.b_list`: open lists,
+		#? outermost first, as [kind, whether its first child is an item,
+		#? whether its last item is open]
+		base = self._base + match.start()
+		self._enter('list', _no_attributes, base, base)
+		stack = []
+		ltprev = ''
+		position = base
+		for m in Wiki2XHTML._fragment_list.finditer(match.group()):
+			ltcurr, value = m.groups()
+			level = 0
+			for prev, curr in itertools.izip(ltprev, ltcurr):
+				if prev != curr:
+					break
+				level+= 1
+			while len(stack) > level:
+				self._close_list(stack.pop(), position)
+			start = base + m.start()
+			for curr in ltcurr[level:]:
+				if stack:
+					parent = stack[-1]
+					#? nested in the last item if parent[1], which stays open
+					if not parent[1]:
+						#? nested in the list itself
+						parent[1] = False
+						if parent[2]:
+							self._leave('li', _no_attributes, position, position)
+							parent[2] = False
+				kind = 'ol' if curr == u'#' else 'ul'
+				self._enter(kind, _no_attributes, start, start)
+				stack.append([kind, None, False])
+			parent = stack[-1]
+			if parent[2]:
+				self._leave('li', _no_attributes, position, position)
+			if parent[1] is None:
+				parent[1] = True
+			content = base + m.start('value')
+			self._enter('li', _no_attributes, start, content)
+			self._inline(value, lambda position, content=content: content + position)
+			parent[2] = True
+			position = base + m.end()
+			ltprev = ltcurr
+		while stack:
+			self._close_list(stack.pop(), position)
+		self._leave('list', _no_attributes, position, self._base + match.end())
+
+	def _close_list(self, item, position):
+		kind, _, open_item = item
+		if open_item:
+			self._leave('li', _no_attributes, position, position)
+		self._leave(kind, _no_attributes, position, position)
+
+	@staticmethod
+	def b_nl(match):
+		pass
+
+	##### inlines
+	def i_br(self, match):
+		self._empty_inline(match, 'br', _no_attributes)
+
+	def i_anchor(self, match):
+		self._empty_inline(match, 'anchor', {'name': match.group('anchor')})
+
+	def i_acronym(self, match):
+		title = match.group('acronym_title')
+		self._element(match, 'acronym', {'title': title.strip()} if title else _no_attributes, 'acronym_value')
+
+	def i_a(self, match):
+		self._element(
+			match,
+			'a',
+			_attributes(
+				href=match.group('a_href'),
+				lang=match.group('a_lang'),
+				title=match.group('a_title'),
+			),
+			'a_value',
+		)
+
+	def i_uri(self, match):
+		self._empty_inline(match, 'uri', {'href': match.group(match.lastgroup)})
+
+	def i_img(self, match):
+		self._empty_inline(match, 'img', _attributes(
+			src=match.group('img_src'),
+			alt=match.group('img_alt'),
+			align=match.group('img_align'),
+			desc=match.group('img_desc'),
+		))
+
+	def i_cite(self, match):
+		self._element(
+			match,
+			'cite',
+			_attributes(
+				lang=match.group('cite_lang'),
+				cite=match.group('cite_cite'),
+			),
+			'cite_value',
+		)
+
+	def i_escape(self, match):
+		self._empty_inline(match, 'escape', {'char': match.group('escaped_char')})
+
+	def i_footnote(self, match):
+		self._element(match, 'footnote', _no_attributes, 'footnote', False)
+
+
+
+def iter_events(source, encoding='utf-8', skip_blocks=False):
+	'''Yield the events of `source`, see :meth:`EventParser.iter_events`'''
+	return EventParser().iter_events(source, encoding, skip_blocks)
@@ -0,0 +1,419 @@
+'''Translation in the background, for event-driven servers
+
+Usage::
+	>>> executor = RenderExecutor(re_html.Wiki2XHTML, workers=4, max_pending=64)
+	>>> future = executor.submit(post, timeout=2)
+	>>> future.add_done_callback(lambda future: reactor.callFromThread(reply, future))
+	>>> for piece in executor.stream(open('dump.txt')):
+	...     response.write(piece)
+	>>> executor.shutdown()
+
+:meth:`RenderExecutor.submit` returns a :class:`Future` at once: the
+translation runs on a pool of threads or of processes and the result is
+read with :meth:`Future.result` or passed to the callbacks of the future
+(called by the worker: an event loop must schedule its own work from
+them, i.e. with ``call_soon_threadsafe``, ``callFromThread`` or
+``add_callback``). The documents smaller than `inline_threshold`
+characters are translated at once by the caller, as the hand-off would
+cost more than their translation.
+
+The number of documents submitted to the workers and not translated yet
+is bounded by `max_pending`: :meth:`RenderExecutor.submit` blocks (or
+raises :class:`Queue.Full`) until a slot is free. A translation longer
+than its `timeout` (measured from its submission) stops with
+:class:`re_parser.LimitExceeded`: the timeout is the
+:attr:`Translator.max_time` of the translation, checked before each
+block and each inline rule matched, with or without `skip_blocks`.
+
+.. Warning::
+   The timeout does not interrupt a handler: a translator whose handler
+   waits (i.e.: for a lock or a network call) stops once it returns.
+   The caller may stop waiting with :meth:`Future.result`, whose own
+   `timeout` raises :class:`TimeoutError`, but the worker (and the
+   slot of the document in `max_pending`) stays busy until the
+   translation stops.
+
+.. Note::
+   A pending translation may be cancelled; with processes, the
+   translation is sent at once to the pool, where it runs anyway, and
+   only its result is dropped.
+'''
+__all__ = (
+	'CancelledError',
+	'Future',
+	'RenderExecutor',
+	'TimeoutError',
+)
+
+
+
+
+
+import Queue
+import cPickle
+import multiprocessing
+import sys
+import threading
+import time
+
+
+import batch
+from re_parser import LimitExceeded
+
+
+
+
+
+class CancelledError(Exception):
+	'''Raised when reading the result of a cancelled :class:`Future`'''
+
+
+
+class TimeoutError(Exception):
+	'''Raised when the result of a :class:`Future` is not ready in time'''
+
+
+
+class Future(object):
+	'''Result of a translation submitted to a :class:`RenderExecutor`
+
+	Same interface as the futures of :mod:`concurrent.futures`.
+	'''
+	def __init__(self):
+		self._condition = threading.Condition()
+		self._state = 'pending'
+		self._result = None
+		self._exception = None
+		self._callbacks = []
+
+	def cancel(self):
+		'''Cancel the translation unless it is running or done; return
+		whether it is cancelled
+		'''
+		with self._condition:
+			if self._state == 'cancelled':
+				return True
+			if self._state != 'pending':
+				return False
+			self._state = 'cancelled'
+			self._condition.notify_all()
+		self._call_back()
+		return True
+
+	def cancelled(self):
+		return self._state == 'cancelled'
+
+	def running(self):
+		return self._state == 'running'
+
+	def done(self):
+		return self._state in ('cancelled', 'finished')
+
+	def result(self, timeout=None):
+		'''Return the translation, waiting at most `timeout` seconds
+
+		Raise the exception of the translation if it failed,
+		:class:`CancelledError` or :class:`TimeoutError`.
+		'''
+		self._wait(timeout)
+		if self._exception is not None:
+			raise self._exception
+		return self._result
+
+	def exception(self, timeout=None):
+		'''Return the exception raised by the translation, or ``None``'''
+		self._wait(timeout)
+		return self._exception
+
+	def add_done_callback(self, function):
+		'''Call `function` with the future once it is done (at once if it
+		is already done)
+		'''
+		with self._condition:
+			if not self.done():
+				self._callbacks.append(function)
+				return
+		function(self)
+
+	def _wait(self, timeout):
+		with self._condition:
+			if not self.done():
+				self._condition.wait(timeout)
+			if self._state == 'cancelled':
+				raise CancelledError()
+			if self._state != 'finished':
+				raise TimeoutError()
+
+	def _start(self):
+		'''Mark the future as running; return ``False`` if it is cancelled'''
+		with self._condition:
+			if self._state != 'pending':
+				return False
+			self._state = 'running'
+			return True
+
+	def _set(self, result=None, exception=None):
+		with self._condition:
+			if self._state == 'cancelled':
+				return
+			self._result = result
+			self._exception = exception
+			self._state = 'finished'
+			self._condition.notify_all()
+		self._call_back()
+
+	def _call_back(self):
+		callbacks, self._callbacks = self._callbacks, []
+		for function in callbacks:
+			try:
+				function(self)
+			except Exception:
+				sys.stderr.write('exception in a callback of %r\n' % self)
+				sys.excepthook(*sys.exc_info())
+
+
+
+def _render(translator, data, skip_blocks, deadline):
+	'''Return the translation of `data` by `translator`, stopped at
+	`deadline` (a :func:`time.time` value or ``None``)
+	'''
+	if deadline is None:
+		return translator.run(data, skip_blocks)
+	remaining = deadline - time.time()
+	if remaining <= 0:
+		raise LimitExceeded('translation too long: timeout before it started')
+	previous = translator.__dict__.get('max_time')
+	translator.max_time = remaining if translator.max_time is None else min(remaining, translator.max_time)
+	try:
+		return translator.run(data, skip_blocks)
+	finally:
+		if previous is None:
+			del translator.max_time
+		else:
+			translator.max_time = previous
+
+
+def _process_render(data, skip_blocks, deadline):
+	''':func:`_render` with the translator of a worker process
+
+	Return the pickled ``(result, exception)`` pair: on Python 2,
+	:meth:`multiprocessing.Pool.apply_async` has no error callback, so
+	neither an exception nor a value the pool can not pickle would reach
+	the caller.
+	'''
+	try:
+		value = _render(batch._translator, data, skip_blocks, deadline), None
+	except Exception, e:
+		value = None, e
+	try:
+		return cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+	except Exception, e:
+		return cPickle.dumps((None, cPickle.PicklingError(
+			'can not send the %s: %s: %s' % (
+				'result' if value[1] is None else 'exception',
+				e.__class__.__name__,
+				e,
+			)
+		)), cPickle.HIGHEST_PROTOCOL)
+
+
+
+class RenderExecutor(object):
+	'''Pool of workers translating documents in the background
+
+	Parameters:
+	- `factory`: callable returning a :class:`Translator` (i.e.: the
+	  translator class, picklable for the processes), called once by
+	  each worker
+	- `workers`: number of threads or processes, default to the number
+	  of CPU for the processes, 4 threads otherwise
+	- `processes`: use processes instead of threads; the threads share
+	  the interpreter lock, they only keep the caller responsive
+	- `max_pending`: maximum number of submitted documents not
+	  translated yet, unbounded if ``None``
+	- `inline_threshold`: size (in characters) under which the documents
+	  are translated by the caller
+	'''
+	def __init__(self, factory, workers=None, processes=False, max_pending=None, inline_threshold=512):
+		self.factory = factory
+		self.inline_threshold = inline_threshold
+		self._slots = threading.BoundedSemaphore(max_pending) if max_pending else None
+		self._local = threading.local()
+		self._shutdown = False
+		if processes:
+			self._pool = multiprocessing.Pool(workers, batch._initialize, (factory,))
+			self._queue = self._threads = None
+			#? futures submitted to the pool and not finished yet
+			self._outstanding = set()
+			self._outstanding_lock = threading.Lock()
+		else:
+			self._pool = None
+			self._queue = Queue.Queue()
+			self._threads = []
+			for _ in xrange(workers or 4):
+				thread = threading.Thread(target=self._work)
+				thread.daemon = True
+				thread.start()
+				self._threads.append(thread)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.shutdown()
+
+	def _translator(self):
+		'''Return the translator of the current thread'''
+		translator = getattr(self._local, 'translator', None)
+		if translator is None:
+			translator = self._local.translator = self.factory()
+		return translator
+
+	def _work(self):
+		'''Translate the jobs of the queue, in a worker thread'''
+		while 1:
+			job = self._queue.get()
+			if job is None:
+				return
+			future, data, skip_blocks, deadline = job
+			if future._start():
+				try:
+					future._set(_render(self._translator(), data, skip_blocks, deadline))
+				except Exception, e:
+					future._set(exception=e)
+			self._release()
+
+	def _release(self):
+		'''Free the slot of a document submitted to the workers'''
+		if self._slots is not None:
+			self._slots.release()
+
+	def _finish(self, future, value):
+		'''Set the result of `future`, returned by :func:`_process_render`'''
+		with self._outstanding_lock:
+			if future not in self._outstanding:
+				# cancelled by :meth:`RenderExecutor.shutdown`
+				return
+			self._outstanding.remove(future)
+		try:
+			value = cPickle.loads(value)
+		except Exception, e:
+			value = None, e
+		future._set(*value)
+		self._release()
+
+	def submit(self, data, skip_blocks=False, timeout=None, block=True):
+		'''Submit `data` for translation and return its :class:`Future`
+
+		Parameters:
+		- `data`, `skip_blocks`: see :meth:`Translator.run`
+		- `timeout`: maximum time (in seconds, from now) to translate the
+		  document, see above
+		- `block`: wait for a free slot if `max_pending` documents are
+		  pending, raise :class:`Queue.Full` otherwise
+		'''
+		if self._shutdown:
+			raise RuntimeError('submit after shutdown')
+		if not isinstance(data, unicode):
+			data = unicode(data)
+		deadline = None if timeout is None else time.time() + timeout
+		future = Future()
+		if len(data) < self.inline_threshold:
+			future._start()
+			try:
+				future._set(_render(self._translator(), data, skip_blocks, deadline))
+			except Exception, e:
+				future._set(exception=e)
+			return future
+		if self._slots is not None and not self._slots.acquire(block):
+			raise Queue.Full('%s: too many pending translations' % self.__class__.__name__)
+		if self._pool is None:
+			self._queue.put((future, data, skip_blocks, deadline))
+		else:
+			#? a cancelled translation still runs, its result is dropped
+			with self._outstanding_lock:
+				self._outstanding.add(future)
+			self._pool.apply_async(
+				_process_render,
+				(data, skip_blocks, deadline),
+				callback=lambda value: self._finish(future, value),
+			)
+		return future
+
+	def run(self, data, skip_blocks=False, timeout=None):
+		'''Translate `data` in the pool and wait for the result'''
+		return self.submit(data, skip_blocks, timeout).result()
+
+	def stream(self, source, encoding='utf-8', skip_blocks=False, max_buffered=16):
+		'''Yield the translation of `source` piece by piece, as
+		:meth:`Translator.iter_run`, the translation running in a thread
+
+		At most `max_buffered` pieces are translated ahead of the reader;
+		the translation stops when the iteration is closed.
+		'''
+		pieces = Queue.Queue(max_buffered)
+		closed = threading.Event()
+		def put(item):
+			# return whether `item` is queued before the reader is closed
+			while not closed.is_set():
+				try:
+					pieces.put(item, timeout=.1)
+					return True
+				except Queue.Full:
+					pass
+			return False
+		def produce():
+			try:
+				for piece in self.factory().iter_run(source, encoding, skip_blocks):
+					if not put((piece, None)):
+						return
+			except Exception, e:
+				put((None, e))
+			else:
+				put((None, None))
+		thread = threading.Thread(target=produce)
+		thread.daemon = True
+		thread.start()
+		try:
+			while 1:
+				piece, exception = pieces.get()
+				if exception is not None:
+					raise exception
+				if piece is None:
+					break
+				yield piece
+		finally:
+			closed.set()
+
+	def shutdown(self, wait=True):
+		'''Stop the workers once the submitted documents are translated
+		(if `wait` is set, the pending ones being cancelled otherwise)
+		'''
+		self._shutdown = True
+		if self._pool is not None:
+			if wait:
+				self._pool.close()
+				self._pool.join()
+				return
+			self._pool.terminate()
+			with self._outstanding_lock:
+				futures = list(self._outstanding)
+				self._outstanding.clear()
+			for future in futures:
+				future.cancel()
+				self._release()
+			return
+		if not wait:
+			while 1:
+				try:
+					job = self._queue.get_nowait()
+				except Queue.Empty:
+					break
+				if job is not None:
+					job[0].cancel()
+					self._release()
+		for _ in self._threads:
+			self._queue.put(None)
+		if wait:
+			for thread in self._threads:
+				thread.join()
@@ -0,0 +1,192 @@
+'''Incremental translation of edited documents
+
+Usage::
+	>>> renderer = IncrementalRenderer(re_html.Wiki2XHTML())
+	>>> renderer.render(u'!Title\n\nFirst draft.')
+	u'<h5>Title</h5>\n\n<p>First draft.</p>\n'
+	>>> renderer.render(u'!Title\n\nSecond draft.')  # only the last block is translated
+	u'<h5>Title</h5>\n\n<p>Second draft.</p>\n'
+
+The document is split by :func:`re_parser.iter_blocks` and scanned
+chunk by chunk as in :meth:`Translator.iter_run`; the renderer keeps,
+for each chunk, the state of the scan and the translated pieces. The
+next version of the document is compared to the previous one and the
+scan is resumed from the chunk before the first edited character: as
+soon as it reaches a chunk after the last edited character with the
+same state as before, the previous translation of the remaining chunks
+is reused.
+
+.. Important::
+   The handlers of the translator must only depend on their match: a
+   translator counting its footnotes, for instance, cannot be used.
+'''
+__all__ = (
+	'IncrementalRenderer',
+)
+
+
+
+
+
+import bisect
+
+
+from re_parser import iter_blocks
+
+
+
+
+
+def _common_prefix(a, b):
+	'''Return the length of the common prefix of `a` and `b`'''
+	low, high = 0, min(len(a), len(b))
+	if a[:high] == b[:high]:
+		return high
+	#? a[:low] == b[:low] and a[:high] != b[:high]; the slices are
+	#? compared in C, the whole search is linear in the size of the input
+	while high - low > 1:
+		middle = (low + high) // 2
+		if a[low:middle] == b[low:middle]:
+			low = middle
+		else:
+			high = middle
+	return low
+
+
+def _common_suffix(a, b, limit):
+	'''Return the length of the common suffix of `a` and `b`, at most
+	`limit`
+	'''
+	low, high = 0, limit
+	if a[len(a) - high:] == b[len(b) - high:]:
+		return high
+	while high - low > 1:
+		middle = (low + high) // 2
+		if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+			low = middle
+		else:
+			high = middle
+	return low
+
+
+
+class IncrementalRenderer(object):
+	'''Translate successive versions of a document, re-translating only
+	the blocks around the edits
+
+	Parameters:
+	- `translator`: :class:`Translator` instance
+	- `skip_blocks`: see :meth:`Translator.run`
+
+	:meth:`IncrementalRenderer.render` returns the same result as
+	:meth:`Translator.run`; after each call, :attr:`scanned` holds the
+	number of chunks which have been translated again (the document
+	has ``len(chunks)`` chunks).
+	'''
+	def __init__(self, translator, skip_blocks=False):
+		self.translator = translator
+		self.skip_blocks = skip_blocks
+		self.source = u''
+		self.result = None
+		self.scanned = 0
+		#? chunks of :attr:`source` and, for each chunk plus the end of
+		#? the input, the state of the scan before it (offsets relative to
+		#? the start of the chunk: window, last, start, replaced) and its
+		#? translated pieces
+		self.chunks = []
+		self._steps = []
+
+	def reset(self):
+		'''Forget the previous version of the document'''
+		self.__init__(self.translator, self.skip_blocks)
+
+	def render(self, source):
+		'''Return the translation of `source`, the new version of the
+		document
+		'''
+		if not isinstance(source, unicode):
+			source = unicode(source)
+		translator = self.translator
+		translator._check_size(len(source))
+		previous = self.source
+		if source == previous and self.result is not None:
+			self.scanned = 0
+			return self.result
+		old_chunks = self.chunks
+		old_steps = self._steps
+		prefix = _common_prefix(previous, source)
+		#? from `tail`, `source` is the end of `previous`
+		tail = len(source) - _common_suffix(previous, source, min(len(previous), len(source)) - prefix)
+		delta = len(source) - len(previous)
+
+		starts = []
+		position = 0
+		for chunk in old_chunks:
+			starts.append(position)
+			position+= len(chunk)
+		#? chunk start -> index, the end of the input being the final step
+		old_index = dict((start, index) for index, start in enumerate(starts))
+		if old_steps:
+			old_index[position] = len(old_chunks)
+
+		#? the chunks before the edit are parsed the same way, but the end
+		#? of the one before the first edited character depends on it
+		index = max(0, bisect.bisect_left(starts, prefix) - 1)
+		chunks = old_chunks[:index]
+		steps = old_steps[:index]
+		if index < len(old_steps):
+			window, last, start, replaced = old_steps[index][0]
+			position = starts[index] if index < len(starts) else len(previous)
+		else:
+			window = last = start = 0
+			replaced = False
+			position = 0
+		#? window of the input, `last` and `start` relative to it
+		data = source[position + window:position]
+		last-= window
+		start-= window
+
+		scan = translator._scanner(self.skip_blocks)
+		deadline = translator._deadline()
+		pending = iter_blocks(source[position:])
+		#? index in `old_chunks` of the next chunk once the chunks are the
+		#? same again
+		resync = None
+		self.scanned = 0
+		while 1:
+			state = (-len(data), last - len(data), start - len(data), replaced)
+			if resync is None:
+				chunk = next(pending, None)
+			else:
+				if (
+					old_steps[resync][0] == state and
+					previous[position - delta - len(data):position - delta] == data
+				):
+					chunks.extend(old_chunks[resync:])
+					steps.extend(old_steps[resync:])
+					break
+				chunk = old_chunks[resync] if resync < len(old_chunks) else None
+			limit = len(data)
+			if chunk is not None:
+				data+= chunk
+			result, last, start, replaced = scan(data, limit, last, start, replaced, chunk is None, deadline)
+			steps.append((state, u''.join(result)))
+			self.scanned+= 1
+			if chunk is None:
+				break
+			chunks.append(chunk)
+			drop = max(0, min(last, start) - 2)
+			data = data[drop:]
+			last-= drop
+			start-= drop
+			position+= len(chunk)
+			if resync is not None:
+				resync+= 1
+			elif position >= tail and position - delta in old_index:
+				resync = old_index[position - delta]
+
+		self.source = source
+		self.chunks = chunks
+		self._steps = steps
+		self.result = u''.join(pieces for _, pieces in steps)
+		return self.result
@@ -0,0 +1,190 @@
+'''Classification of the targets of the links and images
+
+Usage::
+	>>> translator = re_html.Wiki2XHTML()
+	>>> translator.link_policy = LinkPolicy(internal_hosts=('.dotclear.org',), rel=u'nofollow')
+	>>> translator.run(u'[a|http://fr.dotclear.org/]\n[b|http://example.org/]', skip_blocks=True)
+	u'<a href="http://fr.dotclear.org/">a</a>\n<a href="http://example.org/" class="external" rel="nofollow">b</a>'
+	>>> translator.link_policy.stats()
+	{'hits': 0, 'misses': 2, 'evictions': 0, 'size': 2, 'maxsize': 1024}
+
+The handlers of the links, URIs and images of :class:`re_html.Wiki2XHTML`
+(and the renderers of :class:`renderers.XHTMLRenderer`) ask their
+:attr:`link_policy` for the classification of each target; the
+classifications are memoized, the documents often linking to the same
+addresses.
+'''
+__all__ = (
+	'LinkInfo',
+	'LinkPolicy',
+)
+
+
+
+
+
+import collections
+import thread
+import urlparse
+
+
+
+
+
+#? classification of a target: its scheme and host (``None`` if it has
+#? none), whether it is external and the attributes added to the ``a``
+#? and ``img`` elements, each preceded by a space
+LinkInfo = collections.namedtuple('LinkInfo', ('scheme', 'host', 'external', 'a_attributes', 'img_attributes'))
+
+
+
+class LinkPolicy(object):
+	'''Classify the targets of the links and images, with a LRU cache
+
+	Parameters:
+	- `internal_hosts`: names of the hosts whose targets are not
+	  external; a name starting with a dot also matches the subdomains
+	  (i.e.: ``.dotclear.org`` matches ``dotclear.org`` and
+	  ``fr.dotclear.org``)
+	- `rel`: ``rel`` attribute of the links to external targets (i.e.:
+	  ``nofollow``), none by default
+	- `maxsize`: number of classifications kept in memory
+
+	A target is external if it has a scheme (``http:``, ``mailto:``, ...)
+	and its host is not internal: its links have the ``external`` class.
+	Override :meth:`LinkPolicy.decide` or :meth:`LinkPolicy.attributes`
+	to classify the targets otherwise (i.e.: per host); the values of
+	the attributes are written as they are.
+
+	The counters :attr:`hits`, :attr:`misses` and :attr:`evictions` are
+	returned by :meth:`stats`; a policy may be shared by the translators
+	of several threads.
+	'''
+	external_class = u'external'
+
+	def __init__(self, internal_hosts=(), rel=None, maxsize=1024):
+		self.internal_hosts = frozenset(host.lower() for host in internal_hosts)
+		self.rel = rel
+		self.maxsize = maxsize
+		self.hits = self.misses = self.evictions = 0
+		#? :mod:`threading` is not imported for a lock: the policy is
+		#? created on import of :mod:`re_html`
+		self._lock = thread.allocate_lock()
+		self.clear()
+
+	def classify(self, href, scheme=None):
+		'''Return the :class:`LinkInfo` of `href`, memoized
+
+		`scheme` is the scheme of `href` if it is known (i.e.: matched by
+		the ``uri`` rule), see :meth:`LinkPolicy.decide`.
+		'''
+		key = href if scheme is None else (scheme, href)
+		#? the classifications are kept in :attr:`_cache` and in a circular
+		#? list of [previous, next, key, classification] links whose root
+		#? follows the most recently used: unlike an ordered dictionary,
+		#? whose methods are written in Python, a hit costs one lookup
+		with self._lock:
+			link = self._cache.get(key)
+			if link is not None:
+				self.hits+= 1
+				previous, following = link[0], link[1]
+				previous[1] = following
+				following[0] = previous
+				root = self._root
+				last = root[0]
+				last[1] = root[0] = link
+				link[0] = last
+				link[1] = root
+				return link[3]
+		info = self.decide(href, scheme)
+		with self._lock:
+			self.misses+= 1
+			cache = self._cache
+			if key in cache or self.maxsize <= 0:
+				# classified meanwhile by another thread
+				return info
+			root = self._root
+			if len(cache) >= self.maxsize:
+				oldest = root[1]
+				root[1] = oldest[1]
+				oldest[1][0] = root
+				del cache[oldest[2]]
+				self.evictions+= 1
+			last = root[0]
+			last[1] = root[0] = cache[key] = [last, root, key, info]
+		return info
+
+	def decide(self, href, scheme=None):
+		'''Return the :class:`LinkInfo` of `href`, see :class:`LinkPolicy`
+
+		The scheme is parsed from `href` unless `scheme` is set: a target
+		:func:`urlparse.urlsplit` reads otherwise (i.e.: ``tel:5551234``,
+		taken for a host and a port) still has its scheme. A target which
+		can not be parsed (i.e.: with an invalid IPv6 address) has no host,
+		nor scheme unless it is set.
+		'''
+		try:
+			parts = urlparse.urlsplit(href)
+			host = parts.hostname
+			if scheme is None:
+				scheme = parts.scheme
+		except ValueError:
+			host = None
+		external = bool(scheme) and not self.internal(host)
+		return LinkInfo(
+			scheme,
+			host,
+			external,
+			self._format(self.attributes('a', scheme, host, external)),
+			self._format(self.attributes('img', scheme, host, external)),
+		)
+
+	def internal(self, host):
+		'''Return whether the target on `host` is internal'''
+		if not host:
+			return False
+		hosts = self.internal_hosts
+		if host in hosts:
+			return True
+		#? the domains of the host, starting with a dot
+		host = u'.' + host
+		while 1:
+			if host in hosts:
+				return True
+			index = host.find(u'.', 1)
+			if index < 0:
+				return False
+			host = host[index:]
+
+	def attributes(self, element, scheme, host, external):
+		'''Return the attributes added to the `element` (``a`` or ``img``)
+		whose target is classified by `scheme`, `host` and `external`, as
+		a list of ``(name, value)`` pairs
+		'''
+		if element != 'a' or not external:
+			return []
+		if self.rel:
+			return [('class', self.external_class), ('rel', self.rel)]
+		return [('class', self.external_class)]
+
+	@staticmethod
+	def _format(attributes):
+		return u''.join(u' %s="%s"' % pair for pair in attributes)
+
+	def stats(self):
+		'''Return the counters and the number of classifications in memory'''
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'size': len(self._cache),
+			'maxsize': self.maxsize,
+		}
+
+	def clear(self):
+		'''Empty the cache and reset the counters'''
+		with self._lock:
+			self._cache = {}
+			self._root = root = []
+			root[:] = [root, root, None, None]
+			self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,233 @@
+'''Translation of large files through :mod:`mmap`
+
+Usage::
+	>>> with MappedDump('export.txt', separator='\\n\\x0c\\n') as dump:
+	...     for start, end in dump.documents():
+	...         for piece in dump.iter_run(translator, start, end):
+	...             out.write(piece)
+
+The file is mapped by windows (of :attr:`MappedDump.window` bytes) and
+scanned as bytes: the documents are split on a `separator` and each
+document is split into the chunks of :func:`re_parser.iter_blocks`,
+which are decoded one at a time as they are translated. Neither the
+file nor a document is ever read or decoded whole, so the memory used
+depends on the size of the largest blocks, not on the size of the file.
+
+The encoding must encode the LF and ``/`` as ASCII and never use their
+bytes in another character (i.e.: UTF-8 or ISO-8859-*, not UTF-16).
+'''
+__all__ = (
+	'MappedDump',
+)
+
+
+
+
+
+import mmap
+import os
+
+
+from re_parser import BlockState, iter_lines
+
+
+
+
+
+class _Buffer(object):
+	'''Byte access to a string or to a :class:`mmap.mmap`'''
+	def __init__(self, data):
+		self.data = data
+		self.size = len(data)
+
+	def find(self, sub, start, end):
+		return self.data.find(sub, start, end)
+
+	def slice(self, start, end):
+		return self.data[start:end]
+
+	def close(self):
+		pass
+
+
+
+class _Windows(object):
+	'''Byte access to the file `fobj`, mapped by windows of at least
+	`window` bytes (and of :data:`mmap.ALLOCATIONGRANULARITY`): only the
+	pages of the current window are mapped
+	'''
+	def __init__(self, fobj, size, window):
+		self.fileno = fobj.fileno()
+		self.size = size
+		self.window = max(window, mmap.ALLOCATIONGRANULARITY)
+		self.map = None
+		self.start = self.end = 0
+
+	def _cover(self, start, end):
+		'''Map a window holding the bytes from `start` to `end`'''
+		if self.map is not None and self.start <= start and end <= self.end:
+			return
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+		begin = start - start % mmap.ALLOCATIONGRANULARITY
+		stop = min(self.size, max(end, begin + self.window))
+		self.map = mmap.mmap(self.fileno, stop - begin, access=mmap.ACCESS_READ, offset=begin)
+		self.start, self.end = begin, stop
+
+	def find(self, sub, start, end):
+		#? each window overlaps the previous one by ``len(sub) - 1`` bytes
+		#? and must be larger to move forward
+		window = max(self.window, 2 * len(sub))
+		while start < end:
+			stop = min(end, start + window)
+			self._cover(start, stop)
+			index = self.map.find(sub, start - self.start, stop - self.start)
+			if index >= 0:
+				return index + self.start
+			if stop >= end:
+				break
+			#? `sub` may start at the end of the window
+			start = stop - len(sub) + 1
+		return -1
+
+	def slice(self, start, end):
+		if start >= end:
+			return ''
+		self._cover(start, end)
+		return self.map[start - self.start:end - self.start]
+
+	def close(self):
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+
+
+
+class MappedDump(object):
+	'''Documents of a large file, read by windows of a memory mapping
+
+	Parameters:
+	- `source`: path of the file, or its content as a :class:`mmap.mmap`
+	  (or any object with the same ``find`` method and slicing), which
+	  is not closed by :meth:`MappedDump.close`
+	- `separator`: bytes between two documents, ``None`` if the file is
+	  a single document
+	- `encoding`: of the file, see above
+	- `window`: minimum size of the mapped windows of a path, at least
+	  :data:`mmap.ALLOCATIONGRANULARITY`
+
+	The offsets of the methods are in bytes.
+	'''
+	window = 16 << 20
+
+	def __init__(self, source, separator=None, encoding='utf-8', window=None):
+		if u'\n///'.encode(encoding) != '\n///':
+			raise ValueError('unsupported encoding: %s' % encoding)
+		if separator == '':
+			raise ValueError('empty separator')
+		self.separator = separator
+		self.encoding = encoding
+		if window is not None:
+			self.window = window
+		self._file = None
+		if isinstance(source, basestring):
+			self._file = open(source, 'rb')
+			size = os.fstat(self._file.fileno()).st_size
+			#? an empty file can not be mapped
+			self._data = _Windows(self._file, size, self.window) if size else _Buffer('')
+		else:
+			self._data = _Buffer(source)
+		self.size = self._data.size
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def close(self):
+		'''Unmap and close the file'''
+		self._data.close()
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def documents(self):
+		'''Yield the ``(start, end)`` offsets of each document'''
+		separator = self.separator
+		if separator is None:
+			yield 0, self.size
+			return
+		start = 0
+		while 1:
+			end = self._data.find(separator, start, self.size)
+			if end < 0:
+				yield start, self.size
+				return
+			yield start, end
+			start = end + len(separator)
+
+	def text(self, start=0, end=None):
+		'''Return the decoded text from `start` to `end`'''
+		if end is None:
+			end = self.size
+		return self._data.slice(start, end).decode(self.encoding)
+
+	def blocks(self, start=0, end=None):
+		'''Yield the decoded chunks of the document from `start` to `end`
+		(the end of the file by default), split as by
+		:func:`re_parser.iter_blocks`
+		'''
+		if end is None:
+			end = self.size
+		data = self._data
+		state = BlockState()
+		#? decoded pieces of the current chunk
+		chunk = []
+		#? no chunk is split before the first line which is not empty
+		pos = self._skip_empty(start, end)
+		if pos > start:
+			chunk.append(self.text(start, pos))
+		while pos < end:
+			#? `pos` starts a line which is not empty: the next empty line
+			#? follows the line ending at `found`
+			found = data.find('\n\n', pos, end)
+			stop = end if found < 0 else found + 1
+			text = self.text(pos, stop)
+			chunk.append(text)
+			if found < 0:
+				break
+			#? the last line, which must not be blank to split the chunk
+			last = text[text.rfind(u'\n', 0, -1) + 1:]
+			if u'///' in text or last.strip(u' \t\n') in (u'*', u'#'):
+				#? a ``///`` block may start or end in the lines up to the
+				#? empty line, or a list takes it as the value of its first
+				#? item: same state as :func:`re_parser.iter_blocks`
+				for line in iter_lines(text):
+					state.feed(line)
+			if state.split and last.strip():
+				yield u''.join(chunk)
+				chunk = []
+			pos = self._skip_empty(stop, end)
+			#? the empty lines end the lines which were not fed (any block
+			#? but a ``///`` one ends before the second)
+			for _ in xrange(min(pos - stop, 2)):
+				state.feed(u'\n')
+			chunk.append(self.text(stop, pos))
+		if chunk:
+			yield u''.join(chunk)
+
+	def _skip_empty(self, pos, end):
+		'''Return the offset of the first byte after `pos` which is not a LF'''
+		data = self._data
+		while pos < end and data.slice(pos, pos + 1) == '\n':
+			pos+= 1
+		return pos
+
+	def iter_run(self, translator, start=0, end=None, skip_blocks=False):
+		'''Translate the document from `start` to `end` with `translator`
+		and yield the result piece by piece, see
+		:meth:`Translator.iter_run_chunks`
+		'''
+		return translator.iter_run_chunks(self.blocks(start, end), skip_blocks)
@@ -0,0 +1,215 @@
+'''Extraction of the links, images, headings and anchors of the documents
+
+Usage::
+	>>> metadata = extract(u"!Title~top~\n\n[Dot|http://dotclear.org/] ((logo.png|Logo))")
+	>>> metadata.links
+	[Link(href=u'http://dotclear.org/', start=13, end=39)]
+	>>> metadata.images
+	[Image(src=u'logo.png', alt=u'Logo', start=40, end=57)]
+	>>> metadata.headings
+	[Heading(level=5, value=u'Title~top~', start=0, end=11)]
+	>>> metadata.anchors
+	[Anchor(name=u'top', start=6, end=11)]
+
+The document is scanned once, as by :class:`re_html.Wiki2XHTML`, without
+translation: each element gives a record, `start` and `end` being its
+offsets in the document; the records are listed in the order of the
+document.
+
+- :class:`Link`: the `href` of a link (``[...]``) or of an URI;
+- :class:`Image`: the `src` and `alt` of an image (``((...))``);
+- :class:`Heading`: the `level` of a heading (from 2 to 5, as in XHTML)
+  and its `value`, untranslated;
+- :class:`Anchor`: the `name` of an anchor (``~...~``), untranslated
+  (see :meth:`re_html.Wiki2XHTML.i_anchor` for its XHTML ``name``).
+
+The text which can not hold a link, an image or an anchor is not
+scanned for inline elements. The extractor is a :class:`Translator`
+whose :meth:`MetadataExtractor.run` returns a :class:`Metadata`, so many
+documents are extracted in parallel by :func:`extract_many`.
+'''
+__all__ = (
+	'Anchor',
+	'Heading',
+	'Image',
+	'Link',
+	'Metadata',
+	'MetadataExtractor',
+	'extract',
+	'extract_many',
+)
+
+
+
+
+
+import collections
+
+
+from events import _shifted, _stripped
+from re_html import Wiki2XHTML
+from re_parser import LazyPattern, Translator
+
+
+
+
+
+Link = collections.namedtuple('Link', ('href', 'start', 'end'))
+Image = collections.namedtuple('Image', ('src', 'alt', 'start', 'end'))
+Heading = collections.namedtuple('Heading', ('level', 'value', 'start', 'end'))
+Anchor = collections.namedtuple('Anchor', ('name', 'start', 'end'))
+
+#? records of a document, by kind
+Metadata = collections.namedtuple('Metadata', ('links', 'images', 'headings', 'anchors'))
+
+
+
+class MetadataExtractor(Translator):
+	'''Translator collecting the :class:`Metadata` of a document
+
+	The handlers add the records of their match to :attr:`metadata`
+	instead of returning a translation; an instance extracts one document
+	at a time.
+	'''
+	#? the content of the containers is scanned in place
+	inline_tags = {
+		'code': (u'', u''),
+		'em': (u'', u''),
+		'strong': (u'', u''),
+		'del': (u'', u''),
+		'ins': (u'', u''),
+	}
+
+	#? a character of every link, URI, image and anchor
+	_inline_trigger = LazyPattern(r'[\[:(~]')
+
+	metadata = None
+
+	#? function returning the offset in the document of an offset in the
+	#? text whose inline elements are scanned
+	_offset = None
+
+	def run(self, data, skip_blocks=False):
+		'''Return the :class:`Metadata` of `data`, see :meth:`Translator.run`'''
+		if not isinstance(data, unicode):
+			data = unicode(data)
+		metadata = self.metadata = Metadata([], [], [], [])
+		try:
+			if skip_blocks:
+				self._check_size(len(data))
+				self._until(self._deadline(), self._inline, data, 0)
+			else:
+				self.render(data, [])
+		finally:
+			self.metadata = None
+		return metadata
+
+	def _inline(self, data, offset):
+		'''Scan the inline elements of `data`, `offset` being its offset in
+		the document or a function returning the offset in the document
+		of an offset in `data`
+		'''
+		previous = self._offset
+		if not callable(offset):
+			offset = offset.__add__
+		self._offset = offset
+		try:
+			#? the pieces of the translation are dropped
+			self.inline(data, [].append)
+		finally:
+			self._offset = previous
+
+	def _content(self, match, group):
+		'''Scan the inline elements of `group` of the inline `match`'''
+		value = match.group(group)
+		if value:
+			self._inline(value, _shifted(self._offset, match.start(group)))
+
+	##### blocks
+	def b_p(self, match):
+		self._inline(match.group('p'), match.start('p'))
+
+	def b_pre(self, match):
+		self._stripped(match, Wiki2XHTML._first_space)
+
+	def b_blockquote(self, match):
+		self._stripped(match, Wiki2XHTML._first_gt_space)
+
+	def _stripped(self, match, pattern):
+		'''Scan the inline elements of the block `match` whose content is
+		parsed without the matches of `pattern`
+		'''
+		group = match.lastgroup
+		self._inline(*_stripped(pattern, match.group(group), match.start(group)))
+
+	def b_head(self, match):
+		self.metadata.headings.append(Heading(
+			6-len(match.group('head_level')),
+			match.group('head_value'),
+			match.start('head'),
+			match.end('head'),
+		))
+		self._inline(match.group('head_value'), match.start('head_value'))
+
+	def b_list(self, match):
+		base = match.start()
+		for m in Wiki2XHTML._fragment_list.finditer(match.group()):
+			self._inline(m.group('value'), base + m.start('value'))
+
+	@staticmethod
+	def b_hr(match):
+		pass
+
+	b_xmp = b_special = b_nl = b_hr
+
+	##### inlines
+	def i_a(self, match):
+		offset = self._offset
+		self.metadata.links.append(Link(match.group('a_href'), offset(match.start()), offset(match.end())))
+		self._content(match, 'a_value')
+
+	def i_uri(self, match):
+		offset = self._offset
+		self.metadata.links.append(Link(match.group(match.lastgroup), offset(match.start()), offset(match.end())))
+
+	def i_img(self, match):
+		offset = self._offset
+		self.metadata.images.append(Image(
+			match.group('img_src'),
+			match.group('img_alt'),
+			offset(match.start()),
+			offset(match.end()),
+		))
+
+	def i_anchor(self, match):
+		offset = self._offset
+		self.metadata.anchors.append(Anchor(match.group('anchor'), offset(match.start()), offset(match.end())))
+
+	def i_acronym(self, match):
+		self._content(match, 'acronym_value')
+
+	def i_cite(self, match):
+		self._content(match, 'cite_value')
+
+	@staticmethod
+	def i_br(match):
+		pass
+
+	i_escape = i_footnote = i_br
+
+
+
+def extract(data, skip_blocks=False):
+	'''Return the :class:`Metadata` of `data`, see :meth:`MetadataExtractor.run`'''
+	return MetadataExtractor().run(data, skip_blocks)
+
+
+def extract_many(documents, **kwargs):
+	'''Extract the :class:`Metadata` of many documents in parallel
+
+	Yield a :class:`batch.Result` for each document, see
+	:func:`batch.translate_many` for the parameters.
+	'''
+	#? imported on first use: :mod:`multiprocessing` is slow to import
+	import batch
+	return batch.translate_many(documents, MetadataExtractor, **kwargs)
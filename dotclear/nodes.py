@@ -1,9 +1,10 @@
+import array
 import copy
 
 
 
 
-__all__ = ['MazNode']
+__all__ = ['MazNode', 'NodeTree', 'NodeView']
 
 
 INPLACE  = 0
@@ -216,3 +217,298 @@ class MazNode(object):
 				yield (LEAVE, curr.prev, depth)
 			if curr is root.next:
 				break
+
+
+
+
+class NodeTree(object):
+	'''Compact tree: the nodes are rows of parallel arrays, identified by
+	their index
+
+	Usage:
+	>>> tree = NodeTree()
+	>>> body = tree.add('body')
+	>>> p = tree.add('p', parent=body)
+	>>> tree.add(value=u'text', parent=p)
+	2
+	>>> tree.count(body), tree.child(body, 0)
+	(1, 1)
+	>>> tree.view(body).child.child['value']
+	u'text'
+
+	The children of each node are kept in a list of node indexes, so
+	counting them and indexing them are O(1); there is no reference
+	between the nodes, the whole tree is freed at once by
+	:meth:`NodeTree.clear` (or with the tree itself) without involving
+	the cyclic garbage collector.
+
+	:meth:`NodeTree.view` returns a :class:`NodeView`, which implements
+	the :class:`MazNode` interface for the existing code.
+	'''
+	__slots__ = ('names', 'attrs', 'parents', 'positions', 'children', 'roots')
+
+	def __init__(self):
+		self.clear()
+
+	def clear(self):
+		'''Remove all the nodes'''
+		#? name of each node (empty for the text nodes)
+		self.names = []
+		#? attributes of each node, ``None`` if it has none
+		self.attrs = []
+		#? index of the parent of each node, -1 for the roots
+		self.parents = array.array('l')
+		#? position of each node in the children of its parent
+		self.positions = array.array('l')
+		#? indexes of the children of each node, ``None`` if it has none
+		self.children = []
+		#? indexes of the nodes without parent
+		self.roots = []
+
+	def __len__(self):
+		'''Return the number of nodes'''
+		return len(self.names)
+
+	def add(self, name='', attributes=None, parent=-1, **attr):
+		'''Add a node and return its index
+
+		Parameters are the same as :class:`MazNode`, except `parent`:
+		the index of the node whose last child the new node is, or -1
+		to add a root.
+		'''
+		if attributes:
+			attributes = attributes.copy()
+			attributes.update(attr)
+			attr = attributes
+		assert isinstance(name, basestring)
+		assert bool(name) | bool(attr.get('value'))
+		node = len(self.names)
+		if parent < 0:
+			siblings = self.roots
+		else:
+			assert self.names[parent], 'nameless nodes should not have children'
+			siblings = self.children[parent]
+			if siblings is None:
+				siblings = self.children[parent] = []
+		self.names.append(name)
+		self.attrs.append(attr or None)
+		self.parents.append(parent)
+		self.positions.append(len(siblings))
+		self.children.append(None)
+		siblings.append(node)
+		return node
+
+	def load(self, node, parent=-1):
+		'''Copy the :class:`MazNode` (or :class:`NodeView`) tree `node` as
+		a child of `parent` (see :meth:`NodeTree.add`); return its index
+		'''
+		root = self.add(node.name, node.attr, parent)
+		stack = [(root, iter(node))]
+		while stack:
+			parent, children = stack[-1]
+			for child in children:
+				index = self.add(child.name, child.attr, parent)
+				if child.child:
+					stack.append((index, iter(child)))
+					break
+			else:
+				stack.pop()
+		return root
+
+	def count(self, node):
+		'''Return the number of children of `node`'''
+		children = self.children[node]
+		return len(children) if children else 0
+
+	def child(self, node, index=0):
+		'''Return the index of the `index`-th child of `node`'''
+		children = self.children[node]
+		if not children:
+			raise IndexError(index)
+		return children[index]
+
+	def siblings(self, node):
+		'''Return the indexes of the children of the parent of `node`'''
+		parent = self.parents[node]
+		return self.roots if parent < 0 else self.children[parent]
+
+	def descend(self, node=0):
+		'''Iter through the tree, starting at `node`, and yield a tuple
+
+		Same tuples as :meth:`MazNode.descend`, with the index of the
+		node instead of the node; the leaving depth is the same as the
+		entering one.
+		'''
+		children = self.children
+		if not children[node]:
+			yield (EMPTY, node, 0)
+			return
+		yield (ENTER, node, 0)
+		stack = [(node, iter(children[node]))]
+		while stack:
+			parent, it = stack[-1]
+			for child in it:
+				if children[child]:
+					yield (ENTER, child, len(stack))
+					stack.append((child, iter(children[child])))
+					break
+				yield (EMPTY, child, len(stack))
+			else:
+				stack.pop()
+				yield (LEAVE, parent, len(stack))
+
+	def view(self, node=0):
+		'''Return a :class:`NodeView` of `node`'''
+		return NodeView(self, node)
+
+
+
+class NodeView(object):
+	''':class:`MazNode` interface of a node of a :class:`NodeTree`
+
+	Views are created on demand: compare them with ``==``, not ``is``.
+	Adding a node (``+=`` as a child, ``|=`` as a brother) copies it,
+	and its children, in the tree of the view.
+	'''
+	__slots__ = ('tree', 'id')
+
+	def __init__(self, tree, id):
+		self.tree = tree
+		self.id = id
+
+	def __eq__(self, other):
+		return isinstance(other, NodeView) and self.tree is other.tree and self.id == other.id
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __hash__(self):
+		return hash((id(self.tree), self.id))
+
+	def _relink(self, value):
+		# the links are computed from the tree: only allow the assignment
+		# of the augmented assignments (i.e.: ``view.child+= node``)
+		raise AttributeError('NodeView links are read-only, use += or |=')
+
+	def _get_name(self):
+		return self.tree.names[self.id]
+
+	def _set_name(self, name):
+		self.tree.names[self.id] = name
+
+	name = property(_get_name, _set_name)
+
+	def _get_attr(self):
+		attr = self.tree.attrs[self.id]
+		if attr is None:
+			attr = self.tree.attrs[self.id] = {}
+		return attr
+
+	def _set_attr(self, attr):
+		self.tree.attrs[self.id] = attr
+
+	attr = property(_get_attr, _set_attr)
+
+	def _get_parent(self):
+		parent = self.tree.parents[self.id]
+		return self if parent < 0 else NodeView(self.tree, parent)
+
+	def _set_parent(self, parent):
+		if parent != self._get_parent():
+			self._relink(parent)
+
+	parent = property(_get_parent, _set_parent, doc='Parent node, or the node itself for a root (as :class:`MazNode`)')
+
+	def _get_child(self):
+		children = self.tree.children[self.id]
+		return NodeView(self.tree, children[0]) if children else None
+
+	def _set_child(self, child):
+		if child != self._get_child():
+			self._relink(child)
+
+	child = property(_get_child, _set_child, doc='First child, or ``None``')
+
+	def _get_next(self):
+		siblings = self.tree.siblings(self.id)
+		position = self.tree.positions[self.id] + 1
+		return NodeView(self.tree, siblings[position if position < len(siblings) else 0])
+
+	def _set_next(self, next):
+		if next != self._get_next():
+			self._relink(next)
+
+	next = property(_get_next, _set_next, doc='Next brother; the last child is followed by the first')
+
+	def _get_prev(self):
+		siblings = self.tree.siblings(self.id)
+		return NodeView(self.tree, siblings[self.tree.positions[self.id] - 1])
+
+	def _set_prev(self, prev):
+		if prev != self._get_prev():
+			self._relink(prev)
+
+	prev = property(_get_prev, _set_prev, doc='Previous brother; the first child is preceded by the last')
+
+	def _snapshot(self, other):
+		'''Return `other`, copied to its own tree if it is in the tree of
+		self: :meth:`NodeTree.load` would walk the children it adds
+		(i.e.: ``view+= view`` would never end)
+		'''
+		if isinstance(other, NodeView) and other.tree is self.tree:
+			tree = NodeTree()
+			return tree.view(tree.load(other))
+		return other
+
+	def __iadd__(self, other):
+		'''Add a copy of `other` as the last child'''
+		self.tree.load(self._snapshot(other), self.id)
+		return self
+
+	def __add__(self, other):
+		'''Return a copy of self with a copy of `other` as the last child'''
+		tree = NodeTree()
+		root = tree.load(self)
+		tree.load(other, root)
+		return tree.view(root)
+
+	def __ior__(self, other):
+		'''Add a copy of `other` as the last brother'''
+		self.tree.load(self._snapshot(other), self.tree.parents[self.id])
+		return self
+
+	__str__ = MazNode.__str__.im_func
+	__repr__ = MazNode.__repr__.im_func
+
+	def __len__(self):
+		'''Return the number of childs'''
+		return self.tree.count(self.id)
+
+	@property
+	def children(self):
+		return list(self)
+
+	def __nonzero__(self):
+		return True
+
+	def __getitem__(self, key):
+		if isinstance(key, basestring):
+			return self.attr[key]
+		if isinstance(key, int):
+			if key < 0:
+				raise TypeError('negative indexes not supported')
+			return NodeView(self.tree, self.tree.child(self.id, key))
+		raise TypeError
+
+	def __iter__(self):
+		'''Iter through childs'''
+		tree = self.tree
+		return (NodeView(tree, child) for child in tree.children[self.id] or ())
+
+	def descend(self, node=None):
+		'''Same as :meth:`MazNode.descend`, see :meth:`NodeTree.descend`'''
+		if node is None:
+			node = self
+		tree = node.tree
+		for status, index, depth in tree.descend(node.id):
+			yield (status, NodeView(tree, index), depth)
@@ -15,11 +15,10 @@ __all__ = ['Wiki2XHTML']
 
 import sre_compile
 import itertools
-import urlparse
 
 
-from nodes import MazNode, LEAVE, EMPTY
-from re_parser import Translator, p_inline
+from links import LinkPolicy
+from re_parser import LazyPattern, Translator
 
 
 
@@ -32,7 +31,24 @@ html_special_chars = {
 	u'<': u'&lt;',
 	u'>': u'&gt;',
 }
-html_entities = dict((v.decode('latin1'), '&%s;'%k) for k, v in __import__('htmlentitydefs').entitydefs.iteritems() if len(v) == 1)
+#? built on first use, see :func:`_entities`
+html_entities = None
+
+#? same tables, indexed by code point for :meth:`unicode.translate`
+_special_chars_table = dict((ord(k), v) for k, v in html_special_chars.iteritems())
+_entities_table = None
+
+
+def _entities():
+	'''Return :data:`_entities_table`, building it (and
+	:data:`html_entities`) from :mod:`htmlentitydefs` on first use
+	'''
+	global html_entities, _entities_table
+	if _entities_table is None:
+		import htmlentitydefs
+		html_entities = dict((v.decode('latin1'), '&%s;'%k) for k, v in htmlentitydefs.entitydefs.iteritems() if len(v) == 1)
+		_entities_table = dict((ord(k), unicode(v)) for k, v in html_entities.iteritems())
+	return _entities_table
 
 
 
@@ -46,25 +62,34 @@ class Wiki2XHTML(Translator):
 	   few elements has been left unimplemented.
 	'''
 	#? first space of each line
-	_first_space = sre_compile.compile(r'(?:^|(?<=\n))(?:[ ]|(?=\n))')
+	_first_space = LazyPattern(r'(?:^|(?<=\n))(?:[ ]|(?=\n))')
 
 	#? first '> ' sequence of each line, the space being optional
-	_first_gt_space = sre_compile.compile(r'(?:^|(?<=\n))>(?:[ ]|(?=\n))')
+	_first_gt_space = LazyPattern(r'(?:^|(?<=\n))>(?:[ ]|(?=\n))')
 
 	#? double or more LF
-	_block_separator = sre_compile.compile(r'\n\n+(?=\S)')
+	_block_separator = LazyPattern(r'\n\n+(?=\S)')
 
 	#? separate list prefix (# | *) and list value
-	_fragment_list = sre_compile.compile(
-		r'(?P<type>[*#]+) \s* (?P<value> (?: (?:(?:.|\n)+?) (?:(?=\n[#*])|$) ) | (?:.+\n)$ )',
+	_fragment_list = LazyPattern(
+		r'(?P<type>[*#]+) \s* (?P<value> .+ | \n )',
 		sre_compile.SRE_FLAG_MULTILINE|sre_compile.SRE_FLAG_VERBOSE
 	)
 
-	#? use to beautify ``<li>\n\s*value`` to ``<li>value``
-	_li_trim = sre_compile.compile(r'(?<=<li>)\s+|(?<![>])(?=\n)\s+?(?=</li>)')
-
 	#? non-word
-	_non_word = sre_compile.compile(r'\W+')
+	_non_word = LazyPattern(r'\W+')
+
+	inline_tags = {
+		'code': (u'<tt class="code">', u'</tt>'),
+		'em': (u'<em>', u'</em>'),
+		'strong': (u'<strong>', u'</strong>'),
+		'del': (u'<del>', u'</del>'),
+		'ins': (u'<ins>', u'</ins>'),
+	}
+
+	#? :class:`links.LinkPolicy` classifying the targets of the links and
+	#? images, shared by default
+	link_policy = LinkPolicy()
 
 	@staticmethod
 	def escape(string, entities=False):
@@ -74,9 +99,18 @@ class Wiki2XHTML(Translator):
 		HTML entity equivalent.
 		If the optional argument `entities` is set, will use an
 		entities table build from :var:`htmlentitydefs.entitydefs`.
+
+		The result is always *``unicode``*.
 		'''
-		tr = html_entities if entities else html_special_chars
-		return u''.join(c in tr and tr[c] or c for c in string)
+		if not isinstance(string, unicode):
+			#? :meth:`str.translate` does not take the tables
+			string = unicode(string)
+		if entities:
+			return string.translate(_entities())
+		for c in html_special_chars:
+			if c in string:
+				return string.translate(_special_chars_table)
+		return string
 
 	##### blocks
 	@staticmethod
@@ -84,14 +118,13 @@ class Wiki2XHTML(Translator):
 		return u'<hr />\n'
 
 	def b_p(self, match):
-		return u'<p>%s</p>\n' % p_inline.sub(self.inlines, match.group('p')).strip()
+		return u'<p>%s</p>\n' % self.inline(match.group('p')).strip()
 
 	def b_xmp(self, match):
 		return u'<pre class="xmp">%s</pre>\n' % self.escape(match.group('xmp')).strip()
 
 	def b_pre(self, match):
-		return u'<pre>%s</pre>\n' % p_inline.sub(
-			self.inlines,
+		return u'<pre>%s</pre>\n' % self.inline(
 			self._first_space.sub('', match.group(match.lastgroup))
 		).rstrip()
 
@@ -102,14 +135,13 @@ class Wiki2XHTML(Translator):
 	def b_head(self, match):
 		return u'<h%(n)u>%(value)s</h%(n)u>\n' % {
 			'n': 6-len(match.group('head_level')),
-			'value': p_inline.sub(self.inlines, match.group('head_value'))
+			'value': self.inline(match.group('head_value'))
 		}
 
 	def b_blockquote(self, match):
 		return u'<blockquote><p>%s</p></blockquote>\n' % u'</p>\n<p>'.join(
 				self._block_separator.split(
-					p_inline.sub(
-						self.inlines,
+					self.inline(
 						self._first_gt_space.sub(
 							'',
 							match.group(match.lastgroup)
@@ -119,47 +151,86 @@ class Wiki2XHTML(Translator):
 		).rstrip()
 
 	def b_list(self, match):
+		#? the items are written in a single pass, the lists being opened
+		#? and closed from the difference between consecutive prefixes
+
+		#? open lists, outermost first: [closing tag, depth, whether its
+		#? first child is an item, open item or None]; the open item is
+		#? [depth, translated value, whether it holds a list]
+		stack = []
+		result = []
+		write = result.append
 		ltprev = ''
-		#? TODO: i'd like to do it without the nodes tree
-		root = node = MazNode('div')
 		for m in self._fragment_list.finditer(match.group()):
 			ltcurr, value = m.groups()
-			for prev, curr in itertools.dropwhile(lambda x: not cmp(x[0], x[1]), itertools.izip_longest(ltprev, ltcurr)):
-				if prev:
-					node = node.parent
-					if node.name == 'li':
-						node = node.parent
-				if curr:
-					if node.child and node.child.name == 'li':
-						node = node.child.prev
-					node+= MazNode('%sl' %(curr == '#' and 'o' or 'u',))
-					node = node.child.prev
-			node+= (MazNode('li') + MazNode(value=p_inline.sub(self.inlines, value)))
+			level = 0
+			for prev, curr in itertools.izip(ltprev, ltcurr):
+				if prev != curr:
+					break
+				level+= 1
+			while len(stack) > level:
+				close, depth, _, item = stack.pop()
+				if item:
+					self._close_li(write, item)
+				write(u'\n%s%s' % (u' ' * depth, close))
+			for curr in ltcurr[level:]:
+				tag = u'ol' if curr == u'#' else u'ul'
+				indent = u'\n'
+				if not stack:
+					depth = 0
+				else:
+					parent = stack[-1]
+					item = parent[3]
+					if parent[2]:
+						#? nested in the last item
+						item[2] = True
+						depth = item[0] + 1
+						if not item[1].strip():
+							indent = u''
+					else:
+						#? nested in the list itself
+						parent[2] = False
+						if item:
+							self._close_li(write, item)
+							parent[3] = None
+						depth = parent[1] + 1
+				if indent:
+					indent+= u' ' * depth
+				write(u'%s<%s>' % (indent, tag))
+				stack.append([u'</%s>' % tag, depth, None, None])
+			parent = stack[-1]
+			if parent[3]:
+				self._close_li(write, parent[3])
+			if parent[2] is None:
+				parent[2] = True
+			value = self.inline(value)
+			depth = parent[1] + 1
+			write(u'\n%s<li>%s' % (u' ' * depth, value.lstrip()))
+			parent[3] = [depth, value, False]
 			ltprev = ltcurr
-		# FIXME: there is a bug in MazNode when descending from a higher level than the root
-		root.child.parent = root.child
-		return self._li_trim.sub('', node2html(root.child))
+		while stack:
+			close, depth, _, item = stack.pop()
+			if item:
+				self._close_li(write, item)
+			write(u'\n%s%s' % (u' ' * depth, close))
+		return u''.join(result)[1:]
+
+	@staticmethod
+	def _close_li(write, item):
+		'''Write the end of the list `item`, trimming the spaces after its
+		value unless it ends with a tag
+		'''
+		depth, value, nested = item
+		if nested or value.endswith(u'>'):
+			write(u'\n%s</li>' % (u' ' * depth,))
+		else:
+			write(u'</li>')
 
 	@staticmethod
 	def b_nl(match):
 		return ''
 
 	##### inlines
-	def i_code(self, match):
-		return u'<tt class="code">%s</tt>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
-
-	def i_em(self, match):
-		return u'<em>%s</em>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
-
-	def i_strong(self, match):
-		return u'<strong>%s</strong>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
-
-	def i_del(self, match):
-		return u'<del>%s</del>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
-
-	def i_ins(self, match):
-		return u'<ins>%s</ins>' % p_inline.sub(self.inlines, match.group(match.lastgroup))
-
 	@staticmethod
 	def i_br(match):
 		return u'<br />'
@@ -170,34 +241,37 @@ class Wiki2XHTML(Translator):
 	def i_acronym(self, match):
 		return u'<acronym%s>%s</acronym>' % (
 			u' title="%s"' % self.escape(match.group('acronym_title').strip()) if match.group('acronym_title') else '',
-			p_inline.sub(self.inlines, match.group('acronym_value')).strip()
+			self.inline(match.group('acronym_value')).strip()
 		)
 
 	def i_a(self, match):
-		href = urlparse.urlsplit(match.group('a_href'))
 		link = [u'<a href="%s"' % match.group('a_href')]
 		if match.group('a_title'):
 			link.append(u' title="%s"' % self.escape(match.group('a_title')))
 		if match.group('a_lang'):
 			link.append(u' hreflang="%s"' % self.escape(match.group('a_lang')))
-		if href.scheme:
-			# TODO: make a handle for the external using the hostname
-			link.append(u' class="external"')
+		link.append(self.link_policy.classify(match.group('a_href')).a_attributes)
 		link.append(u'>%s</a>' % (
-			p_inline.sub(self.inlines, match.group('a_value')) \
+			self.inline(match.group('a_value')) \
 			if match.group('a_value') \
 			else self.escape(match.group('a_href'))
 		))
 		return ''.join(link)
 
 	def i_uri(self, match):
-		return u'<a href="%s" class="external">%s</a>' % (
-			match.group(match.lastgroup),
-			self.escape(match.group(match.lastgroup))
+		href = match.group(match.lastgroup)
+		return u'<a href="%s"%s>%s</a>' % (
+			href,
+			#? the rule only matches a target with a scheme
+			self.link_policy.classify(href, href.split(u':', 1)[0]).a_attributes,
+			self.escape(href)
 		)
 
 	def i_img(self, match):
-		link = [u'<img src="%s"' % match.group('img_src')]
+		link = [u'<img src="%s"%s' % (
+			match.group('img_src'),
+			self.link_policy.classify(match.group('img_src')).img_attributes
+		)]
 		if match.group('img_alt'):
 			link.append(u'alt="%s"' % self.escape(match.group('img_alt')))
 		if match.group('img_desc'):
@@ -214,7 +288,7 @@ class Wiki2XHTML(Translator):
 				#? align right
 				link.append('style="float:right; margin: 0 0 1em 1em;"')
 			else:
-				self.warn(match, 'unknown alignment %r' % match.group('img_align'))
+				self._warning(match, 'unknown alignment %r', match.group('img_align'))
 		link.append('/>')
 		return ' '.join(link)
 
@@ -225,22 +299,62 @@ class Wiki2XHTML(Translator):
 		if match.group('cite_cite'):
 			# FIXME? use urlencode, not escape
 			r.append(u' cite="%s"' % self.escape(match.group('cite_cite')))
-		r.append(u'>%s</q>' % p_inline.sub(self.inlines, match.group('cite_value')).strip())
+		r.append(u'>%s</q>' % self.inline(match.group('cite_value')).strip())
 		return ''.join(r)
 
 
-def node2html(node):
-	'''Return a string representation of the node tree
+def node2html(node, out=None, escape=False, indent=u' '):
+	'''Serialize the :class:`MazNode` (or :class:`NodeView`) tree `node`
 
-	.. Warning::
-	   This is a really specific minimalist implementation.
+	Each node is written on its own line, preceded by `indent` repeated
+	as many times as its depth: the elements with their attributes
+	(sorted by name, escaped), the elements without child as
+	self-closing tags and the text nodes with their ``value``, escaped
+	only if `escape` is set: by default, the values are written as they
+	are (i.e.: when they hold translated markup), as they always were.
+	An empty `indent` keeps the size of the result linear in the number
+	of nodes for deep trees.
+
+	Return the result, or write its pieces to `out` if set: a list,
+	which is extended, or any object with a ``write`` method.
+
+	.. Note::
+	   The tree is walked through the children of each node (not
+	   :meth:`MazNode.descend`) with an explicit stack: the time is
+	   linear in the number of nodes and the depth is not limited by the
+	   Python stack.
 	'''
-	data = []
-	RS = u' '
-	for status, node, depth in node.descend(node):
-		if status == EMPTY:
-			assert not node.name
-			data.append(u'%s%s' % (RS*depth, node['value']) )
+	if out is None:
+		result = []
+		node2html(node, result, escape, indent)
+		return u''.join(result)
+	write = getattr(out, 'write', None) or out.append
+	quote = Wiki2XHTML.escape
+	text = quote if escape else unicode
+	#? closing tag and remaining children of the open elements
+	stack = []
+	children = iter((node,))
+	newline = u''
+	while 1:
+		node = next(children, None)
+		if node is None:
+			if not stack:
+				break
+			close, children = stack.pop()
+			write(close)
+			continue
+		prefix = newline + indent * len(stack)
+		newline = u'\n'
+		if not node.name:
+			write(prefix + text(node.attr['value']))
+			continue
+		attributes = u''.join(
+			u' %s="%s"' % (name, quote(unicode(value)))
+			for name, value in sorted(node.attr.iteritems())
+		)
+		if node.child:
+			write(u'%s<%s%s>' % (prefix, node.name, attributes))
+			stack.append((u'\n%s</%s>' % (indent * len(stack), node.name), children))
+			children = iter(node)
 		else:
-			data.append(u'%s<%s%s>' % (RS*depth, u'/' if status == LEAVE else u'', node.name))
-	return u'\n'.join(data)
+			write(u'%s<%s%s />' % (prefix, node.name, attributes))
@@ -1,15 +1,73 @@
 __all__ = (
+	'BlockState',
+	'Grammar',
+	'LazyPattern',
+	'LimitExceeded',
 	'Translator',
+	'grammar',
+	'iter_blocks',
+	'iter_lines',
 	'p_block',
 	'p_inline',
+	'p_inline_scan',
+	'warmup',
 )
 
 
 
 
 
+import codecs
+import itertools
+import re
 import sre_compile
 import sys
+import time
+
+
+from diagnostics import Diagnostics
+from stats import Stats
+
+
+
+
+
+class LazyPattern(object):
+	'''Regular expression compiled on first use
+
+	Parameters:
+	- `pattern`: the source of the expression
+	- `flags`: as for :func:`re.compile`
+
+	The attributes of the compiled pattern (``search``, ``groupindex``,
+	...) are read through the instance, which keeps them once read: the
+	methods are then the bound methods of the compiled pattern.
+
+	The instances are meant to be module or class constants: they are all
+	kept in :attr:`instances`, compiled by :func:`warmup`.
+	'''
+	instances = []
+
+	def __init__(self, pattern, flags=0):
+		self._pattern = pattern
+		self._flags = flags
+		self._compiled = None
+		LazyPattern.instances.append(self)
+
+	def compile(self):
+		'''Return the compiled pattern'''
+		if self._compiled is None:
+			self._compiled = sre_compile.compile(self._pattern, self._flags)
+		return self._compiled
+
+	def __getattr__(self, name):
+		# only called when `name` is not found: keep the attribute
+		value = getattr(self.compile(), name)
+		self.__dict__[name] = value
+		return value
+
+	def __repr__(self):
+		return '%s(%r, %r)' % (self.__class__.__name__, self._pattern, self._flags)
 
 
 
@@ -19,24 +77,31 @@ RULES_FLAGS = sre_compile.SRE_FLAG_MULTILINE | sre_compile.SRE_FLAG_VERBOSE | sr
 
 RULES_BLOCK = (
 	#? xmp and macro-block raw-html
-	r'(?:^\s*///\s*(?P<macro>html)?\s*(?(macro)(?P<special>(?:(?!///$)(?:.|\n))*)|(?P<xmp>(?:(?!///$)(?:.|\n))*))(?:///))',
+	#? the content runs up to the first ``///`` ending a line: unrolled
+	#? as ``[^/]*`` runs so that most characters are matched by a single
+	#? repeat instead of one look-ahead and one branch each
+	r'(?:^\s*///\s*(?P<macro>html)?\s*(?(macro)(?P<special>[^/]*(?:/(?!//$)[^/]*)*)|(?P<xmp>[^/]*(?:/(?!//$)[^/]*)*))(?:///))',
 	#? pre
 	r'(?P<pre> (?:(?<=\n\n)|^)   (?:^[ ].+(\n|$))+ )',
 	#? list, ordered and unordered Matches them whole, separate items are parsed later. The list *must* start with a single bullet.
 	r'(?P<list>^[ \t]*([*][^*\#]|[\#][^\#*]).*$(\n[ \t]*[*\#]+.*$)*)',
 	#? head
-	r'^\s*(?P<head>(?P<head_level>!{1,4})(?P<head_value>.*?))\s*$',
+	#? the value ends on the last non-space character of the line (a lazy
+	#? ``.*?`` would re-scan the trailing spaces on each character)
+	r'^\s*(?P<head>(?P<head_level>!{1,4})(?P<head_value>(?:.*\S)?))\s*$',
 	#? hr separator
 	r'(?P<hr>^\s*----\s*$)',
-	#? citation
-	r'^(?P<blockquote>>(.*) ([\#]!(\s+.*)?$)?(.|\n)+?)(?:^[^>]|^$)',
-	#? paragraph
-	r'(?:(?<=(\n\n)(?![/*#!]|----))|^) (?P<p> ^(?:(?:.+\n(?!\n))*(?:.+$)) \n?)',
+	#? citation, up to the first line not starting with '>' (whose first
+	#? character is consumed); matched line by line so that an unterminated
+	#? citation fails in a single pass
+	r'^(?P<blockquote>>(.*) ([\#]!(\s+.*)?$)? (?:\n>.*)* \n)(?:[^>]|$)',
+	#? paragraph, up to the next empty line
+	r'(?P<p> ^.+ (?:\n.+)* \n?)',
 	#? empty line
 	r'(?P<nl>^\s*$ )',
 )
 
-p_block = sre_compile.compile('|'.join(RULES_BLOCK), RULES_FLAGS)
+p_block = LazyPattern('|'.join(RULES_BLOCK), RULES_FLAGS)
 
 RULES_INLINE = (
 	#? URLs (starting with an url scheme like HTTP)
@@ -74,9 +139,322 @@ RULES_INLINE = (
 	r'(?: (?<!\s|\\)\$\$(?P<footnote>  (?: (?<![^\\](?=\$\$)) .)+  ) \$\$)',
 )
 
-p_inline = sre_compile.compile(r'(?<!\\)(?:%s)' % ('|'.join(RULES_INLINE),), RULES_FLAGS)
+p_inline = LazyPattern(r'(?<!\\)(?:%s)' % ('|'.join(RULES_INLINE),), RULES_FLAGS)
+
+#? inline rules whose content is translated in place by
+#? :meth:`Translator.inline`, with their (opening and closing) delimiter
+INLINE_CONTAINERS = (
+	('em', "''"),
+	('strong', '__'),
+	('code', '@@'),
+	('ins', '++'),
+	('del', '--'),
+)
+
+_delimiters = dict(INLINE_CONTAINERS)
+_container_names = dict((delimiter, name) for name, delimiter in INLINE_CONTAINERS)
+
+#? the strings starting each of the :data:`RULES_INLINE` (or following
+#? the scheme of an URI): the rules are only matched where
+#? :data:`p_inline_scan` finds one, a search of literal strings which the
+#? regular expression engine runs without trying the rules at each
+#? character
+INLINE_STARTS = (
+	('uri', (':', '%;')),
+	('img', ('((',)),
+	('escape', ('\\',)),
+	('em', ("''",)),
+	('strong', ('__',)),
+	('br', ('%%%',)),
+	('anchor', ('~',)),
+	('a', ('[',)),
+	('acronym', ('??',)),
+	('cite', ('{{',)),
+	('code', ('@@',)),
+	('ins', ('++',)),
+	('del', ('--',)),
+	('footnote', ('$$',)),
+)
+
+def _starts(names):
+	'''Return the :class:`LazyPattern` searching the strings starting
+	the inline rules in `names` (every rule if ``None``)
+	'''
+	starts = [
+		re.escape(start)
+		for rule, (_, strings) in zip(RULES_INLINE, INLINE_STARTS)
+		if names is None or names.intersection(_group_names(rule))
+		for start in strings
+	]
+	return LazyPattern('|'.join(starts) or r'(?!)')
+
+p_inline_scan = _starts(None)
+
+#? the letters of an URI scheme
+_scheme = frozenset(u'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+
+def _content_end(data, start, end, delimiter, found):
+	'''Return the end of the content of the container opened by
+	`delimiter` at `start` in `data` (the offset of its closing
+	delimiter, which ends before `end`), or -1 if it is not closed
+
+	The closing delimiter is the first which is not escaped, the content
+	is not empty and holds no LF. `found` caches the offsets of the
+	closing delimiters, as ``(pos, offset)`` by delimiter: the containers
+	of a string are opened forward, so that their closing delimiters are
+	found in a time linear in the size of the string (the LF is only
+	searched in the content of a closed container).
+	'''
+	if start and data[start - 1] == u'\\':
+		return -1
+	size = len(delimiter)
+	pos = start + size + 1
+	cached = found.get(delimiter)
+	if cached is not None and cached[0] <= pos <= cached[1]:
+		content = cached[1]
+	else:
+		content = data.find(delimiter, pos)
+		while content > 0 and data[content - 1] == u'\\':
+			content = data.find(delimiter, content + 1)
+		if content < 0:
+			content = len(data)
+		found[delimiter] = (pos, content)
+	if content + size > end or data.find(u'\n', start + size, content) >= 0:
+		return -1
+	return content
+
+
+def _counted(matches):
+	'''Return :func:`_content_end`, counting the closed containers in
+	`matches` (see :attr:`stats.Stats.matches`)
+	'''
+	def content_end(data, start, end, delimiter, found):
+		content = _content_end(data, start, end, delimiter, found)
+		if content >= 0:
+			matches['i_' + _container_names[delimiter]]+= 1
+		return content
+	return content_end
+
+
+
+class Grammar(object):
+	'''Patterns of the rules having a named group in :attr:`names`
+	(every rule if ``None``), see :func:`grammar`
+	'''
+	__slots__ = ('names', 'block', 'inline', 'inline_scan')
+
+	def __init__(self, names, block, inline, inline_scan):
+		self.names = names
+		self.block = block
+		self.inline = inline
+		self.inline_scan = inline_scan
+
+	def __repr__(self):
+		return '%s(%r)' % (self.__class__.__name__, self.names)
+
+
+def _group_names(rule):
+	return re.findall(r'\(\?P<(\w+)>', rule)
 
 
+def _alternation(rules, names, template):
+	'''Return the :class:`LazyPattern` of the `rules` having a named
+	group in `names`, formatted with `template`
+	'''
+	rules = [rule for rule in rules if names.intersection(_group_names(rule))]
+	if not rules:
+		#? never matches: the whole text is left untouched
+		return LazyPattern(r'(?!)', RULES_FLAGS)
+	return LazyPattern(template % ('|'.join(rules),), RULES_FLAGS)
+
+
+#? the grammars by set of names
+_grammars = {None: Grammar(None, p_block, p_inline, p_inline_scan)}
+
+def grammar(names=None):
+	'''Return the :class:`Grammar` scanning only the rules having a named
+	group in `names` (i.e.: ``('p', 'em', 'a')``), or every rule
+
+	The grammars are cached by set of names: the translators scanning
+	the same rules share the same patterns, compiled on first use.
+	'''
+	if names is not None:
+		names = frozenset(names)
+	value = _grammars.get(names)
+	if value is None:
+		value = _grammars.setdefault(names, Grammar(
+			names,
+			_alternation(RULES_BLOCK, names, '%s'),
+			_alternation(RULES_INLINE, names, r'(?<!\\)(?:%s)'),
+			_starts(names),
+		))
+	return value
+
+
+
+
+
+def iter_lines(source, encoding='utf-8'):
+	'''Yield the *``unicode``* lines of `source`, LF included
+
+	Parameters:
+	- `source`: a file-like object, an iterable of strings (lines or
+	  arbitrary pieces) or a single string
+	- `encoding`: used to decode the non-``unicode`` strings; a
+	  multi-byte sequence may be split between two pieces
+	'''
+	if isinstance(source, basestring):
+		source = (source,)
+	decode = codecs.getincrementaldecoder(encoding)().decode
+	pending = u''
+	for data in source:
+		if not isinstance(data, unicode):
+			data = decode(data)
+		start = 0
+		end = data.find(u'\n')
+		if end >= 0:
+			end+= len(pending)
+		pending+= data
+		while end >= 0:
+			yield pending[start:end + 1]
+			start = end + 1
+			end = pending.find(u'\n', start)
+		pending = pending[start:]
+	pending+= decode('', True)
+	if pending:
+		yield pending
+
+
+#? a line (LF included) starting a list, continuing a list (see
+#? :data:`RULES_BLOCK`): the character after a single bullet may be the LF
+_p_list_start = LazyPattern(r'[ \t]*(?:[*][^*\#]|[\#][^\#*])')
+_p_list_item = LazyPattern(r'[ \t]*[*\#]')
+
+
+class BlockState(object):
+	'''Follow the block rules of :data:`p_block` line by line, to tell
+	whether a ``///`` block is open after a line (:attr:`xmp`)
+
+	A ``///`` line only opens a block where :data:`p_block` starts a
+	match: on the first line, after an empty line or after the end of a
+	single line title or separator, of a list or of a ``pre``; inside a
+	paragraph, it is part of the paragraph. A list starting with a bullet
+	alone on its line takes the next line (even empty) as the value of
+	its first item.
+	'''
+	__slots__ = ('xmp', 'mode')
+
+	def __init__(self):
+		self.xmp = False
+		#? the block continued by the next line, ``None`` if it starts a
+		#? block; ``'item'`` if the next line is the value of the first item
+		self.mode = None
+
+	@property
+	def split(self):
+		'''Whether an empty line after the lines fed ends the block'''
+		return not self.xmp and self.mode != 'item'
+
+	def feed(self, line):
+		'''Update the state with the *``unicode``* `line`, LF included'''
+		text = line.rstrip(u'\n')
+		if self.xmp:
+			if text.endswith(u'///'):
+				self.xmp = False
+			return
+		mode = self.mode
+		if mode == 'item':
+			self.mode = 'list'
+			return
+		if mode == 'p':
+			if text:
+				return
+		elif mode == 'list':
+			if _p_list_item.match(text):
+				return
+		elif mode == 'pre':
+			if text[:1] == u' ' and len(text) > 1:
+				return
+		elif mode == 'blockquote':
+			if text[:1] == u'>':
+				return
+			#? its first character ends the citation: the line starts no block
+			self.mode = None
+			return
+		self.mode = None
+		head = text.lstrip()
+		if head.startswith(u'///'):
+			self.xmp = not head[3:].endswith(u'///')
+		elif not head:
+			#? a blank line may be followed by the start of a ``///`` block
+			#? (matched from the blank line)
+			pass
+		elif text[0] == u' ':
+			#? before the titles: `` !a`` is a ``pre``
+			self.mode = 'pre'
+		elif _p_list_start.match(line):
+			self.mode = 'item' if head in (u'*', u'#') and line.endswith(u'\n') else 'list'
+		elif head[0] == u'!' or head.rstrip() == u'----':
+			pass
+		elif text[0] == u'>':
+			self.mode = 'blockquote'
+		else:
+			self.mode = 'p'
+
+
+def iter_blocks(source, encoding='utf-8'):
+	'''Yield *``unicode``* chunks of `source` which can be parsed separately
+
+	`source` and `encoding` are handled as in :func:`iter_lines`.
+
+	Chunks are split before each empty line found outside of a ``///``
+	block or of the first item of a list (see :class:`BlockState`) and
+	following a line which is not blank (a ``///`` block may start on a
+	blank line and span over the empty lines after it): only these blocks
+	may contain an empty line, so no block spans over two chunks (but the
+	parsing of a chunk may depend on the first characters of the next one, see
+	:meth:`Translator.iter_run`).
+
+	.. Note::
+	   An unterminated ``///`` block makes the remaining of the document
+	   a single chunk.
+	'''
+	chunk = []
+	state = BlockState()
+	for line in iter_lines(source, encoding):
+		if line == u'\n' and state.split and chunk and chunk[-1].strip():
+			yield u''.join(chunk)
+			chunk = []
+		state.feed(line)
+		chunk.append(line)
+	if chunk:
+		yield u''.join(chunk)
+
+
+def warmup(*translators):
+	'''Compile every :class:`LazyPattern` and build the dispatch tables of
+	`translators` (:class:`Translator` instances)
+
+	The work done on first use by the imported modules is done at once:
+	i.e. by a pre-fork server, before forking, so that the workers start
+	with the compiled patterns (shared with the parent) instead of each
+	compiling them on its first request.
+	'''
+	for pattern in LazyPattern.instances:
+		pattern.compile()
+	for translator in translators:
+		for name in translator._tables:
+			getattr(translator, name)
+
+
+
+
+
+class LimitExceeded(Exception):
+	'''Raised when a document is larger than :attr:`Translator.max_size`
+	or takes longer than :attr:`Translator.max_time` to translate
+	'''
 
 
 
@@ -88,7 +466,197 @@ class Translator(object):
 
 	Unimplemented methods will call :meth:`Translator.warn` and return the
 	input untouched.
+
+	Handlers are resolved once per instance, the first time they are
+	needed: every named group of :data:`p_block` (resp. :data:`p_inline`)
+	is looked up as ``b_`` (resp. ``i_``) + group name and stored in a
+	table indexed by the group number, so the dispatch of a match is a
+	single list lookup on :attr:`match.lastindex`.
+
+	A subclass registers a handler by defining the method; to add or
+	replace a handler on an instance already in use, call
+	:meth:`Translator.register`.
+
+	A translator handling only a few rules (i.e.: a renderer of comments
+	allowing only ``em``, ``strong`` and ``a``) scans a smaller
+	:class:`Grammar` by listing them in :attr:`rules`, or by setting
+	:attr:`restricted` to scan only the rules it has a handler for: the
+	text of the other rules is written untouched, without warning.
+
+	The block rules are matched in a time linear in the size of the
+	input, but not the inline rules (a paragraph full of unterminated
+	links takes a time quadratic in its size); to translate untrusted
+	documents, set :attr:`max_size` and :attr:`max_time` on the subclass
+	or on the instance.
 	'''
+	#? opening and closing strings written around the translated content
+	#? of the :data:`INLINE_CONTAINERS` which have no handler;
+	#? i.e.: ``{'em': (u'<em>', u'</em>')}``
+	inline_tags = {}
+
+	#? hardening limits, ``None`` to disable them: maximum size of a
+	#? document (in characters) and maximum duration of its translation
+	#? (in seconds, checked before each block and each inline rule
+	#? matched); :class:`LimitExceeded` is raised when they are exceeded
+	max_size = None
+	max_time = None
+
+	#? function returning the current time (in seconds) for
+	#? :attr:`max_time`
+	clock = staticmethod(time.time)
+
+	#? time at which the translation in progress must stop, see
+	#? :meth:`Translator._until`
+	_stop_at = None
+
+	#? :class:`stats.Stats` of the instance, see :meth:`Translator.profile`
+	stats = None
+
+	#? :class:`diagnostics.Diagnostics` collecting the warnings of the
+	#? instance, see :meth:`Translator.warn`
+	diagnostics = None
+
+	#? names of the rules scanned by the translator, see :func:`grammar`;
+	#? ``None`` for every rule (or for the handled rules if
+	#? :attr:`restricted` is set)
+	rules = None
+	restricted = False
+
+	#? pattern matching a character of every inline element the
+	#? translator handles, ``None`` if unknown: the text (or the content
+	#? of a container) without any is not scanned for inline elements
+	_inline_trigger = None
+
+	#? attributes built by :meth:`Translator.__getattr__`
+	_tables = (
+		'_grammar',
+		'_block_handlers',
+		'_inline_handlers',
+		'_inline_containers',
+		'_containers',
+		'_block_search',
+		'_inline_search',
+		'_inline_match',
+		'_inline_content_end',
+	)
+
+	def __getattr__(self, name):
+		# only called when `name` is not found: build the dispatch table
+		# (or search method) once and store it in the instance dictionary
+		if name == '_grammar':
+			value = grammar(self.rule_names())
+		elif name == '_block_handlers':
+			value = self._handlers(self._grammar.block, 'b_')
+		elif name == '_inline_handlers':
+			value = self._handlers(self._grammar.inline, 'i_')
+		elif name == '_block_search':
+			value = self._search('p_block', self._grammar.block, 'b_')
+		elif name == '_inline_search':
+			value = self._search('p_inline_scan', self._grammar.inline_scan)
+		elif name == '_inline_match':
+			value = self._search('p_inline', self._grammar.inline, 'i_', 'match')
+		elif name == '_inline_content_end':
+			value = _content_end if self.stats is None else _counted(self.stats.matches)
+		elif name == '_inline_containers':
+			#? delimiter -> (opening, closing, length of the delimiter) of the
+			#? containers translated in place
+			value = dict(
+				(delimiter, self.inline_tags[container] + (len(delimiter),))
+				for delimiter, (container, _) in self._containers.iteritems()
+				if container in self.inline_tags and getattr(self, 'i_' + container, None) is None
+			)
+		elif name == '_containers':
+			#? delimiter -> (name, length of the delimiter) of the containers
+			#? of the grammar
+			groupindex = self._grammar.inline.groupindex
+			value = dict(
+				(delimiter, (container, len(delimiter)))
+				for container, delimiter in INLINE_CONTAINERS
+				if container in groupindex
+			)
+		else:
+			raise AttributeError(name)
+		self.__dict__[name] = value
+		return value
+
+	def rule_names(self):
+		'''Return the names of the rules scanned by the translator:
+		:attr:`rules`, or the names of the groups with a handler (and of
+		the :data:`INLINE_CONTAINERS` with :attr:`inline_tags`) if
+		:attr:`restricted` is set, otherwise ``None`` for every rule
+		'''
+		if self.rules is not None or not self.restricted:
+			return self.rules
+		names = [name for name, _ in INLINE_CONTAINERS if name in self.inline_tags]
+		for prefix, rules in (('b_', RULES_BLOCK), ('i_', RULES_INLINE)):
+			for rule in rules:
+				for name in _group_names(rule):
+					if getattr(self, prefix + name, None) is not None:
+						names.append(name)
+		return names
+
+	def _handlers(self, pattern, prefix):
+		'''Return the list of handlers of `pattern` indexed by group number
+
+		Unnamed groups and groups without handler are set to ``None``.
+		'''
+		table = [None] * (pattern.groups + 1)
+		for name, index in pattern.groupindex.iteritems():
+			handler = getattr(self, prefix + name, None)
+			if handler is not None and self.stats is not None:
+				handler = self.stats.timed(prefix + name, handler)
+			table[index] = handler
+		return table
+
+	def _search(self, name, pattern, prefix=None, method='search'):
+		'''Return the `method` (``search`` or ``match``) of `pattern`,
+		profiled if enabled
+
+		The search of :data:`p_inline_scan` skips the text without any
+		match of :attr:`_inline_trigger`, if set.
+		'''
+		if self.stats is None:
+			search = getattr(pattern, method)
+		else:
+			search = self.stats.search(name, pattern, prefix, method)
+		if name != 'p_inline_scan' or self._inline_trigger is None:
+			return search
+		trigger = self._inline_trigger.search
+		def inline_search(data, pos=0, end=sys.maxint):
+			if trigger(data, pos, end) is None:
+				return None
+			return search(data, pos, end)
+		return inline_search
+
+	def _reset(self):
+		'''Drop the dispatch tables, rebuilt on next use'''
+		for name in self._tables:
+			self.__dict__.pop(name, None)
+
+	def register(self, name, handler):
+		'''Register `handler` as ``name`` (i.e.: ``b_p``, ``i_em``, ...)
+
+		`handler` is called with the match as only parameter; the
+		dispatch tables of the instance are rebuilt on next use.
+		'''
+		setattr(self, name, handler)
+		self._reset()
+
+	def profile(self, enabled=True):
+		'''Enable (or disable) the profiling of the instance
+
+		Return the new :class:`stats.Stats` which records the matches of
+		each rule and the time spent in each handler and in the scans,
+		or ``None``.
+
+		The handlers and the ``search`` methods are wrapped in the
+		dispatch tables only while the profiling is enabled: a
+		translator which is not profiled runs the plain methods.
+		'''
+		self.stats = Stats() if enabled else None
+		self._reset()
+		return self.stats
+
 	def run(self, data, skip_blocks=False):
 		'''Run the parser on `data` and return the result
 
@@ -103,50 +671,370 @@ class Translator(object):
 		'''
 		if not isinstance(data, unicode):
 			data = unicode(data)
+		result = []
+		self.render(data, result, skip_blocks)
+		return u''.join(result)
+
+	def render(self, data, out, skip_blocks=False):
+		'''Run the parser on `data` and write the result to `out`
+
+		Same as :meth:`Translator.run` except that the pieces of the
+		result are written as soon as they are translated, instead of
+		being returned; `out` may be a list, which is extended, or any
+		object with a ``write`` method accepting *``unicode``* strings
+		(i.e.: :class:`io.StringIO`, :class:`io.TextIOWrapper`).
+		'''
+		write = getattr(out, 'write', None) or out.append
+		if not isinstance(data, unicode):
+			data = unicode(data)
+		self._check_size(len(data))
+		deadline = self._deadline()
+		if skip_blocks:
+			self._until(deadline, self.inline, data, write)
+		else:
+			self._until(deadline, self._render, data, write, deadline)
+
+	def _render(self, data, write, deadline):
+		'''Translate the blocks of `data` for :meth:`Translator.render`'''
+		search = self._block_search
+		repl = self.blocks
+		# same loop as `re.sub`: an empty match next to the previous one
+		# is ignored and the next search starts one character further
+		last = start = 0
+		replaced = False
+		size = len(data)
+		while start <= size:
+			if deadline is not None:
+				self._check_time(deadline)
+			match = search(data, start)
+			if match is None:
+				break
+			begin, end = match.span()
+			if not (begin == end == last and replaced):
+				if begin > last:
+					write(data[last:begin])
+				result = repl(match)
+				if result:
+					write(result)
+				replaced = True
+			last = end
+			start = end if end > begin else end + 1
+		if last < size:
+			write(data[last:])
+
+	def inline(self, data, write=None):
+		'''Translate the inline elements of *``unicode``* `data`
+
+		Return the result, or give its pieces to `write` if set.
+
+		The string is scanned once: the strings starting an element are
+		searched with :data:`p_inline_scan`, a container listed in
+		:attr:`inline_tags` (and without handler) is opened on its
+		delimiter if it is closed (see :func:`_content_end`) and its
+		content is then scanned up to the closing delimiter (the scan is
+		bounded by it, so the nested elements can not overlap) before it
+		is closed; the other elements are matched there by
+		:meth:`Translator._match_inline` and given to their handler.
+		'''
+		search = self._inline_search
+		match_inline = self._match_inline
+		content_end = self._inline_content_end
+		handlers = self._inline_handlers
+		containers = self._inline_containers
+		if write is None:
+			result = []
+			append = result.append
+		else:
+			append = write
+		#? closing string, restart and end positions of the enclosing containers
+		stack = []
+		#? closing delimiters, see :func:`_content_end`
+		found = {}
+		#? end of the text written and start of the next search
+		pos = at = 0
+		end = len(data)
+		while 1:
+			candidate = search(data, at, end)
+			if candidate is None:
+				if end > pos:
+					append(data[pos:end])
+				if not stack:
+					break
+				close, pos, end = stack.pop()
+				at = pos
+				append(close)
+				continue
+			start = candidate.start()
+			key = candidate.group()
+			container = containers.get(key)
+			if container is not None:
+				content = content_end(data, start, end, key, found)
+				if content < 0:
+					at = start + 1
+					continue
+				if start > pos:
+					append(data[pos:start])
+				append(container[0])
+				stack.append((container[1], content + container[2], end))
+				pos = at = start + container[2]
+				end = content
+				continue
+			match = match_inline(data, start, at, end, key)
+			if match is None:
+				at = start + 1
+				continue
+			start = match.start()
+			if start > pos:
+				append(data[pos:start])
+			pos = at = match.end()
+			handler = handlers[match.lastindex]
+			if handler is not None:
+				append(handler(match))
+			else:
+				self._warning(match, 'missing inline handler: %s.i_%s()', self.__class__.__name__, match.lastgroup)
+				append(data[start:pos])
+		if write is None:
+			return u''.join(result)
+
+	def _match_inline(self, data, start, pos, end, key):
+		'''Return the match of the inline rules at the string `key` found
+		by :data:`p_inline_scan` at `start` in `data`, the search having
+		started at `pos`, or ``None``
+
+		:attr:`max_time` is checked first: a rule may scan up to the end
+		of the line (i.e.: an unterminated link), so a paragraph full of
+		them takes a time quadratic in its size.
+		'''
+		if self._stop_at is not None:
+			self._check_time(self._stop_at)
+		match = self._inline_match
+		if key != u':':
+			return match(data, start, end)
+		#? the scheme of an URI, before the colon: the rule matches at the
+		#? first letter or nowhere (but after a backslash)
+		first = start
+		while first > pos and data[first - 1] in _scheme:
+			first-= 1
+		if first == start:
+			return None
+		found = match(data, first, end)
+		if found is None and first and data[first - 1] == u'\\' and first + 1 < start:
+			found = match(data, first + 1, end)
+		return found
+
+	def _inline_sub_search(self, data, pos=0, end=sys.maxint):
+		'''Return the first match of the inline rules in `data` from `pos`
+		to `end` (same result as the ``search`` method of
+		:attr:`Grammar.inline`), or ``None``
+		'''
+		search = self._inline_search
+		end = min(end, len(data))
+		while 1:
+			candidate = search(data, pos, end)
+			if candidate is None:
+				return None
+			start = candidate.start()
+			match = self._match_inline(data, start, pos, end, candidate.group())
+			if match is not None:
+				return match
+			pos = start + 1
+
+	def iter_run(self, source, encoding='utf-8', skip_blocks=False):
+		'''Run the parser on `source` and yield the result piece by piece
+
+		Parameters:
+		- `source`: a file-like object, an iterable of strings or a
+		  string, see :func:`iter_lines`
+		- `encoding`: encoding of the non-``unicode`` input
+		- `skip_blocks`: see :meth:`Translator.run`
+
+		The input is split by :func:`iter_blocks` and scanned with one
+		chunk of look-ahead: only the matches starting in the oldest
+		chunk are translated, so the result is the same as with
+		:meth:`Translator.run` while the memory used is bounded by the
+		size of the largest blocks.
+		'''
+		return self.iter_run_chunks(iter_blocks(source, encoding), skip_blocks)
+
+	def iter_run_chunks(self, chunks, skip_blocks=False):
+		'''Same as :meth:`Translator.iter_run`, the input being the
+		*``unicode``* `chunks` split as by :func:`iter_blocks` (i.e.: by
+		:meth:`mapped.MappedDump.blocks`)
+		'''
+		scan = self._scanner(skip_blocks)
+		data = u''
+		# same states as the `re.sub` loop: end of the last match, start
+		# of the next search and whether something has been replaced
+		last = start = 0
+		replaced = False
+		size = 0
+		deadline = self._deadline()
+		for chunk in itertools.chain(chunks, (None,)):
+			limit = len(data)
+			if chunk is not None:
+				data+= chunk
+				size+= len(chunk)
+				self._check_size(size)
+			result, last, start, replaced = scan(data, limit, last, start, replaced, chunk is None, deadline)
+			if chunk is not None:
+				# keep two characters for the look-behind assertions
+				drop = max(0, min(last, start) - 2)
+				data = data[drop:]
+				last-= drop
+				start-= drop
+			if result:
+				yield u''.join(result)
+
+	def _scanner(self, skip_blocks=False):
+		'''Return the function scanning a window of the input for
+		:meth:`Translator.iter_run`
+
+		The function is called with the window `data`, the offset `limit`
+		of its last chunk, the `last`, `start` and `replaced` states of the
+		scan (see :meth:`Translator.iter_run`), whether the window holds
+		the end of the input (`final`) and the `deadline`; it returns the
+		list of the translated pieces and the new states.
+
+		Only the matches starting before `limit` and ending before the end
+		of the window are translated, unless `final` is set, so the result
+		only depends on the arguments.
+		'''
 		if skip_blocks:
-			return p_inline.sub(self.inlines, data)
-		return p_block.sub(self.blocks, data)
+			search, repl = self._inline_sub_search, self.inlines
+		else:
+			search, repl = self._block_search, self.blocks
+		check_time = self._check_time
+		until = self._until
+		def scan_window(data, limit, last, start, replaced, final, deadline):
+			result = []
+			while start <= len(data):
+				if deadline is not None:
+					check_time(deadline)
+				match = search(data, start)
+				if match is None:
+					break
+				begin, end = match.span()
+				if not final and (begin >= limit or end >= len(data)):
+					break
+				if not (begin == end == last and replaced):
+					result.append(data[last:begin])
+					result.append(repl(match))
+					replaced = True
+				last = end
+				start = end if end > begin else end + 1
+			if final:
+				result.append(data[last:])
+			return result, last, start, replaced
+		def scan(data, limit, last, start, replaced, final, deadline=None):
+			return until(deadline, scan_window, data, limit, last, start, replaced, final, deadline)
+		return scan
+
+	def _check_size(self, size):
+		if self.max_size is not None and size > self.max_size:
+			raise LimitExceeded(
+				'document too large: more than %u characters (max_size)' % self.max_size
+			)
+
+	def _deadline(self):
+		'''Return the time at which the translation must stop (the time of
+		the translation in progress, if any), or ``None``
+		'''
+		if self._stop_at is not None:
+			return self._stop_at
+		if self.max_time is not None:
+			return self.clock() + self.max_time
+
+	def _until(self, deadline, function, *args):
+		'''Call `function` with `args` and return its result, the inline
+		scans checking `deadline` (if not ``None``, see
+		:meth:`Translator._deadline`)
+		'''
+		previous = self._stop_at
+		self._stop_at = deadline
+		try:
+			return function(*args)
+		finally:
+			self._stop_at = previous
+
+	def _check_time(self, deadline):
+		if self.clock() > deadline:
+			raise LimitExceeded(
+				'translation too long: more than %g seconds (max_time)' % self.max_time
+			)
 
 	def blocks(self, match):
 		'''Called for blocks replacement during the regexp substitution
 
-		Call self."``b_`` + tag name" with `match` as parameter if the
-		method has been defined in the subclass; otherwise call
-		:meth:`self.warn` and return the untoutched input.
+		Call the handler registered for ``match.lastindex`` with `match`
+		as parameter if the method has been defined in the subclass;
+		otherwise call :meth:`self.warn` and return the untoutched input.
 
 		.. Note::
 		   It is only used when writing a translator.
 		'''
-		target = 'b_%s' % match.lastgroup
-		if hasattr(self, target):
-			return getattr(self, target)(match)
-		self.warn(match, 'missing block handler: %s.%s()' % (self.__class__.__name__, target))
+		handler = self._block_handlers[match.lastindex]
+		if handler is not None:
+			return handler(match)
+		self._warning(match, 'missing block handler: %s.b_%s()', self.__class__.__name__, match.lastgroup)
 		return match.group()
 
 	def inlines(self, match):
 		'''Called for inlines replacement during the regexp substitution
 
-		Call self."``_i`` + tag name" with `match` as parameter if the
-		method has been defined in the subclass; otherwise call
-		:meth:`self.warn` and return the untouched input.
+		Call the handler registered for ``match.lastindex`` with `match`
+		as parameter if the method has been defined in the subclass (or
+		write the :attr:`inline_tags` of the rule around its translated
+		content); otherwise call :meth:`self.warn` and return the
+		untouched input.
 
 		.. Note::
 		   It is only used when writing a translator.
 		'''
-		target = 'i_%s' % match.lastgroup
-		if hasattr(self, target):
-			return getattr(self, target)(match)
-		self.warn(match, 'missing inline handler: %s.%s()' % (self.__class__.__name__, target))
+		index = match.lastindex
+		handler = self._inline_handlers[index]
+		if handler is not None:
+			return handler(match)
+		container = self._inline_containers.get(_delimiters.get(match.lastgroup))
+		if container is not None:
+			return u'%s%s%s' % (container[0], self.inline(match.group(index)), container[1])
+		self._warning(match, 'missing inline handler: %s.i_%s()', self.__class__.__name__, match.lastgroup)
 		return match.group()
 
-	@staticmethod
-	def warn(match, message):
-		if __debug__:
-			sys.stderr.write(
-				'warning: [%s](%d, %d): %s\n' % (
-					match.lastgroup,
-					match.start(),
-					match.end(),
-					message
-				)
-			)
+	def warn(self, match, message):
+		'''Report the warning `message` about `match` to
+		:attr:`diagnostics`
+
+		Override it (on the class or the instance) to handle the warnings
+		otherwise.
+		'''
+		if self.diagnostics is not None:
+			self.diagnostics.add(match.lastgroup, match.start(), match.end(), message)
+
+	def _warning(self, match, message, *args):
+		'''Call :meth:`Translator.warn` with `message` formatted with
+		`args`, unless nobody listens: no :attr:`diagnostics` and the
+		default :meth:`Translator.warn`
+
+		.. Note::
+		   It is only used when writing a translator.
+		'''
+		if self.diagnostics is None and getattr(self.warn, '__func__', None) is Translator.warn.__func__:
+			return
+		self.warn(match, message % args if args else message)
+
+	def diagnose(self, data, skip_blocks=False, limit=10, callback=None):
+		'''Same as :meth:`Translator.run`, returning the result and the
+		:class:`diagnostics.Diagnostics` of the translation
+
+		`limit` and `callback` are passed to the
+		:class:`diagnostics.Diagnostics`.
+		'''
+		previous = self.__dict__.get('diagnostics')
+		diagnostics = self.diagnostics = Diagnostics(limit, callback)
+		try:
+			return self.run(data, skip_blocks), diagnostics
+		finally:
+			if previous is None:
+				del self.diagnostics
+			else:
+				self.diagnostics = previous
@@ -0,0 +1,164 @@
+r'''Extraction of the visible text of the documents, i.e. to index them
+
+Usage::
+	>>> re_text.Wiki2Text().run(u"!Title\n\n__Dot__''Clear'' [site|http://example.org]\n\n* a\n** b")
+	u'Title\n\nDotClear site\n\n- a\n  - b\n'
+
+The text is the one of :class:`renderers.TextRenderer`, translated in a
+single pass instead of rendering a :class:`nodes.NodeTree`; to convert
+files from the command line::
+
+	python -m dotclear -t dotclear.re_text:Wiki2Text -x .text ...
+'''
+__all__ = ['Wiki2Text']
+
+
+
+
+
+from re_html import Wiki2XHTML
+from re_parser import LazyPattern, Translator
+
+
+
+
+
+class Wiki2Text(Translator):
+	'''Translate the DotClear wiki2xhtml markup to its visible text
+
+	The blocks are separated by an empty line, the spaces of the
+	paragraphs, headings, items, acronyms and citations are normalized
+	and the items are written one per line, indented by their depth;
+	links are replaced by their label (or address), images by their
+	alternative text. The ``special`` blocks (raw HTML), the anchors and
+	the footnotes are skipped. Nothing is escaped.
+
+	With ``skip_blocks``, the result is the text of the inline elements,
+	whose spaces are kept.
+	'''
+	#? the containers are translated to their content by
+	#? :meth:`Translator.inline`, without handler call
+	inline_tags = {
+		'code': (u'', u''),
+		'em': (u'', u''),
+		'strong': (u'', u''),
+		'del': (u'', u''),
+		'ins': (u'', u''),
+	}
+
+	#? a character of every match of :data:`re_parser.RULES_INLINE` (i.e.
+	#? the ``:`` of the URIs, the first character of the other delimiters):
+	#? the text without markup is not scanned
+	_inline_trigger = LazyPattern(r"[:(\\'_%~[?{@+$-]")
+
+	def render(self, data, out, skip_blocks=False):
+		if skip_blocks:
+			Translator.render(self, data, out, True)
+			return
+		pieces = []
+		Translator.render(self, data, pieces)
+		write = getattr(out, 'write', None) or out.append
+		if self._join(pieces, write, [False]):
+			write(u'\n')
+
+	@staticmethod
+	def _join(pieces, write, started):
+		'''Write the non-blank `pieces` separated by an empty line, the
+		first one being preceded by the separator if `started[0]` is set,
+		and return ``started[0]``, set once a piece has been written
+		'''
+		for piece in pieces:
+			if piece and not piece.isspace():
+				if started[0]:
+					write(u'\n\n')
+				write(piece)
+				started[0] = True
+		return started[0]
+
+	def _scanner(self, skip_blocks=False):
+		scan = Translator._scanner(self, skip_blocks)
+		if skip_blocks:
+			return scan
+		started = [False]
+		join = self._join
+		def text_scan(data, limit, last, start, replaced, final, deadline=None):
+			pieces, last, start, replaced = scan(data, limit, last, start, replaced, final, deadline)
+			result = []
+			if join(pieces, result.append, started) and final:
+				result.append(u'\n')
+			return result, last, start, replaced
+		return text_scan
+
+	##### blocks
+	@staticmethod
+	def b_hr(match):
+		return u''
+
+	b_special = b_nl = b_hr
+
+	def b_p(self, match):
+		return u' '.join(self.inline(match.group('p')).split())
+
+	@staticmethod
+	def b_xmp(match):
+		return match.group('xmp').rstrip()
+
+	def b_pre(self, match):
+		return self.inline(
+			Wiki2XHTML._first_space.sub('', match.group(match.lastgroup))
+		).rstrip()
+
+	def b_head(self, match):
+		return u' '.join(self.inline(match.group('head_value')).split())
+
+	def b_blockquote(self, match):
+		return u'\n\n'.join(
+			u' '.join(paragraph.split())
+			for paragraph in self.inline(
+				Wiki2XHTML._first_gt_space.sub('', match.group(match.lastgroup))
+			).split(u'\n\n')
+			if paragraph and not paragraph.isspace()
+		)
+
+	def b_list(self, match):
+		#? one line per item, indented by the number of enclosing lists:
+		#? only the depth of the prefixes matters, not whether a list is
+		#? nested in an item or in the list itself
+		inline = self.inline
+		return u'\n'.join(
+			u'%s- %s' % (u'  ' * (len(prefix) - 1), u' '.join(inline(value).split()))
+			for prefix, value in Wiki2XHTML._fragment_list.findall(match.group())
+		)
+
+	##### inlines
+	@staticmethod
+	def i_br(match):
+		return u'\n'
+
+	@staticmethod
+	def i_anchor(match):
+		return u''
+
+	i_footnote = i_anchor
+
+	def i_acronym(self, match):
+		return u' '.join(self.inline(match.group('acronym_value')).split())
+
+	def i_a(self, match):
+		value = match.group('a_value')
+		return self.inline(value) if value else match.group('a_href')
+
+	@staticmethod
+	def i_uri(match):
+		return match.group(match.lastgroup)
+
+	@staticmethod
+	def i_img(match):
+		return match.group('img_alt') or u''
+
+	def i_cite(self, match):
+		return u' '.join(self.inline(match.group('cite_value')).split())
+
+	@staticmethod
+	def i_escape(match):
+		return match.group('escaped_char')
@@ -0,0 +1,669 @@
+'''Renderers of the document trees built by :class:`tree.TreeBuilder`
+
+Usage::
+	>>> document = tree.parse(u"!Title\n\n__Dot__''Clear''")
+	>>> renderers.XHTMLRenderer().render(document)
+	u'<h5>Title</h5>\n\n<p><strong>Dot</strong><em>Clear</em></p>\n'
+	>>> renderers.TextRenderer().render(document)
+	u'Title\n\nDotClear\n'
+	>>> print renderers.RSTRenderer().render(document)
+	Title
+	~~~~~
+	<BLANKLINE>
+	**Dot**\ *Clear*
+	<BLANKLINE>
+
+The document is parsed once and each renderer walks the tree.
+'''
+__all__ = (
+	'Renderer',
+	'RSTRenderer',
+	'TextRenderer',
+	'XHTMLRenderer',
+)
+
+
+
+
+
+import re
+
+
+from diagnostics import Diagnostics
+from re_html import Wiki2XHTML
+from re_parser import LazyPattern
+
+
+
+
+
+_no_attributes = {}
+
+def _indent(text, indent):
+	'''Return `text` with its non-empty lines prefixed with `indent`'''
+	return u'\n'.join(indent + line if line else line for line in text.split(u'\n'))
+
+
+
+class Renderer(object):
+	'''Base class of the renderers
+
+	The tree is walked with an explicit stack, the children of an
+	element being rendered before it: the element is rendered by the
+	method ``r_`` + its name, called with the index of the node, its
+	attributes and the list of the rendered children; the text nodes
+	are rendered by :meth:`Renderer.text`.
+
+	Unimplemented methods will call :meth:`Renderer.warn` and return the
+	rendered children.
+	'''
+	#? tree being rendered
+	tree = None
+
+	#? :class:`diagnostics.Diagnostics` collecting the warnings of the
+	#? instance, see :meth:`Renderer.warn`
+	diagnostics = None
+
+	def render(self, tree, node=None):
+		'''Return the rendering of `node` (the first root by default) of the
+		:class:`nodes.NodeTree` `tree`
+		'''
+		if node is None:
+			node = tree.roots[0]
+		self.tree = tree
+		names = tree.names
+		attrs = tree.attrs
+		children = tree.children
+		text = self.text
+		element = self._element
+		try:
+			if not names[node]:
+				return text(attrs[node]['value'])
+			#? open elements: [index, remaining children, rendered children]
+			stack = [[node, iter(children[node] or ()), []]]
+			while 1:
+				entry = stack[-1]
+				pieces = entry[2]
+				for child in entry[1]:
+					if not names[child]:
+						pieces.append(text(attrs[child]['value']))
+					elif children[child]:
+						stack.append([child, iter(children[child]), []])
+						break
+					else:
+						pieces.append(element(child, []))
+				else:
+					stack.pop()
+					result = element(entry[0], pieces)
+					if not stack:
+						return result
+					stack[-1][2].append(result)
+		finally:
+			self.tree = None
+
+	def _element(self, node, pieces):
+		name = self.tree.names[node]
+		handler = getattr(self, 'r_' + name, None)
+		if handler is None:
+			self._warning(node, 'missing handler: %s.r_%s()', self.__class__.__name__, name)
+			return u''.join(pieces)
+		return handler(node, self.tree.attrs[node] or _no_attributes, pieces)
+
+	def text(self, value):
+		'''Return the rendering of the text node `value`'''
+		return value
+
+	def r_document(self, node, attr, pieces):
+		return u''.join(pieces)
+
+	def warn(self, node, message):
+		'''Report the warning `message` about the element `node` to
+		:attr:`diagnostics`, as :meth:`Translator.warn`: the rule is the
+		name of the element and the span is its index
+
+		Override it (on the class or the instance) to handle the warnings
+		otherwise.
+		'''
+		if self.diagnostics is not None:
+			self.diagnostics.add(self.tree.names[node], node, node, message)
+
+	def _warning(self, node, message, *args):
+		'''Call :meth:`Renderer.warn` with `message` formatted with `args`,
+		unless nobody listens (see :meth:`Translator._warning`)
+		'''
+		if self.diagnostics is None and getattr(self.warn, '__func__', None) is Renderer.warn.__func__:
+			return
+		self.warn(node, message % args if args else message)
+
+	def diagnose(self, tree, node=None, limit=10, callback=None):
+		'''Same as :meth:`Renderer.render`, returning the result and the
+		:class:`diagnostics.Diagnostics` of the rendering
+
+		`limit` and `callback` are passed to the
+		:class:`diagnostics.Diagnostics`.
+		'''
+		previous = self.__dict__.get('diagnostics')
+		diagnostics = self.diagnostics = Diagnostics(limit, callback)
+		try:
+			return self.render(tree, node), diagnostics
+		finally:
+			if previous is None:
+				del self.diagnostics
+			else:
+				self.diagnostics = previous
+
+
+
+class XHTMLRenderer(Renderer):
+	'''Render the tree as :class:`re_html.Wiki2XHTML` translates the
+	document
+	'''
+	escape = staticmethod(Wiki2XHTML.escape)
+
+	#? see :attr:`re_html.Wiki2XHTML.link_policy`
+	link_policy = Wiki2XHTML.link_policy
+
+	def render(self, tree, node=None):
+		#? indentation of the lists and items
+		self._depths = {}
+		try:
+			return Renderer.render(self, tree, node)
+		finally:
+			del self._depths
+
+	##### blocks
+	@staticmethod
+	def r_hr(node, attr, pieces):
+		return u'<hr />\n'
+
+	@staticmethod
+	def r_p(node, attr, pieces):
+		return u'<p>%s</p>\n' % u''.join(pieces).strip()
+
+	def r_xmp(self, node, attr, pieces):
+		return u'<pre class="xmp">%s</pre>\n' % self.escape(u''.join(pieces)).strip()
+
+	@staticmethod
+	def r_pre(node, attr, pieces):
+		return u'<pre>%s</pre>\n' % u''.join(pieces).rstrip()
+
+	def r_special(self, node, attr, pieces):
+		return u'<div class="macro %s">%s</div>\n' % (self.escape(attr['macro']), u''.join(pieces).strip())
+
+	@staticmethod
+	def r_head(node, attr, pieces):
+		return u'<h%u>%s</h%u>\n' % (attr['level'], u''.join(pieces), attr['level'])
+
+	@staticmethod
+	def r_blockquote(node, attr, pieces):
+		return u'<blockquote><p>%s</p></blockquote>\n' % u'</p>\n<p>'.join(
+			Wiki2XHTML._block_separator.split(u''.join(pieces))
+		).rstrip()
+
+	@staticmethod
+	def r_list(node, attr, pieces):
+		return u'\n'.join(pieces)
+
+	def _list_depth(self, node):
+		'''Return the indentation of the list or item `node`'''
+		depths = self._depths
+		names = self.tree.names
+		parents = self.tree.parents
+		path = []
+		while node not in depths and node >= 0 and names[node] != 'list':
+			path.append(node)
+			node = parents[node]
+		depth = depths.get(node, -1)
+		for node in reversed(path):
+			depth+= 1
+			depths[node] = depth
+		return depth
+
+	def r_ul(self, node, attr, pieces):
+		depth = self._list_depth(node)
+		names = self.tree.names
+		name = names[node]
+		result = [u'<%s>' % name]
+		indent = u'\n' + u' ' * (depth + 1)
+		for child, piece in zip(self.tree.children[node], pieces):
+			if names[child] != 'li':
+				#? nested in the list itself
+				result.append(indent)
+			result.append(piece)
+		result.append(u'\n%s</%s>' % (u' ' * depth, name))
+		return u''.join(result)
+
+	r_ol = r_ul
+
+	def r_li(self, node, attr, pieces):
+		depth = self._list_depth(node)
+		names = self.tree.names
+		value = []
+		lists = []
+		for child, piece in zip(self.tree.children[node] or (), pieces):
+			(lists if names[child] in ('ul', 'ol') else value).append(piece)
+		value = u''.join(value)
+		result = [u'\n%s<li>%s' % (u' ' * depth, value.lstrip())]
+		if lists:
+			indent = u'\n' + u' ' * (depth + 1) if value.strip() else u''
+			for piece in lists:
+				result.append(indent)
+				result.append(piece)
+		if lists or value.endswith(u'>'):
+			result.append(u'\n%s</li>' % (u' ' * depth,))
+		else:
+			result.append(u'</li>')
+		return u''.join(result)
+
+	##### inlines
+	def _container(name):
+		opening, closing = Wiki2XHTML.inline_tags[name]
+		def handler(node, attr, pieces):
+			return u'%s%s%s' % (opening, u''.join(pieces), closing)
+		return staticmethod(handler)
+
+	r_em = _container('em')
+	r_strong = _container('strong')
+	r_code = _container('code')
+	r_ins = _container('ins')
+	r_del = _container('del')
+	del _container
+
+	@staticmethod
+	def r_br(node, attr, pieces):
+		return u'<br />'
+
+	@staticmethod
+	def r_anchor(node, attr, pieces):
+		return u'<a name="%s"></a>' % Wiki2XHTML._non_word.sub('-', attr['name'])
+
+	def r_acronym(self, node, attr, pieces):
+		return u'<acronym%s>%s</acronym>' % (
+			u' title="%s"' % self.escape(attr['title']) if 'title' in attr else '',
+			u''.join(pieces).strip()
+		)
+
+	def r_a(self, node, attr, pieces):
+		href = attr['href']
+		link = [u'<a href="%s"' % href]
+		if 'title' in attr:
+			link.append(u' title="%s"' % self.escape(attr['title']))
+		if 'lang' in attr:
+			link.append(u' hreflang="%s"' % self.escape(attr['lang']))
+		link.append(self.link_policy.classify(href).a_attributes)
+		link.append(u'>%s</a>' % (u''.join(pieces) if pieces else self.escape(href)))
+		return ''.join(link)
+
+	def r_uri(self, node, attr, pieces):
+		href = attr['href']
+		return u'<a href="%s"%s>%s</a>' % (href, self.link_policy.classify(href, href.split(u':', 1)[0]).a_attributes, self.escape(href))
+
+	def r_img(self, node, attr, pieces):
+		link = [u'<img src="%s"%s' % (attr['src'], self.link_policy.classify(attr['src']).img_attributes)]
+		if 'alt' in attr:
+			link.append(u'alt="%s"' % self.escape(attr['alt']))
+		if 'desc' in attr:
+			link.append(u'longdesc="%s"' % self.escape(attr['desc']))
+		if 'align' in attr:
+			align = attr['align'].strip().lower()[0]
+			if align in 'lg':
+				link.append('style="float:left; margin: 0 1em 1em 0;"')
+			elif align in 'cm':
+				link.append('style="display:block; margin:0 auto;"')
+			elif align in 'rd':
+				link.append('style="float:right; margin: 0 0 1em 1em;"')
+			else:
+				self._warning(node, 'unknown alignment %r', attr['align'])
+		link.append('/>')
+		return ' '.join(link)
+
+	def r_cite(self, node, attr, pieces):
+		r = ['<q']
+		if 'lang' in attr:
+			r.append(u' lang="%s"' % self.escape(attr['lang']))
+		if 'cite' in attr:
+			r.append(u' cite="%s"' % self.escape(attr['cite']))
+		r.append(u'>%s</q>' % u''.join(pieces).strip())
+		return ''.join(r)
+
+	#? no translation in :class:`Wiki2XHTML`: the markup is kept
+	@staticmethod
+	def r_escape(node, attr, pieces):
+		return u'\\' + attr['char']
+
+	@staticmethod
+	def r_footnote(node, attr, pieces):
+		return u'$$%s$$' % u''.join(pieces)
+
+
+
+class TextRenderer(Renderer):
+	'''Render the visible text of the tree
+
+	The blocks are separated by an empty line, the spaces of the
+	paragraphs, headings and items are normalized and the items are
+	written one per line, indented by their depth; links are replaced
+	by their label (or address), images by their alternative text.
+	The ``special`` blocks (raw HTML), the anchors and the footnotes
+	are skipped.
+	'''
+	def r_document(self, node, attr, pieces):
+		if 'inline' in attr:
+			#? the text of the inline elements, whose spaces are kept
+			return u''.join(pieces)
+		blocks = [piece for piece in pieces if piece.strip()]
+		return u'\n\n'.join(blocks) + u'\n' if blocks else u''
+
+	##### blocks
+	@staticmethod
+	def _normalized(node, attr, pieces):
+		return u' '.join(u''.join(pieces).split())
+
+	r_p = r_head = r_cite = r_acronym = _normalized
+	del _normalized
+
+	@staticmethod
+	def r_hr(node, attr, pieces):
+		return u''
+
+	r_special = r_footnote = r_anchor = r_hr
+
+	@staticmethod
+	def r_pre(node, attr, pieces):
+		return u''.join(pieces).rstrip()
+
+	r_xmp = r_pre
+
+	@staticmethod
+	def r_blockquote(node, attr, pieces):
+		return u'\n\n'.join(
+			u' '.join(paragraph.split())
+			for paragraph in u''.join(pieces).split(u'\n\n')
+			if paragraph.strip()
+		)
+
+	@staticmethod
+	def r_list(node, attr, pieces):
+		return u'\n'.join(pieces)
+
+	def r_ul(self, node, attr, pieces):
+		names = self.tree.names
+		return u'\n'.join(
+			piece if names[child] == 'li' else _indent(piece, u'  ')
+			for child, piece in zip(self.tree.children[node], pieces)
+		)
+
+	r_ol = r_ul
+
+	def r_li(self, node, attr, pieces):
+		names = self.tree.names
+		value = []
+		lists = []
+		for child, piece in zip(self.tree.children[node] or (), pieces):
+			(lists if names[child] in ('ul', 'ol') else value).append(piece)
+		return u'\n'.join([u'- ' + u' '.join(u''.join(value).split())] + [_indent(piece, u'  ') for piece in lists])
+
+	##### inlines
+	@staticmethod
+	def _content(node, attr, pieces):
+		return u''.join(pieces)
+
+	r_em = r_strong = r_code = r_ins = r_del = _content
+	del _content
+
+	@staticmethod
+	def r_br(node, attr, pieces):
+		return u'\n'
+
+	@staticmethod
+	def r_a(node, attr, pieces):
+		return u''.join(pieces) if pieces else attr['href']
+
+	@staticmethod
+	def r_uri(node, attr, pieces):
+		return attr['href']
+
+	@staticmethod
+	def r_img(node, attr, pieces):
+		return attr.get('alt', u'')
+
+	@staticmethod
+	def r_escape(node, attr, pieces):
+		return attr['char']
+
+
+
+class RSTRenderer(Renderer):
+	'''Render the tree as reStructuredText
+
+	The elements without equivalent (``ins``, ``del``) are rendered as
+	their content and the citations between quotes; the images are
+	written as substitutions and the footnotes as auto-numbered
+	footnotes, both defined at the end of the document. The inline
+	markup is separated from the adjacent words by escaped spaces; as
+	reStructuredText does not nest inline markup, the content of the
+	emphasis, links, acronyms and code is rendered as plain text (an
+	image is then replaced by its alternative text, a footnote dropped).
+	'''
+	#? underline of the headings, by level: one character per level, so
+	#? that reStructuredText nests them the same way
+	underlines = {2: u'=', 3: u'-', 4: u'~', 5: u'^'}
+
+	#? characters escaped in the text
+	_special = LazyPattern(r'([\\*`|_])')
+
+	#? inline markup separated from a word character or from another
+	#? markup by an escaped space
+	_word_markup = LazyPattern(r'(?<=\w)(?=\x01)|(?<=\x02)(?=\w)|(?<=\x02)(?=\x01)', re.UNICODE)
+
+	#? the plain text of the inline markup and of the empty markup (see
+	#? :meth:`RSTRenderer._inline`), the escaped characters and the line
+	#? breaks
+	_plain_parts = LazyPattern(r'\x01[^\x04]*\x04([^\x02]*)\x02|\x07([^\x08]*)\x08|\\([\\*`|_])|(\x03)')
+
+	#? plain text and definition references of the inline markup
+	_block_parts = LazyPattern(r'\x04[^\x02]*|\x05(\d+)\x06')
+
+	#? plain text of the empty markup
+	_empty_markup = LazyPattern(r'\x07[^\x08]*\x08')
+
+	def render(self, tree, node=None):
+		#? the definitions and the indexes of those which are referenced
+		self._definitions = []
+		self._referenced = set()
+		try:
+			return Renderer.render(self, tree, node)
+		finally:
+			del self._definitions, self._referenced
+
+	def _plain(self, pieces):
+		'''Return the text of the rendered `pieces`, see :class:`TextRenderer`'''
+		return self._plain_parts.sub(self._plain_part, u''.join(pieces))
+
+	@staticmethod
+	def _plain_part(match):
+		plain, empty, char, br = match.groups()
+		if br is not None:
+			return u'\n'
+		if char is not None:
+			return char
+		return plain if empty is None else empty
+
+	def text(self, value):
+		return self._special.sub(r'\\\1', value)
+
+	@staticmethod
+	def _inline(markup, plain=u'', definition=None):
+		#? the markup is delimited by \x01 and \x02 until the block is
+		#? rendered, followed by its plain text (see :meth:`RSTRenderer._plain`)
+		#? after \x04 and preceded by the index of its `definition` between
+		#? \x05 and \x06; the line breaks are \x03; without markup, the
+		#? plain text is delimited by \x07 and \x08
+		if not markup:
+			return u'\x07%s\x08' % plain if plain else u''
+		if definition is not None:
+			markup = u'\x05%u\x06%s' % (definition, markup)
+		return u'\x01%s\x04%s\x02' % (markup, plain)
+
+	def _define(self, definition):
+		'''Add `definition` and return its index, written in the document
+		if its markup is written in a block
+		'''
+		self._definitions.append(definition)
+		return len(self._definitions) - 1
+
+	def _block_part(self, match):
+		if match.group(1) is not None:
+			self._referenced.add(int(match.group(1)))
+		return u''
+
+	def _block(self, pieces, br=u' '):
+		'''Return the content of a block, the line breaks replaced by `br`'''
+		text = self._empty_markup.sub(u'', u''.join(pieces))
+		text = self._word_markup.sub(u'\\\\ ', text)
+		return self._block_parts.sub(self._block_part, text).translate({1: None, 2: None, 3: br})
+
+	def r_document(self, node, attr, pieces):
+		if 'inline' in attr:
+			#? the inline elements, followed by the definitions if any
+			text = self._block(pieces, u'\n')
+			blocks = [text] if text.strip() else []
+		else:
+			blocks = [piece for piece in pieces if piece.strip()]
+		definitions = [
+			definition
+			for index, definition in enumerate(self._definitions)
+			if index in self._referenced
+		]
+		if 'inline' in attr and not definitions:
+			return text
+		blocks.extend(definitions)
+		return u'\n\n'.join(blocks) + u'\n' if blocks else u''
+
+	##### blocks
+	def r_p(self, node, attr, pieces):
+		text = self._block(pieces, u'\x03').strip()
+		if u'\x03' not in text:
+			return text
+		#? line block
+		return u'\n'.join(u'| ' + u' '.join(line.split()) for line in text.split(u'\x03'))
+
+	def r_head(self, node, attr, pieces):
+		title = u' '.join(self._block(pieces).split())
+		return u'%s\n%s' % (title, self.underlines.get(attr['level'], u'"') * max(len(title), 1))
+
+	@staticmethod
+	def r_hr(node, attr, pieces):
+		return u'----'
+
+	def r_pre(self, node, attr, pieces):
+		#? the inline markup is kept as text in a literal block
+		text = self._plain(pieces)
+		return u'::\n\n' + _indent(text.rstrip(), u'   ')
+
+	def r_xmp(self, node, attr, pieces):
+		return u'::\n\n' + _indent(self.tree.attrs[self.tree.child(node)]['value'].strip(u'\n').rstrip(), u'   ') if pieces else u''
+
+	def r_special(self, node, attr, pieces):
+		content = self.tree.attrs[self.tree.child(node)]['value'].strip() if pieces else u''
+		return u'.. raw:: %s\n\n%s' % (attr['macro'], _indent(content, u'   '))
+
+	def r_blockquote(self, node, attr, pieces):
+		return _indent(
+			u'\n\n'.join(
+				paragraph.strip()
+				for paragraph in self._block(pieces, u'\n').split(u'\n\n')
+				if paragraph.strip()
+			),
+			u'   '
+		)
+
+	@staticmethod
+	def r_list(node, attr, pieces):
+		return u'\n\n'.join(pieces)
+
+	def r_ul(self, node, attr, pieces):
+		#? the items are written after their bullet, a list nested in the
+		#? list itself is indented; the items and lists written on several
+		#? lines are separated by an empty line
+		bullet = u'#. ' if self.tree.names[node] == 'ol' else u'* '
+		names = self.tree.names
+		result = []
+		for child, piece in zip(self.tree.children[node], pieces):
+			if names[child] == 'li':
+				piece = bullet + _indent(piece, u' ' * len(bullet))[len(bullet):]
+			else:
+				piece = _indent(piece, u' ' * len(bullet))
+			if result and (u'\n' in piece or u'\n' in result[-1]):
+				result.append(u'')
+			result.append(piece)
+		return u'\n'.join(result)
+
+	r_ol = r_ul
+
+	def r_li(self, node, attr, pieces):
+		names = self.tree.names
+		value = []
+		lists = []
+		for child, piece in zip(self.tree.children[node] or (), pieces):
+			(lists if names[child] in ('ul', 'ol') else value).append(piece)
+		return u'\n\n'.join([u' '.join(self._block(value).split())] + lists)
+
+	##### inlines
+	def _markup(start, end=None):
+		def handler(self, node, attr, pieces):
+			plain = self._plain(pieces)
+			content = u' '.join(plain.split())
+			if not content:
+				return self._inline(u'', plain)
+			return self._inline(u'%s%s%s' % (start, self.text(content), start if end is None else end), plain)
+		return handler
+
+	r_em = _markup(u'*')
+	r_strong = _markup(u'**')
+	r_acronym = _markup(u':acronym:`', u'`')
+	del _markup
+
+	def r_code(self, node, attr, pieces):
+		plain = self._plain(pieces)
+		content = plain.strip()
+		return self._inline(u'``%s``' % content if content else u'', plain)
+
+	@staticmethod
+	def _content(node, attr, pieces):
+		return u''.join(pieces)
+
+	r_ins = r_del = _content
+	del _content
+
+	@staticmethod
+	def r_br(node, attr, pieces):
+		return u'\x03'
+
+	def r_anchor(self, node, attr, pieces):
+		return self._inline(u'_`%s`' % attr['name'].strip())
+
+	def r_a(self, node, attr, pieces):
+		href = attr['href']
+		label = u' '.join(self._plain(pieces).split()) if pieces else href
+		return self._inline(u'`%s <%s>`__' % (self.text(label), href), label)
+
+	def r_uri(self, node, attr, pieces):
+		return self._inline(u'`%s <%s>`__' % (self.text(attr['href']), attr['href']), attr['href'])
+
+	def r_img(self, node, attr, pieces):
+		name = u'image%u' % (len(self._definitions) + 1)
+		definition = [u'.. |%s| image:: %s' % (name, attr['src'])]
+		if 'alt' in attr:
+			definition.append(u'   :alt: %s' % attr['alt'])
+		return self._inline(u'|%s|' % name, attr.get('alt', u''), self._define(u'\n'.join(definition)))
+
+	def r_cite(self, node, attr, pieces):
+		return u'"%s"' % u''.join(pieces).strip()
+
+	def r_escape(self, node, attr, pieces):
+		return self.text(attr['char'])
+
+	def r_footnote(self, node, attr, pieces):
+		content = u' '.join(self.tree.attrs[self.tree.child(node)]['value'].split()) if pieces else u''
+		return self._inline(u'[#]_', u'', self._define(u'.. [#] %s' % content))
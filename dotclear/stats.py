@@ -0,0 +1,136 @@
+'''Profiling of the translators
+
+Usage::
+	>>> translator = re_html.Wiki2XHTML()
+	>>> stats = translator.profile()
+	>>> translator.run(u'__Dot__Clear')
+	u'<p><strong>Dot</strong>Clear</p>\n'
+	>>> dump(stats)
+	name                matches      calls   total ms     max ms
+	b_p                       1          1      0.029      0.029
+	p_block                              2      0.009      0.008
+	p_inline_scan                        3      0.005      0.002
+	i_strong                  1          0      0.000      0.000
+
+The timings of the handlers are inclusive: the time spent in a block
+handler includes the translation of its inline elements.
+'''
+__all__ = (
+	'Stats',
+	'dump',
+)
+
+
+
+
+
+import collections
+import sys
+import timeit
+
+
+
+
+
+class Stats(object):
+	'''Counters collected by a profiled :class:`Translator`
+
+	- :attr:`matches`: number of matches of each rule returned by the
+	  scans, by handler name (i.e.: ``b_p``, ``i_em``), whether it has a
+	  handler or not; it may be greater than the number of calls of the
+	  handler: as :func:`re.sub`, :meth:`Translator.render` ignores an
+	  empty match next to the previous one and
+	  :meth:`Translator.iter_run` scans again the end of each chunk
+	- :attr:`timings`: ``[calls, total, max]`` (in seconds) of each
+	  handler and of the searches of each pattern (i.e.: ``p_block``)
+
+	.. Note::
+	   The counters are not locked: profile one translator per thread.
+	'''
+	clock = staticmethod(timeit.default_timer)
+
+	def __init__(self):
+		self.matches = collections.defaultdict(int)
+		self.timings = {}
+
+	def _timing(self, name):
+		return self.timings.setdefault(name, [0, 0., 0.])
+
+	def timed(self, name, function):
+		'''Return `function` wrapped to record its timings as `name`'''
+		timing = self._timing(name)
+		clock = self.clock
+		def wrapper(*args):
+			start = clock()
+			try:
+				return function(*args)
+			finally:
+				elapsed = clock() - start
+				timing[0]+= 1
+				timing[1]+= elapsed
+				if elapsed > timing[2]:
+					timing[2] = elapsed
+		return wrapper
+
+	def search(self, name, pattern, prefix=None, method='search'):
+		'''Return the `method` (``search`` or ``match``) of `pattern`,
+		wrapped to record its timings as `name` and its matches as
+		`prefix` + group name (unless `prefix` is ``None``)
+		'''
+		timing = self._timing(name)
+		matches = self.matches
+		clock = self.clock
+		search = getattr(pattern, method)
+		def wrapper(*args):
+			start = clock()
+			match = search(*args)
+			elapsed = clock() - start
+			timing[0]+= 1
+			timing[1]+= elapsed
+			if elapsed > timing[2]:
+				timing[2] = elapsed
+			if match is not None and prefix is not None:
+				matches[prefix + match.lastgroup]+= 1
+			return match
+		return wrapper
+
+	def reset(self):
+		'''Reset the counters'''
+		self.matches.clear()
+		for timing in self.timings.itervalues():
+			timing[:] = [0, 0., 0.]
+
+	def as_dict(self):
+		'''Return the counters as a dictionary (i.e.: to save it as JSON)'''
+		return {
+			'matches': dict(self.matches),
+			'timings': dict(
+				(name, {'calls': calls, 'total': total, 'max': max_})
+				for name, (calls, total, max_) in self.timings.iteritems()
+			),
+		}
+
+
+
+def dump(stats, out=None):
+	'''Write a table of `stats` to `out` (default: :data:`sys.stdout`),
+	the most time consuming first
+	'''
+	if out is None:
+		out = sys.stdout
+	names = set(stats.matches)
+	names.update(name for name, timing in stats.timings.iteritems() if timing[0])
+	rows = sorted(
+		names,
+		key=lambda name: (-stats.timings.get(name, (0, 0.))[1], -stats.matches.get(name, 0), name)
+	)
+	out.write('%-16s %10s %10s %10s %10s\n' % ('name', 'matches', 'calls', 'total ms', 'max ms'))
+	for name in rows:
+		calls, total, max_ = stats.timings.get(name, (0, 0., 0.))
+		out.write('%-16s %10s %10u %10.3f %10.3f\n' % (
+			name,
+			stats.matches[name] if name in stats.matches else '',
+			calls,
+			total * 1e3,
+			max_ * 1e3,
+		))
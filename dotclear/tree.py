@@ -0,0 +1,316 @@
+'''Parsing of documents into a tree, to render them several times
+
+Usage::
+	>>> tree = TreeBuilder().parse(u"__Dot__''Clear''")
+	>>> print re_html.node2html(tree.view())
+	<document>
+	 <p>
+	  <strong>
+	   Dot
+	  </strong>
+	  <em>
+	   Clear
+	  </em>
+	 </p>
+	</document>
+	>>> renderers.XHTMLRenderer().render(tree)
+	u'<p><strong>Dot</strong><em>Clear</em></p>\n'
+	>>> renderers.TextRenderer().render(tree)
+	u'DotClear\n'
+
+The root of the tree is a ``document`` node; its children are the
+blocks and the text between them (the inline elements and the text
+around them if the document is parsed with `skip_blocks`: the
+``document`` then has an ``inline`` attribute), each element being named after its
+rule in :data:`re_parser.RULES_BLOCK` and :data:`re_parser.RULES_INLINE`:
+
+- blocks: ``p``, ``pre``, ``xmp``, ``special`` (``macro``), ``head``
+  (``level``, from 2 to 5 as in XHTML), ``hr``, ``blockquote`` and
+  ``list``, holding ``ul`` and ``ol`` lists of ``li`` items (a list
+  nested in an item is a child of the item, after its content);
+- inlines: ``em``, ``strong``, ``code``, ``ins``, ``del``, ``br``,
+  ``anchor`` (``name``), ``acronym`` (``title``), ``a`` (``href``,
+  ``lang``, ``title``), ``uri`` (``href``), ``img`` (``src``, ``alt``,
+  ``align``, ``desc``), ``cite`` (``lang``, ``cite``), ``escape``
+  (``char``) and ``footnote``;
+- text nodes, whose ``value`` is the untranslated text; the content of
+  ``xmp``, ``special`` and ``footnote`` is a single text node.
+
+The attributes are set only when the markup defines them. The blocks
+are transformed as by :class:`re_html.Wiki2XHTML` before their inline
+elements are parsed: i.e. the first space of the lines of a ``pre``
+and the ``>`` of a ``blockquote`` are removed.
+'''
+__all__ = (
+	'TreeBuilder',
+	'parse',
+)
+
+
+
+
+
+import itertools
+
+
+from nodes import NodeTree
+from re_html import Wiki2XHTML
+from re_parser import Translator
+
+
+
+
+
+class _Writer(object):
+	'''Object with a ``write`` method, for :meth:`Translator.render`'''
+	__slots__ = ('write',)
+
+	def __init__(self, write):
+		self.write = write
+
+
+
+class TreeBuilder(Translator):
+	'''Translator building a :class:`nodes.NodeTree` of the document
+
+	The handlers add the nodes under :attr:`parent`, instead of
+	returning the translation; an instance builds one tree at a time.
+	'''
+	tree = None
+	parent = -1
+
+	def parse(self, data, skip_blocks=False, tree=None):
+		'''Parse `data` and return the tree
+
+		Parameters:
+		- `data`: input *``unicode``* (or ``ascii7``) string
+		- `skip_blocks`: see :meth:`Translator.run`
+		- `tree`: :class:`nodes.NodeTree` to which the ``document`` node is
+		  added as a new root, a new tree by default
+		'''
+		if not isinstance(data, unicode):
+			data = unicode(data)
+		if tree is None:
+			tree = NodeTree()
+		self.tree = tree
+		self.parent = tree.add('document', inline=1) if skip_blocks else tree.add('document')
+		try:
+			self.render(data, _Writer(self._text), skip_blocks)
+		finally:
+			self.tree = None
+			self.parent = -1
+		return tree
+
+	def _add(self, element, **attr):
+		'''Add `element` to :attr:`parent` and return its index, ignoring
+		the empty attributes
+		'''
+		for key, value in attr.items():
+			if not value:
+				del attr[key]
+		return self.tree.add(element, attr, self.parent)
+
+	def _text(self, value):
+		if value:
+			self.tree.add(value=value, parent=self.parent)
+
+	def _inline(self, data, parent):
+		'''Parse the inline elements of `data` under `parent`'''
+		previous = self.parent
+		self.parent = parent
+		try:
+			self.inline(data)
+		finally:
+			self.parent = previous
+
+	def inline(self, data, write=None):
+		'''Add the inline elements of `data` to :attr:`parent`
+
+		Same scan as :meth:`Translator.inline`, the containers being
+		added as elements holding their content.
+		'''
+		search = self._inline_search
+		match_inline = self._match_inline
+		content_end = self._inline_content_end
+		handlers = self._inline_handlers
+		containers = self._containers
+		#? parent, restart and end positions of the enclosing containers
+		stack = []
+		found = {}
+		pos = at = 0
+		end = len(data)
+		while 1:
+			candidate = search(data, at, end)
+			if candidate is None:
+				self._text(data[pos:end])
+				if not stack:
+					break
+				self.parent, pos, end = stack.pop()
+				at = pos
+				continue
+			start = candidate.start()
+			key = candidate.group()
+			container = containers.get(key)
+			if container is not None:
+				content = content_end(data, start, end, key, found)
+				if content < 0:
+					at = start + 1
+					continue
+				self._text(data[pos:start])
+				stack.append((self.parent, content + container[1], end))
+				self.parent = self._add(container[0])
+				pos = at = start + container[1]
+				end = content
+				continue
+			match = match_inline(data, start, at, end, key)
+			if match is None:
+				at = start + 1
+				continue
+			start = match.start()
+			self._text(data[pos:start])
+			pos = at = match.end()
+			handler = handlers[match.lastindex]
+			if handler is not None:
+				handler(match)
+			else:
+				self._warning(match, 'missing inline handler: %s.i_%s()', self.__class__.__name__, match.lastgroup)
+				self._text(data[start:pos])
+
+	##### blocks
+	def b_hr(self, match):
+		self._add('hr')
+
+	def b_p(self, match):
+		self._inline(match.group('p'), self._add('p'))
+
+	def b_xmp(self, match):
+		previous = self.parent
+		self.parent = self._add('xmp')
+		self._text(match.group('xmp'))
+		self.parent = previous
+
+	def b_pre(self, match):
+		self._inline(
+			Wiki2XHTML._first_space.sub('', match.group(match.lastgroup)),
+			self._add('pre')
+		)
+
+	def b_special(self, match):
+		previous = self.parent
+		self.parent = self._add('special', macro=match.group('macro'))
+		self._text(match.group('special'))
+		self.parent = previous
+
+	def b_head(self, match):
+		self._inline(
+			match.group('head_value'),
+			self._add('head', level=6-len(match.group('head_level')))
+		)
+
+	def b_blockquote(self, match):
+		self._inline(
+			Wiki2XHTML._first_gt_space.sub('', match.group(match.lastgroup)),
+			self._add('blockquote')
+		)
+
+	def b_list(self, match):
+		#? same structure as :meth:`Wiki2XHTML.b_list`: open lists,
+		#? outermost first, as [node, whether its first child is an item,
+		#? open item or None]
+		previous = self.parent
+		root = self._add('list')
+		stack = []
+		ltprev = ''
+		for m in Wiki2XHTML._fragment_list.finditer(match.group()):
+			ltcurr, value = m.groups()
+			level = 0
+			for prev, curr in itertools.izip(ltprev, ltcurr):
+				if prev != curr:
+					break
+				level+= 1
+			del stack[level:]
+			for curr in ltcurr[level:]:
+				if not stack:
+					self.parent = root
+				else:
+					parent = stack[-1]
+					if parent[1]:
+						#? nested in the last item
+						self.parent = parent[2]
+					else:
+						#? nested in the list itself
+						parent[1] = False
+						parent[2] = None
+						self.parent = parent[0]
+				stack.append([self._add('ol' if curr == u'#' else 'ul'), None, None])
+			parent = stack[-1]
+			if parent[1] is None:
+				parent[1] = True
+			self.parent = parent[0]
+			parent[2] = self._add('li')
+			self._inline(value, parent[2])
+			ltprev = ltcurr
+		self.parent = previous
+
+	@staticmethod
+	def b_nl(match):
+		pass
+
+	##### inlines
+	def i_br(self, match):
+		self._add('br')
+
+	def i_anchor(self, match):
+		self._add('anchor', name=match.group('anchor'))
+
+	def i_acronym(self, match):
+		title = match.group('acronym_title')
+		node = self._add('acronym')
+		if title:
+			self.tree.attrs[node] = {'title': title.strip()}
+		self._inline(match.group('acronym_value'), node)
+
+	def i_a(self, match):
+		node = self._add(
+			'a',
+			href=match.group('a_href'),
+			lang=match.group('a_lang'),
+			title=match.group('a_title'),
+		)
+		if match.group('a_value'):
+			self._inline(match.group('a_value'), node)
+
+	def i_uri(self, match):
+		self._add('uri', href=match.group(match.lastgroup))
+
+	def i_img(self, match):
+		self._add(
+			'img',
+			src=match.group('img_src'),
+			alt=match.group('img_alt'),
+			align=match.group('img_align'),
+			desc=match.group('img_desc'),
+		)
+
+	def i_cite(self, match):
+		node = self._add(
+			'cite',
+			lang=match.group('cite_lang'),
+			cite=match.group('cite_cite'),
+		)
+		self._inline(match.group('cite_value'), node)
+
+	def i_escape(self, match):
+		self._add('escape', char=match.group('escaped_char'))
+
+	def i_footnote(self, match):
+		previous = self.parent
+		self.parent = self._add('footnote')
+		self._text(match.group('footnote'))
+		self.parent = previous
+
+
+
+def parse(data, skip_blocks=False):
+	'''Return the :class:`nodes.NodeTree` of `data`, see :meth:`TreeBuilder.parse`'''
+	return TreeBuilder().parse(data, skip_blocks)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+import dotclear
+from dotclear import batch, re_html, re_text
+
+
+
+
+
+class Buggy(re_html.Wiki2XHTML):
+	def i_strong(self, match):
+		raise ValueError(match.group('strong'))
+
+
+
+class TestTranslateMany(unittest.TestCase):
+	documents = [u"''%u''" % i for i in range(100)]
+
+	def test_ordered(self):
+		self.assertEqual(
+			list(dotclear.wiki2xhtml_many(self.documents, processes=2, chunksize=7)),
+			[batch.Result(i, u'<p><em>%u</em></p>\n' % i, None) for i in range(100)]
+		)
+
+	def test_unordered(self):
+		self.assertEqual(
+			sorted(dotclear.wiki2xhtml_many(enumerate(self.documents, 1), processes=2, ordered=False)),
+			[batch.Result(i + 1, u'<p><em>%u</em></p>\n' % i, None) for i in range(100)]
+		)
+
+	def test_errors(self):
+		results = list(batch.translate_many(
+			[('ok', u'a'), ('ko', u'__b__'), ('ok', u'c')],
+			Buggy,
+			processes=1,
+		))
+		self.assertEqual([r.key for r in results], ['ok', 'ko', 'ok'])
+		self.assertEqual(results[0].result, u'<p>a</p>\n')
+		self.assertEqual(results[1].result, None)
+		self.assertTrue(results[1].error.rstrip().endswith('ValueError: b'))
+		self.assertEqual(results[2].result, u'<p>c</p>\n')
+
+	def test_interleaved(self):
+		'''batches running at once in the current process'''
+		html = batch.translate_many([u'x', u'y'], re_html.Wiki2XHTML, processes=1)
+		text = batch.translate_many([u'x', u'y'], re_text.Wiki2Text, processes=1)
+		self.assertEqual(next(html).result, u'<p>x</p>\n')
+		self.assertEqual(next(text).result, u'x\n')
+		self.assertEqual(next(html).result, u'<p>y</p>\n')
+
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestTranslateMany))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
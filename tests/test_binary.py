@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import mmap
+import os
+import sys
+import tempfile
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import binary, nodes, re_html, renderers, tree
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+
+
+
+
+class TestBinary(unittest.TestCase):
+	def test_maznode(self):
+		body = nodes.MazNode('body', lang=u'fr', level=-3, size=1<<40)
+		body+= nodes.MazNode('p')
+		body.child+= nodes.MazNode('strong', {'class': 'x'})
+		body.child.child+= nodes.MazNode(value=u'\xe9t\xe9 <&>')
+		body.child|= nodes.MazNode('hr')
+		body.child.next+= nodes.MazNode(u'\xe9l\xe9ment', value=u'v')
+		loaded = binary.loads(binary.dumps(body))
+		self.assertEqual(re_html.node2html(loaded.view()), re_html.node2html(body))
+		self.assertEqual(loaded.view().attr, {'lang': u'fr', 'level': -3, 'size': 1<<40})
+
+	def test_xhtml(self):
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		renderer = renderers.XHTMLRenderer()
+		renderer.warn = lambda node, message: None
+		w2x = re_html.Wiki2XHTML()
+		w2x.warn = lambda match, message: None
+		data = binary.dumps(tree.parse(sample))
+		for buffer in (data, bytearray(data), memoryview(data)):
+			self.assertEqual(renderer.render(binary.loads(buffer)), w2x.run(sample))
+		with tempfile.TemporaryFile() as fobj:
+			binary.dump(tree.parse(sample), fobj)
+			fobj.flush()
+			view = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+			loaded = binary.loads(view)
+			self.assertEqual(renderer.render(loaded), w2x.run(sample))
+			fobj.seek(0)
+			self.assertEqual(renderer.render(binary.load(fobj)), w2x.run(sample))
+
+	def test_tree(self):
+		'''several roots and nodes added after loading'''
+		t = nodes.NodeTree()
+		t.add('a', x=u'1')
+		t.add('b', parent=t.add('c'))
+		loaded = binary.loads(binary.dumps(t))
+		self.assertEqual(loaded.roots, [0, 1])
+		self.assertEqual(loaded.names, ['a', 'c', 'b'])
+		loaded.add(value=u'd', parent=2)
+		self.assertEqual(loaded.attrs[3], {'value': u'd'})
+		self.assertEqual(loaded.attrs[0], {'x': u'1'})
+		self.assertEqual(loaded.attrs[2], None)
+		self.assertEqual(binary.dumps(binary.loads(binary.dumps(t))), binary.dumps(t))
+
+	def test_invalid(self):
+		data = binary.dumps(tree.parse(u'__a__ b'))
+		for invalid in ('', 'DCTA' + data[4:], data[:4] + '\xff' + data[5:], data[:-1], data[:40]):
+			self.assertRaises(ValueError, binary.loads, invalid)
+		self.assertRaises(TypeError, binary.dumps, nodes.MazNode('a', x=1.5))
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestBinary))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import cache, re_html
+
+
+
+
+
+class Counting(re_html.Wiki2XHTML):
+	_calls = 0
+
+	def run(self, data, skip_blocks=False):
+		self._calls+= 1
+		return super(Counting, self).run(data, skip_blocks)
+
+
+
+class TestRenderCache(unittest.TestCase):
+	def test_lru(self):
+		translator = Counting()
+		rc = cache.RenderCache(translator, maxsize=2)
+		self.assertEqual(rc.run(u"''a''"), u'<p><em>a</em></p>\n')
+		self.assertEqual(rc.run(u"''a''"), u'<p><em>a</em></p>\n')
+		self.assertEqual(rc.run(u"''a''", skip_blocks=True), u'<em>a</em>')
+		rc.run(u'b')
+		rc.run(u"''a''", skip_blocks=True)
+		rc.run(u"''a''")
+		self.assertEqual(translator._calls, 4)
+		stats = rc.stats()
+		self.assertEqual(
+			(stats['hits'], stats['misses'], stats['evictions'], stats['size']),
+			(2, 4, 2, 2)
+		)
+
+	def test_key(self):
+		class Other(re_html.Wiki2XHTML):
+			pass
+		self.assertNotEqual(
+			cache.RenderCache(re_html.Wiki2XHTML()).key(u'a'),
+			cache.RenderCache(Other()).key(u'a'),
+		)
+		self.assertNotEqual(
+			cache.RenderCache(re_html.Wiki2XHTML()).key(u'a'),
+			cache.RenderCache(re_html.Wiki2XHTML(), salt='1').key(u'a'),
+		)
+
+	def test_no_memory(self):
+		translator = Counting()
+		rc = cache.RenderCache(translator, maxsize=0)
+		self.assertEqual(rc.run(u'a'), u'<p>a</p>\n')
+		self.assertEqual(rc.run(u'a'), u'<p>a</p>\n')
+		self.assertEqual(translator._calls, 2)
+		self.assertEqual(rc.stats()['size'], 0)
+
+	def test_instance(self):
+		'''the rules of the instance are keyed, its other attributes refused'''
+		translator = re_html.Wiki2XHTML()
+		rc = cache.RenderCache(translator)
+		self.assertEqual(rc.run(u"''a''"), u'<p><em>a</em></p>\n')
+		translator.rules = ('p',)
+		translator._reset()
+		self.assertEqual(rc.run(u"''a''"), u"<p>''a''</p>\n")
+		translator.register('i_em', lambda match: match.group('em'))
+		self.assertRaises(ValueError, rc.run, u"''a''")
+		rc = cache.RenderCache(translator, salt='plain em')
+		self.assertEqual(rc.run(u"''a''"), u"<p>''a''</p>\n")
+
+
+
+class TestStores(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.path)
+
+	def _test(self, store):
+		translator = Counting()
+		cache.RenderCache(translator, store=store).run(u'\xe9t\xe9\r\n', True)
+		rc = cache.RenderCache(translator, store=store)
+		self.assertEqual(rc.run(u'\xe9t\xe9\r\n', True), u'\xe9t\xe9\r\n')
+		self.assertEqual(translator._calls, 1)
+		self.assertEqual(rc.stats()['store_hits'], 1)
+
+	def test_directory(self):
+		self._test(cache.DirectoryStore(self.path))
+
+	def test_sqlite(self):
+		store = cache.SQLiteStore(os.path.join(self.path, 'cache.db'))
+		self._test(store)
+		store.close()
+
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestRenderCache))
+	s.addTest(unittest.makeSuite(TestStores))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
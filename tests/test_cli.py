@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import shutil
+import StringIO
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import cli
+
+
+
+
+
+class TestCli(unittest.TestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.posts = os.path.join(self.path, 'posts')
+		self.output = os.path.join(self.path, 'html')
+		for name, data in (
+			('a.txt', "''a''"),
+			('sub/b.txt', u'__b\xe9__'.encode('utf8')),
+			('sub/empty.txt', ''),
+			('c.md', 'c'),
+		):
+			self._write(name, data)
+
+	def tearDown(self):
+		shutil.rmtree(self.path)
+
+	def _write(self, name, data):
+		path = os.path.join(self.posts, name)
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		with open(path, 'wb') as fobj:
+			fobj.write(data)
+
+	def _read(self, name):
+		with open(os.path.join(self.output, name), 'rb') as fobj:
+			return fobj.read()
+
+	def _main(self, argv):
+		'''Return the exit status of :func:`cli.main` and the lines it
+		wrote to ``sys.stderr``
+		'''
+		stderr, sys.stderr = sys.stderr, StringIO.StringIO()
+		try:
+			status = cli.main(argv)
+			return status, sys.stderr.getvalue().splitlines()
+		finally:
+			sys.stderr = stderr
+
+	def _run(self, *args):
+		return self._main(['-q', '-o', self.output] + list(args) + [self.posts])
+
+	def test_tree(self):
+		self.assertEqual(self._run('-j', '2'), (0, []))
+		self.assertEqual(self._read('a.html'), '<p><em>a</em></p>\n')
+		self.assertEqual(self._read('sub/b.html'), u'<p><strong>b\xe9</strong></p>\n'.encode('utf8'))
+		self.assertEqual(self._read('sub/empty.html'), '')
+		self.assertEqual(sorted(os.listdir(self.output)), ['a.html', 'sub'])
+
+	def test_next_to_sources(self):
+		path = os.path.join(self.posts, 'c.md')
+		self.assertEqual(self._main(['-q', path]), (0, []))
+		self.assertTrue(os.path.exists(os.path.join(self.posts, 'c.html')))
+		status, errors = self._main(['-q', '-x', '.md', path])
+		self.assertNotEqual(status, 0)
+		self.assertEqual(errors, ['%s: ValueError: the output would replace the source' % path])
+
+	def _statuses(self, skip):
+		jobs = cli._jobs([self.posts], self.output, '.txt', '.html')
+		manifest = os.path.join(self.path, 'manifest.json')
+		return sorted(
+			(os.path.basename(source), status)
+			for source, status, _, _ in cli.convert(jobs, cli._factory('dotclear.re_html:Wiki2XHTML'), 1, skip=skip, manifest=manifest)
+		)
+
+	def test_skip_mtime(self):
+		self.assertEqual(self._statuses('mtime'), [('a.txt', 'converted'), ('b.txt', 'converted'), ('empty.txt', 'converted')])
+		self.assertEqual(self._statuses('mtime'), [('a.txt', 'skipped'), ('b.txt', 'skipped'), ('empty.txt', 'skipped')])
+		os.utime(os.path.join(self.posts, 'a.txt'), (0, 2**31 - 1))
+		self.assertEqual(self._statuses('mtime')[0], ('a.txt', 'converted'))
+		self.assertEqual(self._statuses('none')[1], ('b.txt', 'converted'))
+
+	def test_skip_hash(self):
+		self.assertEqual(self._statuses('hash')[0], ('a.txt', 'converted'))
+		os.utime(os.path.join(self.posts, 'a.txt'), (0, 2**31 - 1))
+		self.assertEqual(self._statuses('hash'), [('a.txt', 'skipped'), ('b.txt', 'skipped'), ('empty.txt', 'skipped')])
+		self._write('a.txt', '__a__')
+		self.assertEqual(self._statuses('hash')[0], ('a.txt', 'converted'))
+		self.assertEqual(self._read('a.html'), '<p><strong>a</strong></p>\n')
+
+	def test_errors(self):
+		self._write('bad.txt', '\xff')
+		status, errors = self._run('-j', '1')
+		self.assertEqual(status, 1)
+		self.assertEqual(len(errors), 1)
+		self.assertTrue(errors[0].startswith('%s: UnicodeDecodeError: ' % os.path.join(self.posts, 'bad.txt')), errors)
+		self.assertEqual(self._read('a.html'), '<p><em>a</em></p>\n')
+		self.assertFalse(os.path.exists(os.path.join(self.output, 'bad.html')))
+
+	def test_stdin(self):
+		process = subprocess.Popen(
+			[sys.executable, '-m', 'dotclear'],
+			stdin=subprocess.PIPE,
+			stdout=subprocess.PIPE,
+			stderr=subprocess.PIPE,
+			cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'),
+		)
+		self.assertEqual(process.communicate("''a''"), ('<p><em>a</em></p>\n', ''))
+		self.assertEqual(process.returncode, 0)
+
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestCli))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import diagnostics, re_html, renderers, tree
+
+
+
+
+
+class Formatting(object):
+	'''Message formatted by :meth:`Translator._warning`'''
+	def __init__(self, count):
+		self.count = count
+
+	def __mod__(self, args):
+		self.count[0]+= 1
+		return 'formatted'
+
+
+
+class TestDiagnostics(unittest.TestCase):
+	document = u'a$$1$$ b$$2$$ ((c|d|e))'
+
+	def test_diagnose(self):
+		translator = re_html.Wiki2XHTML()
+		result, d = translator.diagnose(self.document)
+		self.assertEqual(result, translator.run(self.document))
+		self.assertEqual(list(d), [
+			diagnostics.Diagnostic('footnote', 1, 6, 'missing inline handler: Wiki2XHTML.i_footnote()'),
+			diagnostics.Diagnostic('footnote', 8, 13, 'missing inline handler: Wiki2XHTML.i_footnote()'),
+			diagnostics.Diagnostic('img', 14, 23, "unknown alignment u'e'"),
+		])
+		self.assertEqual(translator.diagnostics, None)
+		self.assertEqual(d.as_dict()['counts'][0]['count'], 2)
+		out = io.BytesIO()
+		diagnostics.dump(d, out)
+		self.assertEqual(out.getvalue().splitlines()[1].split(None, 2), ['2', 'footnote', 'missing inline handler: Wiki2XHTML.i_footnote()'])
+
+	def test_limit(self):
+		received = []
+		result, d = re_html.Wiki2XHTML().diagnose(u'a$$1$$ ' * 5, limit=2, callback=received.append)
+		self.assertEqual(len(d), 5)
+		self.assertEqual(d.dropped, 3)
+		self.assertEqual(list(d), received)
+		self.assertEqual([r.start for r in received], [1, 8])
+		d.reset()
+		self.assertFalse(d)
+
+	def test_listeners(self):
+		'''the messages are only formatted when somebody listens'''
+		count = [0]
+		translator = re_html.Wiki2XHTML()
+		translator.run(u'a$$1$$')
+		match = translator._inline_sub_search(u'a$$1$$')
+		translator._warning(match, Formatting(count), 1)
+		self.assertEqual(count, [0])
+		warnings = []
+		translator.warn = lambda match, message: warnings.append(message)
+		translator._warning(match, Formatting(count), 1)
+		self.assertEqual((count, warnings), ([1], ['formatted']))
+		del translator.warn
+		translator.diagnostics = diagnostics.Diagnostics()
+		translator._warning(match, Formatting(count), 1)
+		self.assertEqual(count, [2])
+		self.assertEqual(list(translator.diagnostics)[0].message, 'formatted')
+
+	def test_renderer(self):
+		'''the renderers report their warnings as the translators'''
+		renderer = renderers.XHTMLRenderer()
+		document = tree.parse(self.document)
+		result, d = renderer.diagnose(document)
+		self.assertEqual(result, renderer.render(document))
+		img = document.names.index('img')
+		self.assertEqual(list(d), [diagnostics.Diagnostic('img', img, img, "unknown alignment u'e'")])
+		self.assertEqual(renderer.diagnostics, None)
+		count = [0]
+		renderer.tree = document
+		renderer._warning(img, Formatting(count), 1)
+		self.assertEqual(count, [0])
+		warnings = []
+		renderer.warn = lambda node, message: warnings.append(message)
+		renderer._warning(img, Formatting(count), 1)
+		self.assertEqual((count, warnings), ([1], ['formatted']))
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestDiagnostics))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import events, re_html, tree
+from dotclear.events import EMPTY, ENTER, LEAVE, TEXT
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+
+
+
+
+def joined(items):
+	'''Return the events of `items` without span, consecutive texts joined'''
+	result = []
+	for event, kind, attrs in items:
+		if event == TEXT and result and result[-1][0] == TEXT:
+			result[-1] = (TEXT, None, result[-1][2] + attrs)
+		else:
+			result.append((event, kind, attrs))
+	return result
+
+
+def from_tree(t):
+	'''Return the events of the :class:`nodes.NodeTree` `t`'''
+	return joined(
+		(event, t.names[node], t.attrs[node] or {})
+		if t.names[node] else
+		(TEXT, None, t.attrs[node]['value'])
+		for event, node, _ in t.descend()
+	)
+
+
+def without_spans(items):
+	'''Return the events of `items` without their span'''
+	return joined(item[:3] for item in items)
+
+
+
+class TestEvents(unittest.TestCase):
+	def test_events(self):
+		self.assertEqual(list(events.iter_events(u'!a\n\n----\n\n__b__ [c|d]')), [
+			(ENTER, 'document', {}, (0, 0)),
+			(ENTER, 'head', {'level': 5}, (0, 1)),
+			(TEXT, None, u'a', (1, 2)),
+			(LEAVE, 'head', {'level': 5}, (2, 3)),
+			(EMPTY, 'hr', {}, (3, 9)),
+			(TEXT, None, u'\n', (9, 10)),
+			(ENTER, 'p', {}, (10, 10)),
+			(ENTER, 'strong', {}, (10, 12)),
+			(TEXT, None, u'b', (12, 13)),
+			(LEAVE, 'strong', {}, (13, 15)),
+			(TEXT, None, u' ', (15, 16)),
+			(ENTER, 'a', {'href': u'd'}, (16, 17)),
+			(TEXT, None, u'c', (17, 18)),
+			(LEAVE, 'a', {'href': u'd'}, (18, 21)),
+			(LEAVE, 'p', {}, (21, 21)),
+			(LEAVE, 'document', {}, (21, 21)),
+		])
+
+	def test_tree(self):
+		'''same elements as the trees of :mod:`tree`'''
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		for raw in [sample] + sample.split(u'\n\n') + [u'', u'* a\n** b\n*# c\n* d', u'[a]', u'!']:
+			for skip_blocks in (False, True):
+				self.assertEqual(
+					without_spans(events.iter_events(raw, skip_blocks=skip_blocks)),
+					from_tree(tree.parse(raw, skip_blocks)),
+					repr(raw)
+				)
+
+	def test_spans(self):
+		'''the spans of the texts of a ``pre`` or ``blockquote`` include
+		the characters removed from their lines'''
+		raw = u' a\n ((b))\n\n> c\n> __d__\n\n* e\n*# f\n\n[g|h] {{i}}'
+		removed = {
+			'pre': re_html.Wiki2XHTML._first_space,
+			'blockquote': re_html.Wiki2XHTML._first_gt_space,
+		}
+		pattern = None
+		for event, kind, attrs, (start, end) in events.iter_events(raw):
+			if event == TEXT:
+				text = raw[start:end]
+				self.assertEqual(pattern.sub(u'', text) if pattern else text, attrs)
+			elif event == EMPTY:
+				self.assertEqual(raw[start:end], u'((b))')
+			elif kind in ('strong', 'cite'):
+				self.assertEqual(raw[start:end], u'__' if kind == 'strong' else u'{{' if event == ENTER else u'}}')
+			if kind in removed:
+				pattern = removed[kind] if event == ENTER else None
+
+	def test_stream(self):
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		expected = list(events.iter_events(sample))
+		self.assertEqual(list(events.iter_events(sample[i:i + 7] for i in range(0, len(sample), 7))), expected)
+		#? the input is read as the events are consumed
+		lines = []
+		def source():
+			for line in io.StringIO(sample):
+				lines.append(line)
+				yield line
+		for event in events.iter_events(source()):
+			if event[0] == ENTER and event[1] == 'list':
+				break
+		self.assertTrue(len(lines) < len(sample.splitlines()) / 2)
+
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestEvents))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
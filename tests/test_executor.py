@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import Queue
+import sys
+import threading
+import time
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import executor, re_html, re_parser
+
+
+
+
+
+class Blocking(re_html.Wiki2XHTML):
+	'''Wait for :attr:`gate` before translating a paragraph'''
+	gate = threading.Event()
+
+	def b_p(self, match):
+		self.gate.wait()
+		return super(Blocking, self).b_p(match)
+
+
+
+class Slow(re_html.Wiki2XHTML):
+	def b_p(self, match):
+		threading.Event().wait(.01)
+		return super(Slow, self).b_p(match)
+
+
+
+class Unpicklable(re_html.Wiki2XHTML):
+	def run(self, data, skip_blocks=False):
+		return threading.Lock()
+
+
+
+class TestRenderExecutor(unittest.TestCase):
+	document = u"''a''\n\n" * 100
+	expected = u'<p><em>a</em></p>\n\n' * 99 + u'<p><em>a</em></p>\n'
+
+	def test_threads(self):
+		with executor.RenderExecutor(re_html.Wiki2XHTML, workers=2, inline_threshold=10) as pool:
+			futures = [pool.submit(self.document) for _ in range(10)]
+			self.assertEqual([future.result(5) for future in futures], [self.expected] * 10)
+			done = []
+			future = pool.submit(self.document)
+			future.result(5)
+			future.add_done_callback(done.append)
+			self.assertEqual(done, [future])
+
+	def test_processes(self):
+		with executor.RenderExecutor(re_html.Wiki2XHTML, workers=2, processes=True, inline_threshold=10) as pool:
+			self.assertEqual(pool.run(self.document), self.expected)
+			future = pool.submit(self.document, timeout=0)
+			self.assertRaises(re_parser.LimitExceeded, future.result, 5)
+
+	def test_processes_unpicklable(self):
+		with executor.RenderExecutor(Unpicklable, workers=1, processes=True, max_pending=1, inline_threshold=0) as pool:
+			for _ in range(2):
+				future = pool.submit(u'a', block=False)
+				self.assertRaises(executor.cPickle.PicklingError, future.result, 5)
+
+	def test_processes_shutdown(self):
+		pool = executor.RenderExecutor(Slow, workers=1, processes=True, inline_threshold=0)
+		futures = [pool.submit(self.document) for _ in range(2)]
+		pool.shutdown(wait=False)
+		for future in futures:
+			self.assertRaises(executor.CancelledError, future.result, 5)
+
+	def test_inline(self):
+		pool = executor.RenderExecutor(Blocking, workers=1)
+		try:
+			#? translated by the caller, done at once
+			future = pool.submit(u'__a__', skip_blocks=True)
+			self.assertTrue(future.done())
+			self.assertEqual(future.result(), u'<strong>a</strong>')
+		finally:
+			Blocking.gate.set()
+			pool.shutdown()
+			Blocking.gate.clear()
+
+	def test_backpressure(self):
+		pool = executor.RenderExecutor(Blocking, workers=1, max_pending=2, inline_threshold=0)
+		try:
+			first = pool.submit(u'a')
+			second = pool.submit(u'b')
+			self.assertRaises(Queue.Full, pool.submit, u'c', block=False)
+			self.assertTrue(second.cancel())
+			self.assertRaises(executor.CancelledError, second.result)
+			self.assertRaises(executor.TimeoutError, first.result, .01)
+			Blocking.gate.set()
+			self.assertEqual(first.result(5), u'<p>a</p>\n')
+			self.assertEqual(pool.submit(u'c', block=False).result(5), u'<p>c</p>\n')
+		finally:
+			Blocking.gate.set()
+			pool.shutdown()
+			Blocking.gate.clear()
+
+	def test_timeout(self):
+		with executor.RenderExecutor(Slow, workers=1, inline_threshold=0) as pool:
+			future = pool.submit(u'a\n\n' * 100, timeout=.05)
+			self.assertRaises(re_parser.LimitExceeded, future.result, 5)
+			self.assertEqual(pool.run(u'a', timeout=5), u'<p>a</p>\n')
+
+	def test_timeout_paragraph(self):
+		'''one long paragraph, with or without blocks, stops at the timeout'''
+		data = u'[' * 20000
+		with executor.RenderExecutor(re_html.Wiki2XHTML, workers=1, inline_threshold=0) as pool:
+			for skip_blocks in (True, False):
+				start = time.time()
+				future = pool.submit(data, skip_blocks, timeout=.05)
+				self.assertTrue(isinstance(future.exception(5), re_parser.LimitExceeded))
+				self.assertTrue(time.time() - start < 1, (skip_blocks, time.time() - start))
+
+	def test_timeout_handler(self):
+		'''a waiting handler is not interrupted, the caller stops waiting'''
+		with executor.RenderExecutor(Blocking, workers=1, inline_threshold=0) as pool:
+			future = pool.submit(u'a', timeout=.01)
+			self.assertRaises(executor.TimeoutError, future.result, .05)
+			self.assertTrue(future.running())
+			Blocking.gate.set()
+			self.assertRaises(re_parser.LimitExceeded, future.result, 5)
+			Blocking.gate.clear()
+
+	def test_stream(self):
+		with executor.RenderExecutor(re_html.Wiki2XHTML, workers=1) as pool:
+			self.assertEqual(u''.join(pool.stream(self.document, max_buffered=2)), self.expected)
+			pieces = pool.stream(self.document, max_buffered=1)
+			next(pieces)
+			pieces.close()
+
+	def test_stream_closed(self):
+		'''the translation of a closed stream stops, even once translated'''
+		with executor.RenderExecutor(re_html.Wiki2XHTML, workers=1) as pool:
+			threads = set(threading.enumerate())
+			for _ in range(3):
+				pieces = pool.stream(u'a\n\nb', max_buffered=1)
+				next(pieces)
+				pieces.close()
+			for _ in range(50):
+				if set(threading.enumerate()) <= threads:
+					break
+				threading.Event().wait(.1)
+			self.assertEqual(set(threading.enumerate()) - threads, set())
+
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestRenderExecutor))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import random
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import incremental, re_html
+
+
+
+
+
+class TestIncrementalRenderer(unittest.TestCase):
+	def setUp(self):
+		self.translator = re_html.Wiki2XHTML()
+		self.renderer = incremental.IncrementalRenderer(self.translator)
+
+	def test_edit(self):
+		'''only the chunks around an edit are translated again'''
+		paragraphs = [u'paragraph __%u__' % i for i in range(100)]
+		source = u'\n\n'.join(paragraphs)
+		self.assertEqual(self.renderer.render(source), self.translator.run(source))
+		self.assertEqual(self.renderer.scanned, 101)
+		paragraphs[50]+= u" ''edited''"
+		source = u'\n\n'.join(paragraphs)
+		self.assertEqual(self.renderer.render(source), self.translator.run(source))
+		self.assertTrue(self.renderer.scanned <= 3)
+		self.assertEqual(self.renderer.render(source), self.translator.run(source))
+		self.assertEqual(self.renderer.scanned, 0)
+
+	def test_blocks(self):
+		'''edits changing the blocks after them'''
+		for before, after in (
+			(u'a\n\nb\n\nc', u'a\n///\nb\n\nc'),
+			(u'a\n\n///\nb\n\n///\n\nc', u'a\n\n///\nb\n\n//\n\nc'),
+			(u'> a\n\nb', u'> a\n> \nb'),
+			(u'* a\n\n* b', u'* a\n* b'),
+			(u'a\n\n b\n\n c', u'a\n b\n\n c'),
+			(u'a', u''),
+			(u'', u'a\n\n\n'),
+			#? the line after a bullet alone is the value of the first item
+			(u'*\n-\n///\n\n|\n\n///', u'*\n-x\n///\n\n|\n\n///'),
+			(u'*\n-\n///\n\n|\n\n///', u'*\n\n///\n\n|\n\n///'),
+			(u'*\n-\n///\n\n|\n\n///', u'*\n* -\n///\n\n|\n\n///'),
+			(u'#\na\n\nb', u'#\n\na\n\nb'),
+		):
+			renderer = incremental.IncrementalRenderer(self.translator)
+			renderer.render(before)
+			self.assertEqual(renderer.render(after), self.translator.run(after), repr(after))
+			self.assertEqual(renderer.render(before), self.translator.run(before), repr(before))
+
+	def test_random(self):
+		rnd = random.Random(0)
+		pieces = (u'\n', u'\n\n', u'///', u'///html\n', u'> ', u'* ', u'# ', u'*\n', u'#\n', u' ', u'!', u'----', u'__a__', u'text')
+		for skip_blocks in (False, True):
+			renderer = incremental.IncrementalRenderer(self.translator, skip_blocks)
+			source = u''
+			for _ in range(300):
+				position = rnd.randint(0, len(source))
+				if rnd.random() < .7:
+					source = source[:position] + rnd.choice(pieces) + source[position:]
+				else:
+					source = source[:position] + source[position + rnd.randint(1, 10):]
+				self.assertEqual(renderer.render(source), self.translator.run(source, skip_blocks), repr(source))
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestIncrementalRenderer))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import links, re_html, renderers, tree
+
+
+
+
+
+class Lazy(links.LinkPolicy):
+	'''Load the images of the other hosts lazily'''
+	def attributes(self, element, scheme, host, external):
+		if element == 'img' and external:
+			return [('loading', 'lazy')]
+		return super(Lazy, self).attributes(element, scheme, host, external)
+
+
+
+class TestLinkPolicy(unittest.TestCase):
+	def test_classify(self):
+		policy = links.LinkPolicy(internal_hosts=('.dotclear.org', 'Example.org'))
+		self.assertEqual(
+			policy.classify(u'http://fr.dotclear.org/a'),
+			links.LinkInfo(u'http', u'fr.dotclear.org', False, u'', u'')
+		)
+		for href, external in (
+			(u'HTTP://DOTCLEAR.ORG:80/', False),
+			(u'http://example.org/', False),
+			(u'http://www.example.org/', True),
+			(u'http://dotclear.org.example.com/', True),
+			(u'mailto:a@dotclear.org', True),
+			(u'/a/b', False),
+			(u'http://[x', False),
+		):
+			self.assertEqual(policy.classify(href).external, external, href)
+		self.assertEqual(policy.classify(u'ftp://a/').a_attributes, u' class="external"')
+
+	def test_lru(self):
+		policy = links.LinkPolicy(maxsize=3)
+		for href in u'abcadeaf':
+			policy.classify(href)
+		self.assertEqual(
+			policy.stats(),
+			{'hits': 2, 'misses': 6, 'evictions': 3, 'size': 3, 'maxsize': 3}
+		)
+		self.assertEqual(sorted(policy._cache), [u'a', u'e', u'f'])
+		policy.clear()
+		self.assertEqual(policy.stats()['size'], 0)
+		policy = links.LinkPolicy(maxsize=0)
+		policy.classify(u'a')
+		self.assertEqual((policy.stats()['misses'], policy.stats()['size']), (1, 0))
+
+	def test_translators(self):
+		raw = u'[a|http://dotclear.org/] http://example.org/\n\n((http://example.org/a.png|A))\n((/b.png))'
+		translator = re_html.Wiki2XHTML()
+		translator.link_policy = Lazy(internal_hosts=('dotclear.org',), rel=u'nofollow')
+		expected = (
+			u'<p><a href="http://dotclear.org/">a</a> <a href="http://example.org/" class="external" rel="nofollow">http://example.org/</a></p>\n\n'
+			u'<p><img src="http://example.org/a.png" loading="lazy" alt="A" />\n<img src="/b.png" /></p>\n'
+		)
+		self.assertEqual(translator.run(raw), expected)
+		renderer = renderers.XHTMLRenderer()
+		renderer.link_policy = translator.link_policy
+		self.assertEqual(renderer.render(tree.parse(raw)), expected)
+		self.assertEqual(translator.link_policy.stats()['hits'], 4)
+		#? the default policy is shared
+		self.assertTrue(re_html.Wiki2XHTML().link_policy is renderers.XHTMLRenderer.link_policy)
+
+	def test_uri(self):
+		'''a bare URI always has a scheme, even if urlsplit reads none'''
+		translator = re_html.Wiki2XHTML()
+		for raw in (u'foo:123', u'tel:5551234', u'http://a[b'):
+			expected = u'see <a href="%s" class="external">%s</a>' % (raw, raw)
+			self.assertEqual(translator.run(u'see ' + raw, skip_blocks=True), expected)
+			self.assertEqual(renderers.XHTMLRenderer().render(tree.parse(u'see ' + raw, skip_blocks=True)), expected)
+		#? as a link target, it is parsed
+		self.assertEqual(translator.run(u'[a|tel:5551234]', skip_blocks=True), u'<a href="tel:5551234">a</a>')
+		policy = links.LinkPolicy()
+		self.assertEqual(policy.classify(u'tel:5551234').scheme, u'')
+		self.assertEqual(policy.classify(u'tel:5551234', u'tel').scheme, u'tel')
+		self.assertEqual(policy.stats()['size'], 2)
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestLinkPolicy))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
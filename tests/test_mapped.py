@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import mapped, re_html, re_parser
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+SEPARATOR = '\n\x0c\n'
+
+
+
+
+
+class TestMappedDump(unittest.TestCase):
+	def setUp(self):
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			self.sample = fobj.read()
+		self.documents = [
+			u'\n\n'.join([self.sample] * 8),
+			u'\n\n a\n b\n\n///\nc\n\n\nd\n///\n\né\n',
+			u'',
+			u"x\n///html\n<p>\n\n</p>\n///\n\n''y''",
+			#? ``///`` inside a paragraph, after a title, after blank lines
+			u'a\n///\n\n///\nx\n\ny\n\nz\n///',
+			u'!a\n///\nx\n\ny\n///\n\n> b\n///\n\n///\nc\n\nd\n///',
+			u'* a\n \n\n\t\n\n///\nx\n\ny\n///\n\n\n',
+			#? a bullet alone takes the next line, even empty
+			u'*\n-\n///\n\n|\n\n///',
+			u'#\n\n\n  \n///\nx\n\ny\n///',
+		]
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'dump.txt')
+		with open(self.path, 'wb') as fobj:
+			fobj.write(SEPARATOR.join(document.encode('utf8') for document in self.documents))
+		self.translator = re_html.Wiki2XHTML()
+		self.translator.warn = lambda *args: None
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def check(self, dump):
+		spans = list(dump.documents())
+		self.assertEqual([dump.text(start, end) for start, end in spans], self.documents)
+		for document, (start, end) in zip(self.documents, spans):
+			self.assertEqual(list(dump.blocks(start, end)), list(re_parser.iter_blocks(document)))
+			self.assertEqual(u''.join(dump.iter_run(self.translator, start, end)), self.translator.run(document))
+
+	def test_path(self):
+		with mapped.MappedDump(self.path, SEPARATOR) as dump:
+			self.check(dump)
+
+	def test_small_window(self):
+		'''the sample spans several windows'''
+		with mapped.MappedDump(self.path, SEPARATOR, window=mmap.ALLOCATIONGRANULARITY) as dump:
+			self.assertTrue(dump.size > 2 * dump.window)
+			self.check(dump)
+
+	def test_tiny_window(self):
+		'''a window smaller than the separator is enlarged'''
+		with mapped.MappedDump(self.path, SEPARATOR, window=1) as dump:
+			self.assertEqual(dump._data.window, mmap.ALLOCATIONGRANULARITY)
+			self.check(dump)
+		separator = '\n' + '-' * (2 * mmap.ALLOCATIONGRANULARITY) + '\n'
+		with open(self.path, 'wb') as fobj:
+			fobj.write(separator.join(['a', 'b\n\nc']))
+		with mapped.MappedDump(self.path, separator, window=1) as dump:
+			self.assertEqual([dump.text(start, end) for start, end in dump.documents()], [u'a', u'b\n\nc'])
+			self.assertEqual(list(dump.blocks()), list(re_parser.iter_blocks(dump.text())))
+
+	def test_mmap(self):
+		with open(self.path, 'rb') as fobj:
+			data = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+			with mapped.MappedDump(data, SEPARATOR) as dump:
+				self.check(dump)
+			#? not closed by the dump
+			self.assertEqual(data[:1], self.sample[:1].encode('utf8'))
+			data.close()
+
+	def test_empty(self):
+		open(self.path, 'wb').close()
+		with mapped.MappedDump(self.path) as dump:
+			self.assertEqual(list(dump.documents()), [(0, 0)])
+			self.assertEqual(list(dump.blocks()), [])
+			self.assertEqual(u''.join(dump.iter_run(self.translator)), self.translator.run(u''))
+
+	def test_encoding(self):
+		self.assertRaises(ValueError, mapped.MappedDump, self.path, encoding='utf-16')
+		self.assertRaises(ValueError, mapped.MappedDump, self.path, separator='')
+		with open(self.path, 'wb') as fobj:
+			fobj.write(u'é[a]\n\n!b'.encode('latin-1'))
+		with mapped.MappedDump(self.path, encoding='latin-1') as dump:
+			self.assertEqual(u''.join(dump.iter_run(self.translator)), self.translator.run(u'é[a]\n\n!b'))
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestMappedDump))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import batch, events, metadata
+from dotclear.metadata import Anchor, Heading, Image, Link
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+
+
+
+
+class TestMetadata(unittest.TestCase):
+	def test_extract(self):
+		raw = u"!!Title~top~\n\n a [b|c]\n d\n\n> x ((e|E))\n> [f]\n\n* [g]\n*# ((h)) ??[i]?? {{[j]}}\n\n$$[k]$$ @@http://l@@ \\[m] ''[n|http://o]''\n\n///\n[p]\n///"
+		m = metadata.extract(raw)
+		self.assertEqual(m.headings, [Heading(4, u'Title~top~', 0, 12)])
+		self.assertEqual(m.anchors, [Anchor(u'top', 7, 12)])
+		self.assertEqual(m.images, [Image(u'e', u'E', 31, 38), Image(u'h', None, 55, 60)])
+		self.assertEqual([link.href for link in m.links], [u'c', u'f', u'g', u'i', u'j', u'http://l', u'http://o'])
+		for record in m.links + m.images + m.anchors:
+			self.assertTrue(raw[record.start:record.end].endswith((u']', u')', u'~', u'l', u'o')), record)
+		self.assertEqual(metadata.extract(u'[a]\n\n((b))', skip_blocks=True).links, [Link(u'a', 0, 3)])
+
+	def test_events(self):
+		'''same links, images and anchors as :func:`events.iter_events`'''
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		m = metadata.extract(sample)
+		kinds = {'a': 'href', 'uri': 'href', 'img': 'src', 'anchor': 'name', 'head': 'level'}
+		expected = dict((kind, []) for kind in kinds)
+		for event, kind, attrs, span in events.iter_events(sample):
+			if kind in kinds and event != events.LEAVE:
+				expected[kind].append(attrs[kinds[kind]])
+		self.assertEqual(sorted(link.href for link in m.links), sorted(expected['a'] + expected['uri']))
+		self.assertEqual([image.src for image in m.images], expected['img'])
+		self.assertEqual([anchor.name for anchor in m.anchors], expected['anchor'])
+		self.assertEqual([heading.level for heading in m.headings], expected['head'])
+		self.assertTrue(m.links and m.images and m.headings)
+
+	def test_many(self):
+		documents = [u'[a%u]' % i for i in range(20)]
+		self.assertEqual(
+			list(metadata.extract_many(documents, processes=2, chunksize=3)),
+			[batch.Result(i, metadata.Metadata([Link(u'a%u' % i, 0, len(documents[i]))], [], [], []), None) for i in range(20)]
+		)
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestMetadata))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import nodes
+
+
+
+
+
+def sample():
+	body = nodes.MazNode('body')
+	body+= nodes.MazNode('p')
+	body.child+= nodes.MazNode(value=u'text')
+	body.child+= nodes.MazNode('br')
+	body+= nodes.MazNode('hr', {'class': 'sep'})
+	return body
+
+
+
+class TestNodeTree(unittest.TestCase):
+	def test_add(self):
+		tree = nodes.NodeTree()
+		body = tree.add('body')
+		p = tree.add('p', parent=body)
+		text = tree.add(value=u'text', parent=p)
+		hr = tree.add('hr', {'class': 'sep'}, parent=body)
+		self.assertEqual(len(tree), 4)
+		self.assertEqual(tree.count(body), 2)
+		self.assertEqual(tree.count(text), 0)
+		self.assertEqual(tree.child(body, 1), hr)
+		self.assertRaises(IndexError, tree.child, text)
+		self.assertEqual(tree.parents[text], p)
+		self.assertEqual(tree.roots, [body])
+		tree.clear()
+		self.assertEqual(len(tree), 0)
+
+	def test_descend(self):
+		root = sample()
+		tree = nodes.NodeTree()
+		view = tree.view(tree.load(root))
+		self.assertEqual(
+			[(status, node.name, depth) for status, node, depth in view.descend()],
+			[(status, node.name, depth) for status, node, depth in root.descend()],
+		)
+		self.assertEqual([status for status, _, _ in tree.descend(2)], [nodes.EMPTY])
+
+	def test_view(self):
+		''':class:`NodeView` behaves as :class:`MazNode`'''
+		tree = nodes.NodeTree()
+		view = tree.view(tree.load(sample()))
+		for node in (sample(), view):
+			self.assertEqual(len(node), 2)
+			self.assertEqual(len(node.child), 2)
+			self.assertEqual([child.name for child in node.children], ['p', 'hr'])
+			self.assertEqual(node[1]['class'], 'sep')
+			self.assertEqual(node[0][0]['value'], u'text')
+			self.assertEqual(node.child.next.name, 'hr')
+			self.assertEqual(node.child.prev.name, 'hr')
+			self.assertEqual(node.child.next.next.name, 'p')
+			self.assertEqual(node.child.parent.name, 'body')
+			self.assertEqual(unicode(node.child), u'<p><!-- 2 childs ---></p>')
+			self.assertRaises(IndexError, node.__getitem__, 2)
+			self.assertRaises(TypeError, node.__getitem__, -1)
+		self.assertEqual(view.parent, view)
+		self.assertEqual(view[0], view.child)
+		view.child+= nodes.MazNode('em')
+		self.assertEqual(view.child[2].name, 'em')
+		self.assertRaises(AttributeError, setattr, view, 'child', view.child.next)
+		copy = view + nodes.MazNode('foot')
+		self.assertEqual(len(copy), 3)
+		self.assertEqual(len(view), 2)
+
+	def test_view_self(self):
+		'''a view may be added to itself or to its descendants'''
+		tree = nodes.NodeTree()
+		view = tree.view(tree.load(sample()))
+		view+= view
+		self.assertEqual([child.name for child in view.children], ['p', 'hr', 'body'])
+		self.assertEqual([child.name for child in view[2].children], ['p', 'hr'])
+		view.child|= view
+		self.assertEqual([child.name for child in view.children], ['p', 'hr', 'body', 'body'])
+		self.assertEqual(len(view[3]), 3)
+		self.assertEqual(len(view[3][2]), 2)
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestNodeTree))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 # vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
 import os
 import sys
 import unittest
@@ -8,7 +9,10 @@ sys.dont_write_bytecode = True
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 
-from dotclear import re_html
+from dotclear import nodes, re_html
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
 
 
 
@@ -80,6 +84,17 @@ class TestSimpleBlocks(TestWiki2XHTML):
 		)
 
 
+	def test_list_type_change(self):
+		self._test(
+			u'* a\n# b',
+			u'<ul>\n <li>a</li>\n</ul>\n<ol>\n <li>b</li>\n</ol>'
+		)
+		self._test(
+			u'* a\n** b\n# c',
+			u'<ul>\n <li>a\n  <ul>\n   <li>b</li>\n  </ul>\n </li>\n</ul>\n<ol>\n <li>c</li>\n</ol>'
+		)
+
+
 
 class TestSimpleInlines(TestWiki2XHTML):
 	def _test(self, *args, **kwargs):
@@ -149,6 +164,14 @@ class TestSimpleInlines(TestWiki2XHTML):
 		):
 			self._test(raw, html)
 
+	def test_nested(self):
+		for raw, html in (
+			(u"Et __fort @@code ''chiant''@@__.", u'Et <strong>fort <tt class="code">code <em>chiant</em></tt></strong>.'),
+			(u"''a __b'' c__", u'<em>a __b</em> c__'),
+			(u"[__lien ''en''__|url]", u'<a href="url"><strong>lien <em>en</em></strong></a>'),
+		):
+			self._test(raw, html)
+
 	def test_footnote(self):
 		self._test(
 			u'texte$$Corps de la note$$',
@@ -159,11 +182,103 @@ class TestSimpleInlines(TestWiki2XHTML):
 
 
 
+class TestEscape(TestWiki2XHTML):
+	def test_escape(self):
+		self.assertEqual(self.w2x.escape(u'sans'), u'sans')
+		self.assertEqual(self.w2x.escape(u'<a href="x">\'&\'</a>'), u'&lt;a href=&quot;x&quot;&gt;&apos;&amp;&apos;&lt;/a&gt;')
+		self.assertEqual(self.w2x.escape(u'\xe9t\xe9 & <', True), u'&eacute;t&eacute; &amp; &lt;')
+
+	def test_escape_str(self):
+		for string in ('a<b', 'sans'):
+			for entities in (False, True):
+				result = self.w2x.escape(string, entities)
+				self.assertEqual(result, self.w2x.escape(unicode(string), entities))
+				self.assertTrue(isinstance(result, unicode))
+
+
+
+class TestNode2HTML(unittest.TestCase):
+	def test_node2html(self):
+		body = nodes.MazNode('body')
+		body+= nodes.MazNode('p', {'class': 'a"b'})
+		body.child+= nodes.MazNode(value=u'1 < 2')
+		body.child+= nodes.MazNode('br')
+		html = u'<body>\n <p class="a&quot;b">\n  1 &lt; 2\n  <br />\n </p>\n</body>'
+		self.assertEqual(re_html.node2html(body, escape=True), html)
+		#? the values are not escaped by default
+		self.assertEqual(re_html.node2html(body.child.child), u'1 < 2')
+		self.assertEqual(re_html.node2html(body), html.replace(u'&lt;', u'<'))
+		out = io.StringIO()
+		re_html.node2html(body, out, True)
+		self.assertEqual(out.getvalue(), html)
+		tree = nodes.NodeTree()
+		self.assertEqual(re_html.node2html(tree.view(tree.load(body)), escape=True), html)
+
+	def test_large(self):
+		'''deep and wide trees are serialized without recursion'''
+		tree = nodes.NodeTree()
+		parent = tree.add('div')
+		for i in range(100000):
+			parent = tree.add('div', parent=parent)
+		for i in range(100000):
+			tree.add('br', parent=parent)
+		out = []
+		re_html.node2html(tree.view(0), out, indent=u'')
+		self.assertEqual(len(out), 100001 * 2 + 100000)
+		self.assertEqual(u''.join(out[-3:]), u'\n</div>\n</div>\n</div>')
+
+
+
+class TestStream(TestWiki2XHTML):
+	def test_iter_run(self):
+		with io.open(SAMPLE, 'rb') as fobj:
+			data = fobj.read()
+		self.w2x.warn = lambda match, message: None
+		self.assertEqual(
+			u''.join(self.w2x.iter_run(data[i:i + 7] for i in range(0, len(data), 7))),
+			self.w2x.run(data.decode('utf8'))
+		)
+
+	def test_render(self):
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			data = fobj.read()
+		self.w2x.warn = lambda match, message: None
+		for skip_blocks in (False, True):
+			out = io.StringIO()
+			self.w2x.render(data, out, skip_blocks)
+			self.assertEqual(out.getvalue(), self.w2x.run(data, skip_blocks))
+
+	def test_iter_run_blockquote(self):
+		raw = u'> citation\n\nparagraphe\n\n> citation\n\n\n!titre'
+		self.assertEqual(u''.join(self.w2x.iter_run(io.StringIO(raw))), self.w2x.run(raw))
+
+	def test_iter_run_xmp(self):
+		'''a ``///`` line only opens a block where a block starts'''
+		for raw in (
+			u'a\n///\n\n///\nx\n\ny\n\nz\n///',
+			u'!a\n///\nx\n\ny\n///',
+			u'* a\n///\nx\n\ny\n///',
+			u'> a\n///\n\n///\nx\n\ny\n///',
+			u'* a\n \n\n\t\n\n///\nx\n\ny\n///',
+			#? a bullet alone takes the next line as the value of its item
+			u'*\n-\n///\n\n|\n\n///',
+			u'#\n\n* a\n\n///\nx\n\ny\n///',
+			#? `` !`` is a ``pre``, not a title
+			u'*a\n !\n ///\n///\n\n>\n\n///',
+		):
+			self.assertEqual(u''.join(self.w2x.iter_run(raw)), self.w2x.run(raw), repr(raw))
+
+
+
+
 
 def suite():
 	s = unittest.TestSuite()
 	s.addTest(unittest.makeSuite(TestSimpleBlocks))
 	s.addTest(unittest.makeSuite(TestSimpleInlines))
+	s.addTest(unittest.makeSuite(TestEscape))
+	s.addTest(unittest.makeSuite(TestNode2HTML))
+	s.addTest(unittest.makeSuite(TestStream))
 	return s
 
 
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
 # vim:ts=8 sw=8 ai noet encoding=utf-8
 import os
+import subprocess
 import sys
+import time
+import timeit
 import unittest
 
 sys.dont_write_bytecode = True
@@ -27,10 +30,246 @@ class TestBugs(unittest.TestCase):
 
 
 
+class TestDispatch(unittest.TestCase):
+	def test_subclass_handler(self):
+		class Upper(re_parser.Translator):
+			def i_em(self, match):
+				return match.group('em').upper()
+		self.assertEqual(Upper().run("a ''b'' c", skip_blocks=True), 'a B c')
+
+	def test_register(self):
+		translator = re_parser.Translator()
+		translator.warn = lambda match, message: None
+		self.assertEqual(translator.run('__b__', skip_blocks=True), '__b__')
+		translator.register('i_strong', lambda match: match.group('strong'))
+		self.assertEqual(translator.run('__b__', skip_blocks=True), 'b')
+
+
+
+class TestGrammar(unittest.TestCase):
+	class Links(re_parser.Translator):
+		rules = ('p', 'a', 'em')
+		inline_tags = {'em': (u'<em>', u'</em>'), 'code': (u'<tt>', u'</tt>')}
+		def b_p(self, match):
+			return u'<p>%s</p>' % self.inline(match.group('p'))
+		def i_a(self, match):
+			return u'<a>%s</a>' % match.group('a_href')
+		def i_img(self, match):
+			return u'<img />'
+
+	def test_rules(self):
+		translator = self.Links()
+		result, diagnostics = translator.diagnose(u"''[a]'' @@[b]@@ ((c))\n\n!d")
+		self.assertEqual(result, u"<p><em><a>a</a></em> @@<a>b</a>@@ ((c))\n</p>\n<p>!d</p>")
+		self.assertEqual(len(diagnostics), 0)
+		self.assertTrue(translator._grammar is re_parser.grammar(['em', 'a', 'p']))
+		self.assertTrue(translator._grammar is self.Links()._grammar)
+		self.assertEqual(sorted(translator._grammar.inline.groupindex), ['a', 'a_href', 'a_lang', 'a_title', 'a_value', 'em'])
+
+	def test_restricted(self):
+		class Restricted(self.Links):
+			rules = None
+			restricted = True
+		translator = Restricted()
+		self.assertEqual(sorted(translator.rule_names()), ['a', 'code', 'em', 'img', 'p'])
+		self.assertEqual(translator.run(u"@@[a]@@ ((b)) ??c??"), u'<p><tt><a>a</a></tt> <img /> ??c??</p>')
+		translator.register('i_acronym', lambda match: match.group('acronym'))
+		self.assertEqual(translator.run(u'??c??'), u'<p>c</p>')
+		self.assertEqual(re_parser.Translator().rule_names(), None)
+
+	def test_inline_search(self):
+		'''the rules matched where :data:`p_inline_scan` finds the start of
+		an element are the matches of the rules
+		'''
+		for translator in (re_parser.Translator(), self.Links()):
+			pattern = translator._grammar.inline
+			for data in (
+				u"a ''b'' __c__ ''d\ne''", u"\\''a'' ''b\\'' c''", u"''''a'''", u"__a ''b__ c''",
+				u'ab:c \\ab:c x\\:y [a|b] ((c)) %%% ~d~ ??e?? {{f}} $$g$$ %;',
+				u'[a [b|c]', u'a@@b ++c++ --d-- @@',
+			):
+				for pos in range(len(data) + 1):
+					expected = pattern.search(data, pos)
+					match = translator._inline_sub_search(data, pos)
+					self.assertEqual(
+						expected and (expected.span(), expected.lastgroup),
+						match and (match.span(), match.lastgroup),
+						(data, pos)
+					)
+
+	def test_empty(self):
+		class Nothing(re_parser.Translator):
+			rules = ()
+		for skip_blocks in (False, True):
+			self.assertEqual(Nothing().run(u"a ''b''\n\n!c", skip_blocks), u"a ''b''\n\n!c")
+			self.assertEqual(u''.join(Nothing().iter_run(u"a\n\n__b__", skip_blocks=skip_blocks)), u'a\n\n__b__')
+
+
+
+class Clock(object):
+	'''Clock moving forward by `step` seconds at each call'''
+	def __init__(self, step=0.):
+		self.now = 0.
+		self.step = step
+
+	def __call__(self):
+		self.now+= self.step
+		return self.now
+
+
+
+class Inline(re_parser.Translator):
+	max_time = .05
+	def b_p(self, match):
+		return self.inline(match.group('p'))
+
+
+
+class TestLimits(unittest.TestCase):
+	def test_max_size(self):
+		translator = re_parser.Translator()
+		translator.warn = lambda match, message: None
+		translator.max_size = 4
+		self.assertEqual(translator.run('abcd'), 'abcd')
+		self.assertRaises(re_parser.LimitExceeded, translator.run, 'abcde')
+		self.assertRaises(re_parser.LimitExceeded, translator.run, 'abcde', skip_blocks=True)
+		self.assertRaises(re_parser.LimitExceeded, list, translator.iter_run(['ab\n', '\ncd\n']))
+
+	def test_max_time(self):
+		class Slow(re_parser.Translator):
+			max_time = .05
+			def __init__(self):
+				self.clock = Clock()
+			def b_p(self, match):
+				self.clock.now+= .02
+				return match.group()
+		self.assertEqual(Slow().run('a\n\nb'), 'a\n\nb')
+		self.assertRaises(re_parser.LimitExceeded, Slow().run, 'a\n\n' * 10)
+		self.assertRaises(re_parser.LimitExceeded, list, Slow().iter_run('a\n\n' * 10))
+
+	def test_max_time_inline(self):
+		'''checked before each inline rule matched, with or without blocks'''
+		for skip_blocks in (False, True):
+			translator = Inline()
+			translator.warn = lambda match, message: None
+			translator.clock = Clock(.01)
+			self.assertEqual(translator.run(u'[a]', skip_blocks), u'[a]')
+			for run in (translator.run, lambda data, skip_blocks: list(translator.iter_run(data, skip_blocks=skip_blocks))):
+				translator.clock.now = 0.
+				self.assertRaises(re_parser.LimitExceeded, run, u'[' * 100, skip_blocks)
+
+	def test_max_time_paragraph(self):
+		'''a large paragraph of unterminated links (which takes minutes to
+		translate) stops soon after :attr:`Translator.max_time`
+		'''
+		translator = Inline()
+		translator.warn = lambda match, message: None
+		data = u'[' * 20000
+		for skip_blocks in (False, True):
+			start = time.time()
+			self.assertRaises(re_parser.LimitExceeded, translator.run, data, skip_blocks)
+			self.assertTrue(time.time() - start < 1, (skip_blocks, time.time() - start))
+
+	def test_linear(self):
+		'''pathological blocks: the time must not be quadratic'''
+		translator = re_parser.Translator()
+		translator.warn = lambda match, message: None
+		cases = (
+			#? unterminated citation
+			lambda n: '> ' + 'a ' * n,
+			#? spaces inside a title
+			lambda n: '!a' + ' ' * n + 'b\n',
+			#? unterminated xmp
+			lambda n: '///\n' + 'a\n' * n,
+			#? blank lines
+			lambda n: ' \n' * n + 'a',
+		)
+		#? four times the input: 4 times the time if linear, 16 if quadratic
+		for case in cases:
+			elapsed = []
+			for n in (10000, 40000):
+				data = case(n)
+				elapsed.append(min(timeit.repeat(lambda: translator.run(data), number=1, repeat=3)))
+			self.assertTrue(elapsed[1] < 8 * elapsed[0] + .05, (case(2), elapsed))
+
+
+
+class TestStream(unittest.TestCase):
+	def test_iter_lines(self):
+		data = u'premi\xe8re\nligne\n\nfin'.encode('utf8')
+		self.assertEqual(
+			list(re_parser.iter_lines(data[i:i + 3] for i in range(0, len(data), 3))),
+			[u'premi\xe8re\n', u'ligne\n', u'\n', u'fin']
+		)
+
+	def test_iter_blocks(self):
+		self.assertEqual(
+			list(re_parser.iter_blocks(u'a\nb\n\n///\nc\n\nd\n///\n\n\ne')),
+			[u'a\nb\n', u'\n///\nc\n\nd\n///\n', u'\n\ne']
+		)
+		#? inside a paragraph, ``///`` opens no block
+		self.assertEqual(
+			list(re_parser.iter_blocks(u'a\n///\n\n///\nx\n\ny\n///')),
+			[u'a\n///\n', u'\n///\nx\n\ny\n///']
+		)
+		#? nor after a bullet alone, which takes the next line
+		self.assertEqual(
+			list(re_parser.iter_blocks(u'*\n\n* a\n\nb')),
+			[u'*\n\n* a\n', u'\nb']
+		)
+
+
+
+class TestLazy(unittest.TestCase):
+	def test_pattern(self):
+		pattern = re_parser.LazyPattern(r'(?P<word>\w+)')
+		self.assertEqual(pattern._compiled, None)
+		self.assertEqual(pattern.search(u'- ab').group('word'), u'ab')
+		self.assertEqual(pattern.groupindex, {'word': 1})
+		self.assertTrue(pattern.search is pattern.search)
+		re_parser.LazyPattern.instances.remove(pattern)
+
+	def test_starts(self):
+		'''one entry of :data:`INLINE_STARTS` per inline rule'''
+		self.assertEqual(len(re_parser.INLINE_STARTS), len(re_parser.RULES_INLINE))
+		for rule, (name, _) in zip(re_parser.RULES_INLINE, re_parser.INLINE_STARTS):
+			self.assertEqual(re_parser._group_names(rule)[0], name)
+
+	def test_import(self):
+		'''Importing the package must not compile the patterns (nor
+		build the tables of entities)
+		'''
+		self.assertEqual(subprocess.check_output([sys.executable, '-c', '''if 1:
+			import sys
+			sys.path.insert(0, %r)
+			import dotclear
+			from dotclear import re_parser
+			sys.stdout.write('%%s %%s %%s' %% (
+				sum(p._compiled is not None for p in re_parser.LazyPattern.instances),
+				'multiprocessing' in sys.modules,
+				'htmlentitydefs' in sys.modules,
+			))
+		''' % os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')]), '0 False False')
+
+	def test_warmup(self):
+		translator = re_parser.Translator()
+		re_parser.warmup(translator)
+		for pattern in re_parser.LazyPattern.instances:
+			self.assertNotEqual(pattern._compiled, None)
+		for name in translator._tables:
+			self.assertTrue(name in translator.__dict__)
+
+
+
 
 def suite():
 	s = unittest.TestSuite()
 	s.addTest(unittest.makeSuite(TestBugs))
+	s.addTest(unittest.makeSuite(TestDispatch))
+	s.addTest(unittest.makeSuite(TestGrammar))
+	s.addTest(unittest.makeSuite(TestLimits))
+	s.addTest(unittest.makeSuite(TestStream))
+	s.addTest(unittest.makeSuite(TestLazy))
 	return s
 
 
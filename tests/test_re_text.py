@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_parser, re_text, renderers, tree
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+
+
+
+
+class TestWiki2Text(unittest.TestCase):
+	def setUp(self):
+		self.w2t = re_text.Wiki2Text()
+
+	def test_text(self):
+		self.assertEqual(
+			self.w2t.run(u"!Title\n\n__Dot__ ''Clear''%%%\n[site|http://example.org] ((a.png|A)) ~x~$$note$$\n\n----\n\n///html\n<p>\n///\n\n> a\n>\n> b &amp;\n\n * c \n\n* d\n*# e\n** f\n* g\n"),
+			u'Title\n\nDot Clear site A\n\na\n\nb &amp;\n\n* c\n\n- d\n  - e\n  - f\n- g\n'
+		)
+		self.assertEqual(self.w2t.run(u'\n\n'), u'')
+		self.assertEqual(self.w2t.run(u"a ''b\\'' c''", skip_blocks=True), u"a b'' c")
+
+	def test_renderer(self):
+		'''same text as :class:`renderers.TextRenderer`'''
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		renderer = renderers.TextRenderer()
+		for raw in [sample] + sample.split(u'\n\n') + [u'* a\n** b\n*# c\n* d\n#e', u'@@\\@@@ ??a|b??']:
+			self.assertEqual(self.w2t.run(raw), renderer.render(tree.parse(raw)), repr(raw))
+
+	def test_stream(self):
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		self.assertEqual(
+			u''.join(self.w2t.iter_run(sample[i:i + 7] for i in range(0, len(sample), 7))),
+			self.w2t.run(sample)
+		)
+		self.assertEqual(list(self.w2t.iter_run(u'\n\n')), [])
+
+	def test_trigger(self):
+		'''every inline rule needs a character of the trigger'''
+		matches = list(re_parser.p_inline.finditer(u"((a)) \\b ''c'' __d__ %%% ~e~ [f] ??g?? {{h}} @@i@@ ++j++ --k-- l$$m$$ n:o"))
+		self.assertEqual(len(set(match.lastgroup for match in matches)), len(re_parser.RULES_INLINE))
+		for match in matches:
+			self.assertNotEqual(self.w2t._inline_trigger.search(match.group()), None, match.group())
+		self.assertEqual(self.w2t.inline(u'plain text'), u'plain text')
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestWiki2Text))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run(3)
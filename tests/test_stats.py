@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html, re_parser, stats
+
+
+
+
+
+class TestStats(unittest.TestCase):
+	def test_profile(self):
+		translator = re_html.Wiki2XHTML()
+		s = translator.profile()
+		self.assertEqual(translator.run(u"__a__\n\n!b ''c''"), u'<p><strong>a</strong></p>\n<h5>b <em>c</em></h5>\n')
+		self.assertEqual(s.matches['b_p'], 1)
+		self.assertEqual(s.matches['b_head'], 1)
+		self.assertEqual(s.matches['i_strong'], 1)
+		self.assertEqual(s.matches['i_em'], 1)
+		self.assertEqual(s.timings['b_p'][0], 1)
+		self.assertEqual(s.timings['b_head'][0], 1)
+		self.assertTrue(s.timings['p_block'][0] > 0)
+		self.assertTrue(s.timings['p_inline_scan'][0] > 0)
+		for calls, total, max_ in s.timings.itervalues():
+			self.assertTrue(total >= max_ >= 0)
+		self.assertEqual(set(s.as_dict()), set(('matches', 'timings')))
+		out = io.BytesIO()
+		stats.dump(s, out)
+		self.assertTrue('b_head' in out.getvalue())
+		s.reset()
+		self.assertFalse(s.matches)
+		self.assertEqual(s.timings['b_p'], [0, 0., 0.])
+
+	def test_disabled(self):
+		'''without profiling, the tables hold the plain methods'''
+		translator = re_html.Wiki2XHTML()
+		self.assertEqual(translator.stats, None)
+		translator.profile()
+		translator.run(u'a')
+		self.assertNotEqual(translator._block_search, re_parser.p_block.search)
+		self.assertEqual(translator.profile(False), None)
+		self.assertEqual(translator._block_search, re_parser.p_block.search)
+		self.assertTrue(translator.b_p in translator._block_handlers)
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestStats))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# vim:ts=8 sw=8 ai noet encoding=utf-8
+import io
+import os
+import sys
+import unittest
+
+sys.dont_write_bytecode = True
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+from dotclear import re_html, re_text, renderers, tree
+
+
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', 'docs', 'sample-1.2.txt')
+
+
+
+
+
+class TestTreeBuilder(unittest.TestCase):
+	def test_parse(self):
+		t = tree.parse(u"!Title\n\n__a [b|http://c|fr]__\n\n* d\n** e")
+		document = t.view()
+		self.assertEqual(document.name, 'document')
+		self.assertEqual([node.name for node in document], ['head', '', 'p', '', 'list'])
+		self.assertEqual(document[0].attr, {'level': 5})
+		link = document[2][0][1]
+		self.assertEqual(link.name, 'a')
+		self.assertEqual(link.attr, {'href': u'http://c', 'lang': u'fr'})
+		self.assertEqual(link.child['value'], u'b')
+		ul = document[4][0]
+		self.assertEqual(ul.name, 'ul')
+		self.assertEqual([node.name for node in ul[0]], ['', 'ul'])
+
+	def test_skip_blocks(self):
+		t = tree.parse(u'!a ~b~', skip_blocks=True)
+		self.assertEqual([node.name for node in t.view()], ['', 'anchor'])
+
+	def test_rules(self):
+		builder = tree.TreeBuilder()
+		builder.rules = ('p', 'strong', 'a')
+		p = builder.parse(u"__[a]__ ''b'' @@c@@").view()[0]
+		self.assertEqual([node.name for node in p], ['strong', ''])
+		self.assertEqual(p[0][0].name, 'a')
+		self.assertEqual(p[1].attr, {'value': u" ''b'' @@c@@"})
+
+
+
+class TestRenderers(unittest.TestCase):
+	def setUp(self):
+		self.w2x = re_html.Wiki2XHTML()
+		self.w2x.warn = lambda match, message: None
+		self.xhtml = renderers.XHTMLRenderer()
+		self.xhtml.warn = lambda node, message: None
+
+	def _test_xhtml(self, raw, skip_blocks=False):
+		self.assertEqual(
+			self.xhtml.render(tree.parse(raw, skip_blocks)),
+			self.w2x.run(raw, skip_blocks),
+			repr(raw)
+		)
+
+	def test_xhtml(self):
+		'''same result as Wiki2XHTML'''
+		with io.open(SAMPLE, 'rt', encoding='utf8') as fobj:
+			sample = fobj.read()
+		for raw in [sample] + sample.split(u'\n\n') + [
+			u'* a\n*# b\n*#* c\n* d\n# e',
+			u'* a\n**# b\n* \n** c',
+			u'*\n** a',
+			u'> a\n>\n>\n> b\n\nc',
+			u'??a|b?? ??c??',
+			u'\\__a__ $$b$$',
+		]:
+			self._test_xhtml(raw)
+			self._test_xhtml(raw, True)
+
+	def test_text(self):
+		t = tree.parse(u"!Title\n\n''a'' [b|url]  ((img|alt))\nc%%%\nd\n\n///html\n<p>e</p>\n///\n\n* f\n** g")
+		self.assertEqual(
+			renderers.TextRenderer().render(t),
+			u'Title\n\na b alt c d\n\n- f\n  - g\n'
+		)
+
+	def test_text_skip_blocks(self):
+		'''same result as Wiki2Text'''
+		w2t = re_text.Wiki2Text()
+		for raw in (u"a ''b'' c", u'a [b|url] ((c|alt))%%%\n d\n\n!e', u'  ', u''):
+			self.assertEqual(renderers.TextRenderer().render(tree.parse(raw, True)), w2t.run(raw, True), repr(raw))
+
+	def test_rst_headings(self):
+		'''one underline character per level'''
+		t = tree.parse(u'!!!!a\n\n!!!b\n\n!!c\n\n!d\n\n!!!!e')
+		self.assertEqual(
+			renderers.RSTRenderer().render(t),
+			u'a\n=\n\nb\n-\n\nc\n~\n\nd\n^\n\ne\n=\n'
+		)
+
+	def test_rst_skip_blocks(self):
+		render = renderers.RSTRenderer().render
+		self.assertEqual(render(tree.parse(u"a ''b'' c", True)), u'a *b* c')
+		self.assertEqual(render(tree.parse(u"__a__b ((c|d))", True)), u'**a**\\ b |image1|\n\n.. |image1| image:: c\n   :alt: d\n')
+
+	def test_rst_plain(self):
+		'''the images and footnotes nested in plain text leave no definition'''
+		render = renderers.RSTRenderer().render
+		self.assertEqual(render(tree.parse(u"''a ((i.png|b)) c''$$f$$")), u'*a b c*\\ [#]_\n\n.. [#] f\n')
+		self.assertEqual(render(tree.parse(u"''a$$f$$''")), u'*a*\n')
+		self.assertEqual(render(tree.parse(u"[x ((i.png))|url] ((j.png))")), u'`x <url>`__ |image2|\n\n.. |image2| image:: j.png\n')
+		self.assertEqual(render(tree.parse(u" ''a%%%b''\n @@((i.png|c))@@")), u'::\n\n   a\n   b\n   c\n')
+
+	def test_rst(self):
+		t = tree.parse(u"!!!Title\n\n__a__b [c|url]\nd%%%\ne$$f$$\n\n* g\n** h\n* i\n\n ''j''")
+		self.assertEqual(
+			renderers.RSTRenderer().render(t),
+			u'Title\n-----\n\n'
+			u'| **a**\\ b `c <url>`__ d\n| e\\ [#]_\n\n'
+			u'* g\n\n  * h\n\n* i\n\n'
+			u"::\n\n   j\n\n"
+			u'.. [#] f\n'
+		)
+
+
+
+def suite():
+	s = unittest.TestSuite()
+	s.addTest(unittest.makeSuite(TestTreeBuilder))
+	s.addTest(unittest.makeSuite(TestRenderers))
+	return s
+
+
+def run(verbosity=2):
+	unittest.TextTestRunner(verbosity=verbosity).run(suite())
+
+
+if __name__ == '__main__':
+	run()